@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''soft attention CPU耗时: T=64/256/1024
+tensordot为原实现(两次tensordot打分 + [B,T,H]逐元素加权后求和)，
+fused为TFSoftAttLayer(二维矩阵乘打分 + batch矩阵乘加权)，另测多头。
+耗时为前向+反向，max_abs_diff为单头时两种实现的输出差值。
+在benchmarks目录下运行: python bench_attention.py
+'''
+
+import os
+import sys
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+sys.path.append(os.getcwd() + "/../")
+import logging
+import numpy as np
+import tensorflow as tf
+from layers.tf_soft_att_layer import TFSoftAttLayer
+from bench_utils import BenchUtils
+
+FLAGS = tf.flags.FLAGS
+
+TIME_STEPS = [64, 256, 1024]
+
+
+def tensordot_attention(in_hidden, seq_len):
+    '''原tensordot实现，复用TFSoftAttLayer的变量
+    '''
+    with tf.variable_scope(tf.get_variable_scope(), reuse=True):
+        att_w = tf.get_variable("attention_weight")
+        att_b = tf.get_variable("attention_bias")
+        att_u = tf.get_variable("attention_u")
+    att_v = tf.tanh(tf.tensordot(in_hidden, att_w, axes=1) + att_b)
+    att_vu = tf.tensordot(att_v, att_u, axes=1)
+    mask = tf.sequence_mask(seq_len, tf.shape(att_vu)[1])
+    att_vu = tf.where(mask, att_vu, tf.ones_like(att_vu) * -1e9)
+    att_alpha = tf.nn.softmax(att_vu)
+    return tf.reduce_sum(in_hidden * tf.expand_dims(att_alpha, -1), axis=1)
+
+
+def timed(sess, output, params, feed_dict):
+    '''前向+反向毫秒数
+    '''
+    grads = tf.gradients(tf.reduce_sum(output), params)
+    return 1000.0 / BenchUtils.steps_per_sec(
+        lambda: sess.run(grads, feed_dict), FLAGS.bench_steps)
+
+
+def bench_attention(time_step):
+    rng = np.random.RandomState(1234)
+    inputs = rng.uniform(-1, 1, (FLAGS.batch_size, time_step,
+                                 FLAGS.hidden_size)).astype(np.float32)
+    lengths = rng.randint(time_step // 2, time_step + 1, FLAGS.batch_size)
+    result = {"time_step": time_step, "batch_size": FLAGS.batch_size}
+    with tf.Graph().as_default():
+        in_hidden = tf.placeholder(tf.float32, [None, None, FLAGS.hidden_size])
+        seq_len = tf.placeholder(tf.int32, [None])
+        with tf.variable_scope("single"):
+            fused = TFSoftAttLayer(in_hidden, FLAGS.attention_size,
+                                   seq_len).build()
+            single_params = tf.trainable_variables("single")
+            reference = tensordot_attention(in_hidden, seq_len)
+        with tf.variable_scope("multi"):
+            multi = TFSoftAttLayer(in_hidden, FLAGS.attention_size, seq_len,
+                                   FLAGS.num_heads).build()
+            multi_params = tf.trainable_variables("multi")
+        with tf.Session(config=tf.ConfigProto(
+                device_count={"GPU": 0})) as sess:
+            sess.run(tf.global_variables_initializer())
+            # 参数随机初始化，避免attention_u全0时权重恒为均匀分布
+            for var in single_params + multi_params:
+                var.load(
+                    rng.normal(0, 0.1,
+                               var.get_shape().as_list()).astype(np.float32),
+                    sess)
+            feed_dict = {in_hidden: inputs, seq_len: lengths}
+            fused_out, reference_out = sess.run([fused, reference], feed_dict)
+            result["max_abs_diff"] = float(
+                np.max(np.abs(fused_out - reference_out)))
+            result["tensordot_ms"] = timed(sess, reference,
+                                           single_params + [in_hidden],
+                                           feed_dict)
+            result["fused_ms"] = timed(sess, fused,
+                                       single_params + [in_hidden], feed_dict)
+            result["multi_head_ms"] = timed(sess, multi,
+                                            multi_params + [in_hidden],
+                                            feed_dict)
+    result["num_heads"] = FLAGS.num_heads
+    result["speedup"] = result["tensordot_ms"] / result["fused_ms"]
+
+    return result
+
+
+def main(argv=None):
+    logging.getLogger().setLevel(logging.WARNING)
+    results = [bench_attention(time_step) for time_step in TIME_STEPS]
+    BenchUtils.report("soft_attention", results, FLAGS.bench_output)
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_integer("hidden_size", 256,
+                            "Size of attended hidden states(default: 256)")
+    tf.flags.DEFINE_integer("attention_size", 128,
+                            "Attention size(default: 128)")
+    tf.flags.DEFINE_integer("num_heads", 4,
+                            "Number of heads for multi-head pooling(default: 4)")
+    tf.flags.DEFINE_integer("batch_size", 32, "Batch Size (default: 32)")
+    tf.flags.DEFINE_integer("bench_steps", 30,
+                            "Number of timed steps (default: 30)")
+    tf.flags.DEFINE_string("bench_output", "",
+                           "json file to save results(default: '')")
+    tf.app.run()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''固定长度padding与按长度分桶动态padding的训练吞吐对比
+在benchmarks目录下运行: python bench_bucketing.py --max_seq_len 128
+'''
+
+import os
+import sys
+sys.path.append(os.getcwd() + "/../")
+sys.path.append(os.getcwd() + "/../demos")
+import logging
+import tensorflow as tf
+from executes.init_processor import InitProcessor
+from executes.pre_processor import PreProcessor
+from executes.graph_processor import GraphProcessor
+from bench_utils import BenchUtils
+
+# 分桶配置: 空为固定padding到max_seq_len；单个大边界等价于只做batch内动态padding
+BUCKET_CONFIGS = ["", "100000", "16,32,64", "8,16,24,32,48,64"]
+
+
+def bench_buckets(flags, pre_returns, task_name, bucket_boundaries):
+    '''测量某个模型在某个分桶配置下的训练吞吐
+
+    Returns:
+        每秒训练样本数
+    '''
+    flags.task_name = task_name
+    flags.bucket_boundaries = bucket_boundaries
+    x_train, y_train = pre_returns[0], pre_returns[1]
+    model, graph = GraphProcessor().execute({
+        "INIT": flags,
+        "PRE": pre_returns
+    })
+    with tf.Session(graph=graph) as sess:
+        sess.run(tf.global_variables_initializer())
+        sess.run(tf.local_variables_initializer())
+        batches = model.get_batches(sess, x_train, y_train)
+
+        def step():
+            x_batch, y_batch = next(batches)
+            model.train_onestep(sess, x_batch, y_batch)
+
+        steps_per_sec = BenchUtils.steps_per_sec(step, flags.bench_steps)
+
+    return steps_per_sec * flags.batch_size
+
+
+def main(argv=None):
+    flags = InitProcessor().execute({})
+    flags.input_mode = "feed_dict"
+    pre_returns = PreProcessor().execute({"INIT": flags})
+    # 关闭逐步日志，避免干扰计时
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = []
+    for task_name in ["TextCNN", "BILSTMAtt"]:
+        for bucket_boundaries in BUCKET_CONFIGS:
+            results.append({
+                "task_name":
+                task_name,
+                "max_seq_len":
+                flags.max_seq_len,
+                "bucket_boundaries":
+                bucket_boundaries or "none",
+                "examples_per_sec":
+                bench_buckets(flags, pre_returns, task_name,
+                              bucket_boundaries)
+            })
+    BenchUtils.report("bucketing", results, flags.bench_output)
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_integer("max_seq_len", 128,
+                            "max len of input seq(default: 128)")
+    tf.flags.DEFINE_integer("bench_steps", 100,
+                            "Number of timed train steps (default: 100)")
+    tf.flags.DEFINE_string("bench_output", "",
+                           "json file to save results(default: '')")
+    tf.app.run()
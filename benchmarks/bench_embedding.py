@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''大词表词向量的内存与训练速度测试: 1M、10M行
+对比整表adam、整表lazy_adam、分片lazy_adam、feature hashing(表大小固定为hash桶数)，
+每组配置在独立子进程中运行，峰值RSS互不影响。
+在benchmarks目录下运行: python bench_embedding.py --bench_rows 1000000,10000000
+'''
+
+import os
+import sys
+sys.path.append(os.getcwd() + "/../")
+import logging
+import resource
+import multiprocessing
+import numpy as np
+import tensorflow as tf
+from layers.tf_embedding_layer import TFEmbeddingLayer
+from bench_utils import BenchUtils
+
+FLAGS = tf.flags.FLAGS
+
+# (名称, 优化器, 分片数, 是否hash)
+CONFIGS = [
+    ("dense_adam", "adam", 1, False),
+    ("dense_lazy_adam", "lazy_adam", 1, False),
+    ("partitioned_lazy_adam", "lazy_adam", None, False),
+    ("hash_lazy_adam", "lazy_adam", 1, True),
+]
+
+
+def run_config(opt, num_partitions, table_rows, vocab_rows, queue):
+    '''子进程: 构图并测量训练速度，结果放入queue
+    '''
+    rng = np.random.RandomState(1234)
+    # 词id服从zipf分布，贴近真实语料；hash模式下对桶数取模
+    ids = np.minimum(rng.zipf(1.2, size=[FLAGS.batch_size, FLAGS.max_seq_len]),
+                     vocab_rows - 1)
+    ids = (ids % table_rows).astype(np.int32)
+    labels = rng.randint(0, 2, size=FLAGS.batch_size)
+    with tf.Graph().as_default():
+        input_x = tf.placeholder(tf.int32, [None, None])
+        input_y = tf.placeholder(tf.int32, [None])
+        embedding = TFEmbeddingLayer(input_x,
+                                     table_rows,
+                                     FLAGS.emb_size,
+                                     num_partitions=num_partitions).build()
+        logits = tf.layers.dense(tf.reduce_mean(embedding, 1), 2)
+        loss = tf.reduce_mean(
+            tf.nn.sparse_softmax_cross_entropy_with_logits(labels=input_y,
+                                                           logits=logits))
+        if opt == "lazy_adam":
+            optimizer = tf.contrib.opt.LazyAdamOptimizer(1e-3)
+        else:
+            optimizer = tf.train.AdamOptimizer(1e-3)
+        train_op = optimizer.minimize(loss)
+        # 参数及优化器slot占用
+        var_bytes = sum(
+            var.get_shape().num_elements() * var.dtype.base_dtype.size
+            for var in tf.global_variables())
+        with tf.Session() as sess:
+            sess.run(tf.global_variables_initializer())
+            feed_dict = {input_x: ids, input_y: labels}
+            steps_per_sec = BenchUtils.steps_per_sec(
+                lambda: sess.run(train_op, feed_dict), FLAGS.bench_steps)
+    queue.put({
+        "step_ms": 1000.0 / steps_per_sec,
+        "var_mb": var_bytes / float(1 << 20),
+        # linux下ru_maxrss单位为KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss /
+        1024.0
+    })
+
+
+def main(argv=None):
+    logging.getLogger().setLevel(logging.WARNING)
+    results = []
+    for rows in [int(r) for r in FLAGS.bench_rows.split(",")]:
+        for name, opt, num_partitions, hashing in CONFIGS:
+            table_rows = min(rows, FLAGS.hash_buckets) if hashing else rows
+            num_partitions = num_partitions or FLAGS.emb_partitions
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=run_config,
+                                              args=(opt, num_partitions,
+                                                    table_rows, rows, queue))
+            process.start()
+            # 结果很小，先join不会阻塞；子进程被OOM kill时不再等待queue
+            process.join()
+            if process.exitcode == 0:
+                row = queue.get()
+            else:
+                logging.warning("{} with {} rows failed, exit code {}".format(
+                    name, rows, process.exitcode))
+                row = {"error": "exit code {}".format(process.exitcode)}
+            row.update({
+                "config": name,
+                "vocab_rows": rows,
+                "table_rows": table_rows,
+                "emb_partitions": num_partitions
+            })
+            results.append(row)
+    BenchUtils.report("embedding", results, FLAGS.bench_output)
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_string("bench_rows", "1000000,10000000",
+                           "comma separated vocab rows(default: 1M,10M)")
+    tf.flags.DEFINE_integer("emb_size", 128,
+                            "Dimensionality of word embedding (default: 128)")
+    tf.flags.DEFINE_integer("emb_partitions", 8,
+                            "Number of embedding shards(default: 8)")
+    tf.flags.DEFINE_integer("hash_buckets", 1000000,
+                            "Embedding rows in hashing mode(default: 1M)")
+    tf.flags.DEFINE_integer("batch_size", 64, "Batch Size (default: 64)")
+    tf.flags.DEFINE_integer("max_seq_len", 128,
+                            "max len of input seq(default: 128)")
+    tf.flags.DEFINE_integer("bench_steps", 50,
+                            "Number of timed train steps (default: 50)")
+    tf.flags.DEFINE_string("bench_output", "",
+                           "json file to save results(default: '')")
+    tf.app.run()
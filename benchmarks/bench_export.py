@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''训练checkpoint与导出的冻结SavedModel对比: 磁盘大小、冷启动加载时间、单请求延迟
+训练时加--export_model导出，然后在benchmarks目录下运行:
+python bench_export.py --checkpoint_dir ../save_models/xxx/checkpoints \
+    --export_dir ../save_models/xxx/export
+'''
+
+import os
+import io
+import sys
+sys.path.append(os.getcwd() + "/../")
+import glob
+import time
+import logging
+import numpy as np
+import tensorflow as tf
+from utils.tf_predictor import TFPredictor
+from bench_utils import BenchUtils
+
+
+def dir_size(paths):
+    '''文件总字节数
+    '''
+    return sum(os.path.getsize(path) for path in paths if os.path.isfile(path))
+
+
+def bench_model(model_dir, model_files, texts, num_requests):
+    '''测量加载时间和单请求延迟
+    '''
+    start = time.time()
+    predictor = TFPredictor(model_dir)
+    load_sec = time.time() - start
+    latencies = []
+    for i in range(num_requests):
+        start = time.time()
+        predictor.predict([texts[i % len(texts)]])
+        latencies.append((time.time() - start) * 1000.0)
+    predictor.close()
+
+    return {
+        "model": model_dir,
+        "size_bytes": dir_size(model_files),
+        "load_sec": load_sec,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99))
+    }
+
+
+def main(argv=None):
+    flags = tf.flags.FLAGS
+    with io.open(flags.text_file, "r", encoding="utf-8") as fin:
+        texts = [line.strip() for line in fin]
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # checkpoint只统计最新一份模型文件
+    checkpoint_file = tf.train.latest_checkpoint(flags.checkpoint_dir)
+    checkpoint_files = glob.glob(checkpoint_file + ".*")
+    export_files = [
+        os.path.join(root, name)
+        for root, _, names in os.walk(flags.export_dir) for name in names
+        if name != "frozen_graph.pb"
+    ]
+    results = [
+        bench_model(flags.checkpoint_dir, checkpoint_files, texts,
+                    flags.num_requests),
+        bench_model(flags.export_dir, export_files, texts, flags.num_requests)
+    ]
+    BenchUtils.report("export", results, flags.bench_output)
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_string("checkpoint_dir", "", "training checkpoints dir")
+    tf.flags.DEFINE_string("export_dir", "", "exported SavedModel dir")
+    tf.flags.DEFINE_string(
+        "text_file",
+        os.path.join(os.getcwd(), "../corpus/nlp/english/rt-polarity.pos"),
+        "texts to predict(default: ../corpus/nlp/english/rt-polarity.pos)")
+    tf.flags.DEFINE_integer("num_requests", 1000,
+                            "Number of single-text requests (default: 1000)")
+    tf.flags.DEFINE_string("bench_output", "",
+                           "json file to save results(default: '')")
+    tf.app.run()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''feed_dict、tf.data、二进制语料三种输入模式训练速度对比(steps/sec)
+epoch_iter_ms为不训练时遍历一个epoch的batch耗时，只对比feed_dict与binary。
+在benchmarks目录下运行: python bench_input_pipeline.py --bench_steps 200
+'''
+
+import os
+import sys
+sys.path.append(os.getcwd() + "/../")
+sys.path.append(os.getcwd() + "/../demos")
+import shutil
+import logging
+import tempfile
+import tensorflow as tf
+from utils.tf_utils import TFUtils
+from utils.binary_corpus import BinaryCorpus
+from executes.init_processor import InitProcessor
+from executes.pre_processor import PreProcessor
+from executes.graph_processor import GraphProcessor
+from bench_utils import BenchUtils
+
+
+def bench_input_mode(flags, pre_returns, input_mode, binary_corpus=None):
+    '''在rt-polarity上测量某种输入模式的训练速度
+
+    Args:
+        flags: 全局参数
+        pre_returns: PreProcessor返回结果
+        input_mode: feed_dict/dataset/binary
+        binary_corpus: binary模式使用的BinaryCorpus
+
+    Returns:
+        每秒训练步数
+    '''
+    flags.input_mode = input_mode
+    x_train, y_train = pre_returns[0], pre_returns[1]
+    if input_mode == "binary":
+        x_train, y_train = binary_corpus, None
+    model, graph = GraphProcessor().execute({
+        "INIT": flags,
+        "PRE": pre_returns
+    })
+    with tf.Session(graph=graph) as sess:
+        sess.run(tf.global_variables_initializer())
+        sess.run(tf.local_variables_initializer())
+        batches = model.get_batches(sess, x_train, y_train)
+
+        def step():
+            x_batch, y_batch = next(batches)
+            model.train_onestep(sess, x_batch, y_batch)
+
+        return BenchUtils.steps_per_sec(step, flags.bench_steps)
+
+
+def main(argv=None):
+    flags = InitProcessor().execute({})
+    # 先以dataset模式预处理，保证TFRecord分片已落盘
+    flags.input_mode = "dataset"
+    pre_returns = PreProcessor().execute({"INIT": flags})
+    # 关闭逐步日志，避免干扰计时
+    logging.getLogger().setLevel(logging.WARNING)
+
+    x_train, y_train = pre_returns[0], pre_returns[1]
+    tmp_dir = tempfile.mkdtemp(prefix="bench_binary_")
+    try:
+        binary_corpus = BinaryCorpus.write(
+            os.path.join(tmp_dir, "train"), zip(x_train, y_train),
+            flags.cls_num)
+
+        def iter_epoch(input_mode):
+            if input_mode == "binary":
+                batches = binary_corpus.batch_iter(flags.batch_size, 1)
+            else:
+                batches = TFUtils.batch_iter(list(zip(x_train, y_train)),
+                                             flags.batch_size, 1)
+            for _ in batches:
+                pass
+
+        results = []
+        for input_mode in ["feed_dict", "dataset", "binary"]:
+            row = {
+                "task_name": flags.task_name,
+                "input_mode": input_mode,
+                "batch_size": flags.batch_size,
+                "steps_per_sec": bench_input_mode(flags, pre_returns,
+                                                  input_mode, binary_corpus)
+            }
+            if input_mode != "dataset":
+                row["epoch_iter_ms"] = BenchUtils.ms_per_call(
+                    lambda: iter_epoch(input_mode))
+            results.append(row)
+    finally:
+        shutil.rmtree(tmp_dir)
+    BenchUtils.report("input_pipeline", results, flags.bench_output)
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_integer("max_seq_len", 128,
+                            "max len of input seq(default: 128)")
+    tf.flags.DEFINE_integer("bench_steps", 200,
+                            "Number of timed train steps (default: 200)")
+    tf.flags.DEFINE_string("bench_output", "",
+                           "json file to save results(default: '')")
+    tf.app.run()
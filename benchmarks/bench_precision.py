@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''float32与bfloat16混合精度在rt-polarity上的精度一致性及训练速度
+TextCNN、BILSTMAtt各以两种精度训练相同步数(batch顺序相同)，在验证集上比较accuracy/f1，
+accuracy差值超过parity_tolerance时以非0状态码退出。
+bfloat16 matmul/conv的加速需要CPU支持AVX512-BF16且TF为oneDNN(MKL)版本；
+TF 1.15(含intel-tensorflow)的bfloat16卷积反向没有优化kernel，TextCNN反而明显变慢。
+在benchmarks目录下运行: python bench_precision.py --bench_train_steps 1000
+'''
+
+import os
+import sys
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+sys.path.append(os.getcwd() + "/../")
+sys.path.append(os.getcwd() + "/../demos")
+import time
+import logging
+import numpy as np
+import tensorflow as tf
+from utils.tf_utils import TFUtils
+from executes.init_processor import InitProcessor
+from executes.pre_processor import PreProcessor
+from executes.graph_processor import GraphProcessor
+from bench_utils import BenchUtils
+
+TASKS = ["TextCNN", "BILSTMAtt"]
+PRECISIONS = ["float32", "bfloat16"]
+
+
+def train_and_eval(flags, pre_returns):
+    '''训练bench_train_steps步后评估
+
+    Returns:
+        (eval指标dict, 每秒训练步数)
+    '''
+    x_train, y_train, _, x_dev, y_dev = pre_returns
+    model, graph = GraphProcessor().execute({
+        "INIT": flags,
+        "PRE": pre_returns
+    })
+    # 两种精度使用相同的batch顺序
+    np.random.seed(10)
+    with tf.Session(graph=graph) as sess:
+        sess.run(tf.global_variables_initializer())
+        sess.run(tf.local_variables_initializer())
+        batches = model.get_batches(sess, x_train, y_train)
+        start = time.time()
+        for _ in range(flags.bench_train_steps):
+            x_batch, y_batch = next(batches)
+            model.train_onestep(sess, x_batch, y_batch)
+        steps_per_sec = flags.bench_train_steps / (time.time() - start)
+        metrics = model.eval(sess, x_dev, y_dev)
+
+    return metrics, steps_per_sec
+
+
+def main(argv=None):
+    flags = InitProcessor().execute({})
+    flags.input_mode = "feed_dict"
+    pre_returns = PreProcessor().execute({"INIT": flags})
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = []
+    failed = False
+    for task_name in TASKS:
+        baseline = None
+        for precision in PRECISIONS:
+            metrics, steps_per_sec = train_and_eval(
+                TFUtils.override_flags(flags,
+                                       task_name=task_name,
+                                       precision=precision), pre_returns)
+            row = {
+                "task_name": task_name,
+                "precision": precision,
+                "accuracy": float(metrics["accuracy"]),
+                "f1": float(metrics["f1"]),
+                "steps_per_sec": steps_per_sec
+            }
+            if baseline is None:
+                baseline = row
+            row["accuracy_diff"] = row["accuracy"] - baseline["accuracy"]
+            row["speedup"] = steps_per_sec / baseline["steps_per_sec"]
+            if abs(row["accuracy_diff"]) > flags.parity_tolerance:
+                failed = True
+            results.append(row)
+    BenchUtils.report("precision_parity", results, flags.bench_output)
+    if failed:
+        logging.warning("bfloat16 accuracy differs from float32 by more than "
+                        "{}".format(flags.parity_tolerance))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_integer("max_seq_len", 128,
+                            "max len of input seq(default: 128)")
+    tf.flags.DEFINE_integer("bench_train_steps", 1000,
+                            "Number of train steps per run (default: 1000)")
+    tf.flags.DEFINE_float(
+        "parity_tolerance", 0.01,
+        "max allowed absolute dev accuracy difference(default: 0.01)")
+    tf.flags.DEFINE_string("bench_output", "",
+                           "json file to save results(default: '')")
+    tf.app.run()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''训练后量化精度与速度报告: 在rt-polarity验证集上对比float32/int8/float16导出模型
+需使用与训练时相同的预处理参数，在benchmarks目录下运行:
+python bench_quantization.py --task_name TextCNN --max_seq_len 128 \
+    --checkpoint_dir ../save_models/xxx/checkpoints
+'''
+
+import os
+import sys
+sys.path.append(os.getcwd() + "/../")
+sys.path.append(os.getcwd() + "/../demos")
+import time
+import shutil
+import logging
+import tempfile
+import numpy as np
+import tensorflow as tf
+from utils.tf_predictor import TFPredictor
+from executes.init_processor import InitProcessor
+from executes.pre_processor import PreProcessor
+from executes.graph_processor import GraphProcessor
+from bench_utils import BenchUtils
+
+
+def dir_size(path):
+    '''目录总字节数
+    '''
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path) for name in names)
+
+
+def bench_export(export_dir, x_dev, y_dev, batch_size):
+    '''在验证集上测量导出模型的准确率和延迟
+    '''
+    predictor = TFPredictor(export_dir)
+    correct = 0
+    latencies = []
+    for start in range(0, len(x_dev), batch_size):
+        x_batch = np.asarray(x_dev[start:start + batch_size])
+        y_batch = np.asarray(y_dev[start:start + batch_size])
+        begin = time.time()
+        _, predictions = predictor.predict_ids(x_batch)
+        latencies.append((time.time() - begin) * 1000.0)
+        correct += np.sum(
+            np.argmax(predictions, 1) == np.argmax(y_batch, 1))
+    predictor.close()
+
+    return {
+        "accuracy": float(correct) / len(y_dev),
+        "batch_p50_ms": float(np.percentile(latencies, 50)),
+        "batch_p99_ms": float(np.percentile(latencies, 99)),
+        "size_bytes": dir_size(export_dir)
+    }
+
+
+def main(argv=None):
+    flags = InitProcessor().execute({})
+    flags.input_mode = "feed_dict"
+    pre_returns = PreProcessor().execute({"INIT": flags})
+    vocab_processor, x_dev, y_dev = pre_returns[2:]
+    model, graph = GraphProcessor().execute({
+        "INIT": flags,
+        "PRE": pre_returns
+    })
+    logging.getLogger().setLevel(logging.WARNING)
+
+    export_root = tempfile.mkdtemp()
+    results = []
+    with tf.Session(graph=graph) as sess:
+        saver = tf.train.Saver()
+        saver.restore(sess, tf.train.latest_checkpoint(flags.checkpoint_dir))
+        for quantize in ["none", "int8", "float16"]:
+            export_dir = os.path.join(export_root, quantize)
+            model.export(sess, export_dir, vocab_processor, quantize)
+            result = bench_export(export_dir, x_dev, y_dev,
+                                  flags.batch_size)
+            result["quantize"] = quantize
+            result["task_name"] = flags.task_name
+            results.append(result)
+    shutil.rmtree(export_root)
+    BenchUtils.report("quantization", results, flags.bench_output)
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_integer("max_seq_len", 128,
+                            "max len of input seq(default: 128)")
+    tf.flags.DEFINE_string("bench_output", "",
+                           "json file to save results(default: '')")
+    tf.app.run()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''BILSTMAtt各rnn后端CPU对比: lstm/lstm_block_fused/gru
+throughput为batch_size下前向+反向每秒样本数，latency_ms为batch 1前向耗时。
+在benchmarks目录下运行: python bench_rnn.py --hidden_sizes 128
+'''
+
+import os
+import sys
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+sys.path.append(os.getcwd() + "/../")
+import logging
+import numpy as np
+import tensorflow as tf
+from layers.tf_bilstm_att_layer import TFBILSTMAttLayer
+from bench_utils import BenchUtils
+
+FLAGS = tf.flags.FLAGS
+
+RNN_TYPES = ["lstm", "lstm_block_fused", "gru"]
+SEQ_LENS = [32, 128]
+
+
+def bench_rnn(rnn_type, seq_len):
+    '''测量一种后端
+
+    Returns:
+        结果dict
+    '''
+    rng = np.random.RandomState(1234)
+    hidden_sizes = list(map(int, FLAGS.hidden_sizes.split(",")))
+    inputs = rng.uniform(-1, 1, (FLAGS.batch_size, seq_len,
+                                 FLAGS.emb_size)).astype(np.float32)
+    # 真实长度在[seq_len/2, seq_len]间
+    lengths = rng.randint(seq_len // 2, seq_len + 1, FLAGS.batch_size)
+    with tf.Graph().as_default():
+        in_hidden = tf.placeholder(tf.float32, [None, None, FLAGS.emb_size])
+        seq_lens = tf.placeholder(tf.int32, [None])
+        output = TFBILSTMAttLayer(in_hidden, hidden_sizes,
+                                  FLAGS.attention_size, 1.0, seq_lens,
+                                  rnn_type).build()
+        grads = tf.gradients(tf.reduce_sum(output), tf.trainable_variables())
+        with tf.Session(config=tf.ConfigProto(
+                device_count={"GPU": 0})) as sess:
+            sess.run(tf.global_variables_initializer())
+            train_feed = {in_hidden: inputs, seq_lens: lengths}
+            throughput = FLAGS.batch_size * BenchUtils.steps_per_sec(
+                lambda: sess.run(grads, train_feed), FLAGS.bench_steps)
+            infer_feed = {in_hidden: inputs[:1], seq_lens: [seq_len]}
+            latency_ms = 1000.0 / BenchUtils.steps_per_sec(
+                lambda: sess.run(output, infer_feed), FLAGS.bench_steps)
+
+    return {
+        "rnn_type": rnn_type,
+        "seq_len": seq_len,
+        "batch_size": FLAGS.batch_size,
+        "throughput": throughput,
+        "latency_ms": latency_ms
+    }
+
+
+def main(argv=None):
+    logging.getLogger().setLevel(logging.WARNING)
+    results = []
+    for seq_len in SEQ_LENS:
+        for rnn_type in RNN_TYPES:
+            results.append(bench_rnn(rnn_type, seq_len))
+    BenchUtils.report("rnn_backend", results, FLAGS.bench_output)
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_string("hidden_sizes", "128",
+                           "BILSTM hidden sizes (default: '128')")
+    tf.flags.DEFINE_integer("attention_size", 128,
+                            "BILSTM-Attention size(default: 128)")
+    tf.flags.DEFINE_integer("emb_size", 128,
+                            "Dimensionality of word embedding (default: 128)")
+    tf.flags.DEFINE_integer("batch_size", 64, "Batch Size (default: 64)")
+    tf.flags.DEFINE_integer("bench_steps", 30,
+                            "Number of timed steps (default: 30)")
+    tf.flags.DEFINE_string("bench_output", "",
+                           "json file to save results(default: '')")
+    tf.app.run()
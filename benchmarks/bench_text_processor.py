@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''文本预处理吞吐(行/秒): 原逐行路径与TextProcessor按块路径对比
+legacy为逐行strip().rstrip().lower()后逐条正则分词，
+block为TextProcessor按块读取规范化并整批分词。
+英文默认配置下两者分词结果需完全一致(identical)，中文逐字仅测新路径。
+在benchmarks目录下运行: python bench_text_processor.py --num_lines 200000
+'''
+
+import os
+import sys
+sys.path.append(os.getcwd() + "/../")
+import io
+import time
+import random
+import shutil
+import logging
+import tempfile
+import tensorflow as tf
+from utils.text_processor import TextProcessor
+from utils.vocab_processor import tokenize
+from bench_utils import BenchUtils
+
+FLAGS = tf.flags.FLAGS
+
+
+def unichr_(code):
+    try:
+        return unichr(code)
+    except NameError:
+        return chr(code)
+
+
+def write_corpus(filename, num_lines, chinese=False):
+    '''生成大小写、标点混合的随机语料
+    '''
+    rng = random.Random(10)
+    if chinese:
+        words = [u"".join(unichr_(rng.randint(0x4e00, 0x9fa5))
+                          for _ in range(rng.randint(1, 3)))
+                 for _ in range(5000)]
+    else:
+        words = [u"Word%d" % i for i in range(5000)] + [u"it's", u"NLP"]
+    puncts = [u",", u".", u"!", u"?", u"，", u"。"]
+    with io.open(filename, "w", encoding="utf-8") as fout:
+        for _ in range(num_lines):
+            tokens = [rng.choice(words) for _ in range(rng.randint(5, 40))]
+            fout.write(u"  " + u" ".join(tokens) + rng.choice(puncts) + u" \n")
+
+
+def legacy(filename):
+    '''原路径: TFUtils.preprocess逐行 + VocabProcessor逐条分词
+    '''
+    with io.open(filename, "r", encoding="utf-8") as fin:
+        texts = [s.strip().rstrip().lower() for s in fin]
+    return [tokenize(text) for text in texts]
+
+
+def block(filename, processor):
+    '''新路径: 按块规范化 + 整批分词
+    '''
+    tokens = []
+    for lines in processor.read_lines(filename):
+        tokens.extend(processor.tokenize_lines(lines))
+    return tokens
+
+
+def main(argv=None):
+    logging.getLogger().setLevel(logging.WARNING)
+    tmp_dir = tempfile.mkdtemp(prefix="bench_text_")
+    results = []
+    try:
+        english = os.path.join(tmp_dir, "english")
+        chinese = os.path.join(tmp_dir, "chinese")
+        write_corpus(english, FLAGS.num_lines)
+        write_corpus(chinese, FLAGS.num_lines, chinese=True)
+        default = TextProcessor()
+        runs = [
+            ("english", "legacy", lambda: legacy(english)),
+            ("english", "block", lambda: block(english, default)),
+            ("english", "block_split_punct",
+             lambda: block(english, TextProcessor(split_punct=True))),
+            ("chinese", "legacy", lambda: legacy(chinese)),
+            ("chinese", "block_char",
+             lambda: block(chinese, TextProcessor(chinese="char")))
+        ]
+        for corpus, path, fn in runs:
+            ms = BenchUtils.ms_per_call(fn, repeat=FLAGS.bench_repeat)
+            results.append({
+                "corpus": corpus,
+                "path": path,
+                "ms": ms,
+                "lines_per_sec": FLAGS.num_lines / (ms / 1000.0)
+            })
+        identical = legacy(english) == block(english, default)
+    finally:
+        shutil.rmtree(tmp_dir)
+    legacy_ms = dict((row["corpus"], row["ms"]) for row in results
+                     if row["path"] == "legacy")
+    for row in results:
+        row["speedup"] = legacy_ms[row["corpus"]] / row["ms"]
+        if row["corpus"] == "english" and row["path"] == "block":
+            row["identical"] = identical
+    BenchUtils.report("text_processor", results, FLAGS.bench_output)
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_integer("num_lines", 200000,
+                            "Number of lines per corpus (default: 200000)")
+    tf.flags.DEFINE_integer("bench_repeat", 3,
+                            "Number of timed rounds, the fastest is kept (default: 3)")
+    tf.flags.DEFINE_string("bench_output", "",
+                           "json file to save results(default: '')")
+    tf.app.run()
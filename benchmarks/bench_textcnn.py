@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''TextCNN逐窗口卷积与fused单次卷积对比: CPU前向+反向耗时、参数内存及输出一致性
+两种实现共享同一组W{k}/b{k}，max_abs_diff为同一输入下两者输出的最大差值。
+legacy_filters_mb为旧实现每个窗口额外创建、从未使用的filters变量的内存。
+在benchmarks目录下运行: python bench_textcnn.py --filter_sizes 2,3,4,5
+'''
+
+import os
+import sys
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+sys.path.append(os.getcwd() + "/../")
+import logging
+import numpy as np
+import tensorflow as tf
+from layers.tf_textcnn_layer import TFTextCNNLayer
+from bench_utils import BenchUtils
+
+FLAGS = tf.flags.FLAGS
+
+BATCH_SIZES = [32, 128]
+SEQ_LENS = [32, 128, 512]
+
+
+def bench_textcnn(batch_size, seq_len, filter_sizes):
+    '''同一图内构建两种实现，共享参数
+
+    Returns:
+        结果dict
+    '''
+    rng = np.random.RandomState(1234)
+    inputs = rng.uniform(-1, 1,
+                         (batch_size, seq_len, FLAGS.emb_size)).astype(
+                             np.float32)
+    result = {"batch_size": batch_size, "seq_len": seq_len}
+    with tf.Graph().as_default():
+        in_hidden = tf.placeholder(tf.float32, [None, None, FLAGS.emb_size])
+        outputs = {}
+        for fused in [False, True]:
+            with tf.variable_scope("textcnn", reuse=fused):
+                outputs[fused] = TFTextCNNLayer(in_hidden, filter_sizes,
+                                                FLAGS.num_filters,
+                                                fused).build()
+        params = tf.trainable_variables()
+        result["param_mb"] = sum(
+            var.get_shape().num_elements() * 4
+            for var in params) / float(1 << 20)
+        result["legacy_filters_mb"] = sum(
+            k * FLAGS.emb_size * FLAGS.num_filters * 4
+            for k in filter_sizes) / float(1 << 20)
+        with tf.Session(config=tf.ConfigProto(
+                device_count={"GPU": 0})) as sess:
+            sess.run(tf.global_variables_initializer())
+            feed_dict = {in_hidden: inputs}
+            loop_out, fused_out = sess.run([outputs[False], outputs[True]],
+                                           feed_dict)
+            result["max_abs_diff"] = float(np.max(np.abs(loop_out -
+                                                         fused_out)))
+            for fused in [False, True]:
+                grads = tf.gradients(tf.reduce_sum(outputs[fused]),
+                                     params + [in_hidden])
+                name = "fused" if fused else "loop"
+                result[name + "_ms"] = 1000.0 / BenchUtils.steps_per_sec(
+                    lambda: sess.run(grads, feed_dict), FLAGS.bench_steps)
+    result["speedup"] = result["loop_ms"] / result["fused_ms"]
+
+    return result
+
+
+def main(argv=None):
+    logging.getLogger().setLevel(logging.WARNING)
+    filter_sizes = list(map(int, FLAGS.filter_sizes.split(",")))
+    results = []
+    for batch_size in BATCH_SIZES:
+        for seq_len in SEQ_LENS:
+            results.append(bench_textcnn(batch_size, seq_len, filter_sizes))
+    BenchUtils.report("textcnn_fused", results, FLAGS.bench_output)
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_string("filter_sizes", "2,3,4,5",
+                           "TextCNN filter sizes (default: '2,3,4,5')")
+    tf.flags.DEFINE_integer("num_filters", 128,
+                            "Number of filters per filter size (default: 128)")
+    tf.flags.DEFINE_integer("emb_size", 128,
+                            "Dimensionality of word embedding (default: 128)")
+    tf.flags.DEFINE_integer("bench_steps", 50,
+                            "Number of timed steps (default: 50)")
+    tf.flags.DEFINE_string("bench_output", "",
+                           "json file to save results(default: '')")
+    tf.app.run()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''数据并行多塔训练的扩展性测试: 1/2/4/8个塔，每个塔batch大小固定
+在benchmarks目录下运行: python bench_towers.py --task_name TextCNN
+'''
+
+import os
+import sys
+sys.path.append(os.getcwd() + "/../")
+sys.path.append(os.getcwd() + "/../demos")
+import logging
+import tensorflow as tf
+from executes.init_processor import InitProcessor
+from executes.pre_processor import PreProcessor
+from executes.graph_processor import GraphProcessor
+from bench_utils import BenchUtils
+
+NUM_TOWERS = [1, 2, 4, 8]
+
+
+def bench_towers(flags, pre_returns, num_towers, tower_batch_size):
+    '''测量num_towers个塔时的训练吞吐
+
+    Returns:
+        每秒训练样本数
+    '''
+    flags.num_towers = num_towers
+    flags.batch_size = tower_batch_size * num_towers
+    x_train, y_train = pre_returns[0], pre_returns[1]
+    model, graph = GraphProcessor().execute({
+        "INIT": flags,
+        "PRE": pre_returns
+    })
+    with tf.Session(graph=graph) as sess:
+        sess.run(tf.global_variables_initializer())
+        sess.run(tf.local_variables_initializer())
+        batches = model.get_batches(sess, x_train, y_train)
+
+        def step():
+            x_batch, y_batch = next(batches)
+            model.train_onestep(sess, x_batch, y_batch)
+
+        steps_per_sec = BenchUtils.steps_per_sec(step, flags.bench_steps)
+
+    return steps_per_sec * flags.batch_size
+
+
+def main(argv=None):
+    flags = InitProcessor().execute({})
+    flags.input_mode = "feed_dict"
+    pre_returns = PreProcessor().execute({"INIT": flags})
+    logging.getLogger().setLevel(logging.WARNING)
+
+    tower_batch_size = flags.batch_size
+    results = []
+    for num_towers in NUM_TOWERS:
+        examples_per_sec = bench_towers(flags, pre_returns, num_towers,
+                                        tower_batch_size)
+        results.append({
+            "task_name": flags.task_name,
+            "num_towers": num_towers,
+            "batch_size": tower_batch_size * num_towers,
+            "examples_per_sec": examples_per_sec,
+            "speedup": examples_per_sec / results[0]["examples_per_sec"]
+            if results else 1.0
+        })
+    BenchUtils.report("towers", results, flags.bench_output)
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_integer("max_seq_len", 128,
+                            "max len of input seq(default: 128)")
+    tf.flags.DEFINE_integer("bench_steps", 50,
+                            "Number of timed train steps (default: 50)")
+    tf.flags.DEFINE_string("bench_output", "",
+                           "json file to save results(default: '')")
+    tf.app.run()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+
+import os
+import sys
+import time
+import json
+import logging
+
+
+class BenchUtils(object):
+    '''benchmark工具类
+    '''
+    @staticmethod
+    def steps_per_sec(step_fn, num_steps, warmup_steps=10):
+        '''测量step_fn每秒可执行步数
+
+        Args:
+            step_fn: 无参数的单步函数
+            num_steps: 计时步数
+            warmup_steps: 预热步数，不计入耗时
+
+        Returns:
+            每秒步数
+        '''
+        for _ in range(warmup_steps):
+            step_fn()
+        start = time.time()
+        for _ in range(num_steps):
+            step_fn()
+        cost = time.time() - start
+
+        return num_steps / max(cost, 1e-9)
+
+    @staticmethod
+    def ms_per_call(fn, repeat=3, number=1):
+        '''测量fn单次调用耗时，取repeat轮中最快一轮，减少机器抖动影响
+
+        Args:
+            fn: 无参数函数
+            repeat: 测量轮数
+            number: 每轮调用次数
+
+        Returns:
+            单次调用毫秒数
+        '''
+        best = None
+        for _ in range(repeat):
+            start = time.time()
+            for _ in range(number):
+                fn()
+            cost = (time.time() - start) / number
+            best = cost if best is None else min(best, cost)
+
+        return best * 1000.0
+
+    @staticmethod
+    def compare(results, baseline_file, threshold=0.1, key="bench",
+                metric="ms"):
+        '''与基线结果对比，metric越小越好
+
+        Args:
+            results: list of dict，当前结果
+            baseline_file: report保存的基线json文件
+            threshold: 允许的相对变慢比例，超过即视为回归
+            key: 每行结果的唯一标识字段
+            metric: 对比字段
+
+        Returns:
+            回归列表，每项为(key, 基线值, 当前值, 相对变化)
+        '''
+        with open(baseline_file) as fin:
+            baseline = dict((row[key], row[metric])
+                            for row in json.load(fin)["results"])
+        regressions = []
+        for row in results:
+            if row[key] not in baseline:
+                continue
+            base = baseline[row[key]]
+            change = (row[metric] - base) / max(base, 1e-9)
+            if change > threshold:
+                regressions.append((row[key], base, row[metric], change))
+
+        return regressions
+
+    @staticmethod
+    def report(name, results, output_file=None):
+        '''打印并保存benchmark结果
+
+        Args:
+            name: benchmark名
+            results: list of dict，每个dict为一行结果
+            output_file: json结果文件，为空则不保存
+        '''
+        logging.warning("===== benchmark: {} =====".format(name))
+        for row in results:
+            logging.warning(" ".join("{}={}".format(k, row[k])
+                                     for k in sorted(row)))
+        if output_file:
+            with open(output_file, "w") as fout:
+                json.dump({"name": name, "results": results}, fout, indent=2)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''预训练词向量加载耗时: 默认2M x 300，word2vec二进制与文本格式
+首次加载为一遍扫描+写对齐的.npy，再次加载直接memory-map，同时记录峰值RSS。
+合成的词向量文件较大(二进制约2.4GB，文本约6GB)，可用--bench_vec_dir保留复用。
+在benchmarks目录下运行: python bench_word_vecs.py --bench_vec_dir /data/bench_vecs
+'''
+
+import os
+import sys
+sys.path.append(os.getcwd() + "/../")
+import io
+import time
+import shutil
+import logging
+import resource
+import tempfile
+import numpy as np
+import tensorflow as tf
+from utils.vocab_processor import VocabProcessor
+from utils.word_vec_utils import WordVecUtils
+from bench_utils import BenchUtils
+
+FLAGS = tf.flags.FLAGS
+# 合成文件每次写入的行数
+WRITE_CHUNK_ROWS = 10000
+
+
+def write_vectors(vec_file, num_words, dim, binary):
+    '''生成合成词向量文件，词为w0..w{num_words-1}
+    '''
+    rng = np.random.RandomState(1234)
+    with io.open(vec_file, "wb") as fout:
+        fout.write("{} {}\n".format(num_words, dim).encode("utf-8"))
+        for start in range(0, num_words, WRITE_CHUNK_ROWS):
+            count = min(WRITE_CHUNK_ROWS, num_words - start)
+            vectors = rng.uniform(-1, 1, (count, dim)).astype(np.float32)
+            for i in range(count):
+                word = "w{}".format(start + i).encode("utf-8")
+                if binary:
+                    fout.write(word + b" " + vectors[i].tobytes() + b"\n")
+                else:
+                    fout.write(word + b" " + b" ".join(
+                        b"%.6f" % v for v in vectors[i]) + b"\n")
+
+
+def main(argv=None):
+    logging.getLogger().setLevel(logging.WARNING)
+    vec_dir = FLAGS.bench_vec_dir or tempfile.mkdtemp(prefix="bench_vecs_")
+    if not os.path.exists(vec_dir):
+        os.makedirs(vec_dir)
+    cache_dir = tempfile.mkdtemp(prefix="bench_vecs_cache_")
+    # 词表: 一半来自词向量文件，一半未命中
+    vocab_processor = VocabProcessor(1)
+    half = FLAGS.bench_vocab_size // 2
+    vocab_processor.fit([
+        u" ".join(u"w{}".format(i * 2) for i in range(half)),
+        u" ".join(u"oov{}".format(i) for i in range(half))
+    ])
+    results = []
+    try:
+        for file_format in FLAGS.bench_formats.split(","):
+            vec_file = os.path.join(
+                vec_dir, "vecs_{}x{}.{}".format(FLAGS.bench_words,
+                                                FLAGS.bench_dim,
+                                                "bin" if file_format ==
+                                                "binary" else "txt"))
+            if not os.path.exists(vec_file):
+                write_vectors(vec_file, FLAGS.bench_words, FLAGS.bench_dim,
+                              file_format == "binary")
+            for phase in ["convert", "mmap_reload"]:
+                start = time.time()
+                table = WordVecUtils.load_aligned(vec_file, vocab_processor,
+                                                  cache_dir, file_format,
+                                                  FLAGS.pretrain_oov_init)
+                cost = time.time() - start
+                results.append({
+                    "format": file_format,
+                    "phase": phase,
+                    "words": FLAGS.bench_words,
+                    "dim": FLAGS.bench_dim,
+                    "vocab_size": len(vocab_processor),
+                    "file_mb": os.path.getsize(vec_file) / float(1 << 20),
+                    "seconds": cost,
+                    "peak_rss_mb": resource.getrusage(
+                        resource.RUSAGE_SELF).ru_maxrss / 1024.0
+                })
+                del table
+            shutil.rmtree(cache_dir)
+            os.makedirs(cache_dir)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        if not FLAGS.bench_vec_dir:
+            shutil.rmtree(vec_dir, ignore_errors=True)
+    BenchUtils.report("word_vecs", results, FLAGS.bench_output)
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_integer("bench_words", 2000000,
+                            "Number of words in vector file(default: 2M)")
+    tf.flags.DEFINE_integer("bench_dim", 300,
+                            "Dimensionality of vectors(default: 300)")
+    tf.flags.DEFINE_integer("bench_vocab_size", 200000,
+                            "Size of project vocabulary(default: 200000)")
+    tf.flags.DEFINE_string("bench_formats", "binary,text",
+                           "vector file formats to test(default: binary,text)")
+    tf.flags.DEFINE_string("bench_vec_dir", "",
+                           "dir to keep generated vector files(default: temp dir)")
+    tf.flags.DEFINE_string("pretrain_oov_init", "random",
+                           "random/mean(default: random)")
+    tf.flags.DEFINE_string("bench_output", "",
+                           "json file to save results(default: '')")
+    tf.app.run()
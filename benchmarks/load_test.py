@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''预测服务压测：多线程并发请求nlp_server，统计p50/p99延迟和QPS
+先启动demos/run_nlp_server.sh，再在benchmarks目录下运行:
+python load_test.py --url http://127.0.0.1:8080/predict --concurrency 16
+'''
+
+import os
+import io
+import sys
+import json
+import time
+import logging
+import threading
+import numpy as np
+import tensorflow as tf
+from bench_utils import BenchUtils
+try:
+    from urllib.request import Request, urlopen
+except ImportError:
+    from urllib2 import Request, urlopen
+
+
+def load_texts(filename, limit=10000):
+    '''读取压测文本
+    '''
+    texts = []
+    with io.open(filename, "r", encoding="utf-8") as fin:
+        for line in fin:
+            texts.append(line.strip())
+            if len(texts) >= limit:
+                break
+    return texts
+
+
+def worker(url, texts, batch_size, deadline, latencies, lock):
+    '''单个压测线程：循环发请求直到deadline
+    '''
+    idx = 0
+    local = []
+    while time.time() < deadline:
+        batch = [texts[(idx + i) % len(texts)] for i in range(batch_size)]
+        idx += batch_size
+        data = json.dumps({"texts": batch}).encode("utf-8")
+        request = Request(url, data, {"Content-Type": "application/json"})
+        start = time.time()
+        urlopen(request).read()
+        local.append(time.time() - start)
+    with lock:
+        latencies.extend(local)
+
+
+def main(argv=None):
+    flags = tf.flags.FLAGS
+    logging.getLogger().setLevel(logging.WARNING)
+    texts = load_texts(flags.text_file)
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.time() + flags.duration
+    threads = [
+        threading.Thread(target=worker,
+                         args=(flags.url, texts, flags.request_batch_size,
+                               deadline, latencies, lock))
+        for _ in range(flags.concurrency)
+    ]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cost = time.time() - start
+
+    latencies_ms = np.array(latencies) * 1000.0
+    BenchUtils.report("load_test", [{
+        "concurrency": flags.concurrency,
+        "request_batch_size": flags.request_batch_size,
+        "requests": len(latencies),
+        "qps": len(latencies) / cost,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99))
+    }], flags.bench_output)
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_string("url", "http://127.0.0.1:8080/predict",
+                           "predict url(default: http://127.0.0.1:8080/predict)")
+    tf.flags.DEFINE_string(
+        "text_file",
+        os.path.join(os.getcwd(), "../corpus/nlp/english/rt-polarity.pos"),
+        "texts to send(default: ../corpus/nlp/english/rt-polarity.pos)")
+    tf.flags.DEFINE_integer("concurrency", 16,
+                            "Number of client threads (default: 16)")
+    tf.flags.DEFINE_integer("request_batch_size", 1,
+                            "Number of texts per request (default: 1)")
+    tf.flags.DEFINE_integer("duration", 30,
+                            "Test duration in seconds (default: 30)")
+    tf.flags.DEFINE_string("bench_output", "",
+                           "json file to save results(default: '')")
+    tf.app.run()
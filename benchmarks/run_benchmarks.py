@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''可复现的CPU benchmark套件，用于发现layer、分类器及预处理的性能回归
+1、layers: Embedding/TextCNN/BiLSTM-Att，前向及前向+反向
+2、classifiers: TextCNN/BiLSTM-Att完整分类器，前向及训练单步
+3、data: load_data_and_labels、词表fit、batch_iter
+均使用合成数据，覆盖多个batch大小、序列长度、词表大小。
+
+在benchmarks目录下运行:
+    python run_benchmarks.py --bench_output report.json
+    python run_benchmarks.py --bench_baseline baseline.json --regression_threshold 0.1
+存在回归时以非0状态码退出，便于CI使用。
+'''
+
+import os
+import sys
+# 只在CPU上运行，保证不同机器结果可比
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+sys.path.append(os.getcwd() + "/../")
+sys.path.append(os.getcwd() + "/../demos")
+import io
+import shutil
+import random
+import logging
+import tempfile
+import numpy as np
+import tensorflow as tf
+from executes.init_processor import InitProcessor
+from utils.tf_utils import TFUtils
+from utils.vocab_processor import VocabProcessor
+from utils.session_tuner import SessionTuner
+from layers.tf_embedding_layer import TFEmbeddingLayer
+from layers.tf_textcnn_layer import TFTextCNNLayer
+from layers.tf_bilstm_att_layer import TFBILSTMAttLayer
+from models.nlp.classification.tf_textcnn_classifier import TFTextCNNClassifier
+from models.nlp.classification.tf_bilstmatt_classifier import TFBILSTMATTClassifier
+from bench_utils import BenchUtils
+
+BATCH_SIZES = [32, 128]
+SEQ_LENS = [32, 128]
+VOCAB_SIZES = [10000, 100000]
+SEED = 1234
+
+
+def session_config(flags):
+    '''固定线程数、禁用GPU的会话配置
+    '''
+    config = SessionTuner.build_config({
+        "intra_op_parallelism_threads":
+        flags.intra_op_parallelism_threads,
+        "inter_op_parallelism_threads":
+        flags.inter_op_parallelism_threads,
+        "xla_jit": False,
+        "constant_folding": True
+    })
+    config.device_count["GPU"] = 0
+
+    return config
+
+
+def synthetic_batch(batch_size, seq_len, vocab_size, cls_num=2):
+    '''合成输入: 长度在[seq_len/2, seq_len]间均匀分布，其后补0
+    '''
+    rng = np.random.RandomState(SEED)
+    x = rng.randint(1, vocab_size, size=[batch_size, seq_len])
+    lengths = rng.randint(max(1, seq_len // 2), seq_len + 1, size=batch_size)
+    x[np.arange(seq_len)[None, :] >= lengths[:, None]] = 0
+    y = np.eye(cls_num, dtype=np.float32)[rng.randint(0, cls_num,
+                                                      size=batch_size)]
+
+    return x.astype(np.int32), y
+
+
+def build_layer(name, flags, input_x):
+    '''构建被测layer
+
+    Returns:
+        layer输出
+    '''
+    embedding = TFEmbeddingLayer(input_x, flags.vocab_size,
+                                 flags.emb_size).build()
+    if name == "embedding":
+        return embedding
+    if name in ("textcnn", "textcnn_fused"):
+        return TFTextCNNLayer(embedding,
+                              list(map(int, flags.filter_sizes.split(","))),
+                              flags.num_filters,
+                              name == "textcnn_fused").build()
+    return TFBILSTMAttLayer(embedding,
+                            list(map(int, flags.hidden_sizes.split(","))),
+                            flags.attention_size, 1.0,
+                            TFUtils.sequence_length(input_x)).build()
+
+
+def bench_layer(name, flags, batch_size, seq_len, vocab_size):
+    '''layer前向、前向+反向耗时
+    '''
+    flags = TFUtils.override_flags(flags, vocab_size=vocab_size)
+    x, _ = synthetic_batch(batch_size, seq_len, vocab_size)
+    graph = tf.Graph()
+    with graph.as_default():
+        tf.set_random_seed(SEED)
+        input_x = tf.placeholder(tf.int32, [None, None], name="input_x")
+        output = build_layer(name, flags, input_x)
+        # 以输出之和为目标，反向覆盖layer内所有参数
+        grads = tf.gradients(tf.reduce_sum(output), tf.trainable_variables())
+        with tf.Session(graph=graph, config=session_config(flags)) as sess:
+            sess.run(tf.global_variables_initializer())
+            feed_dict = {input_x: x}
+            fwd_ms = 1000.0 / BenchUtils.steps_per_sec(
+                lambda: sess.run(output, feed_dict), flags.bench_steps)
+            bwd_ms = 1000.0 / BenchUtils.steps_per_sec(
+                lambda: sess.run(grads, feed_dict), flags.bench_steps)
+
+    return fwd_ms, bwd_ms
+
+
+def bench_classifier(name, flags, batch_size, seq_len, vocab_size):
+    '''完整分类器前向及训练单步耗时
+    '''
+    flags = TFUtils.override_flags(flags,
+                                   mode="train",
+                                   input_mode="feed_dict",
+                                   num_towers=1,
+                                   vocab_size=vocab_size)
+    x, y = synthetic_batch(batch_size, seq_len, vocab_size, flags.cls_num)
+    graph = tf.Graph()
+    with graph.as_default():
+        tf.set_random_seed(SEED)
+        if name == "textcnn":
+            model = TFTextCNNClassifier(flags).build_model()
+        else:
+            model = TFBILSTMATTClassifier(flags).build_model()
+        model.add_metrics()
+        model.add_train_op()
+        with tf.Session(graph=graph, config=session_config(flags)) as sess:
+            sess.run(tf.global_variables_initializer())
+            sess.run(tf.local_variables_initializer())
+            feed_dict = {model.input_x: x, model.input_y: y}
+            fwd_ms = 1000.0 / BenchUtils.steps_per_sec(
+                lambda: sess.run(model.probability, feed_dict),
+                flags.bench_steps)
+            feed_dict[model.keep_prob] = flags.keep_prob
+            train_ms = 1000.0 / BenchUtils.steps_per_sec(
+                lambda: sess.run([model.train_op, model.loss], feed_dict),
+                flags.bench_steps)
+
+    return fwd_ms, train_ms
+
+
+def bench_data(flags, num_docs, doc_len, vocab_size):
+    '''预处理路径耗时: 读文件+清洗+打标签、词表fit、batch_iter遍历一个epoch
+    '''
+    rng = random.Random(SEED)
+    words = ["w%d" % i for i in range(vocab_size)]
+    tmp_dir = tempfile.mkdtemp(prefix="bench_data_")
+    try:
+        files = []
+        for label in ["pos", "neg"]:
+            filename = os.path.join(tmp_dir, label)
+            with io.open(filename, "w", encoding="utf-8") as fout:
+                for _ in range(num_docs // 2):
+                    fout.write(u" ".join(
+                        rng.choice(words) for _ in range(doc_len)) + u"\n")
+            files.append(filename)
+        load_ms = BenchUtils.ms_per_call(
+            lambda: TFUtils.load_data_and_labels(files[0], files[1]))
+        texts, labels = TFUtils.load_data_and_labels(files[0], files[1])
+    finally:
+        shutil.rmtree(tmp_dir)
+    fit_ms = BenchUtils.ms_per_call(
+        lambda: VocabProcessor(doc_len).fit(texts, flags.preprocess_workers))
+    x = VocabProcessor(doc_len).fit_transform(texts, flags.preprocess_workers)
+
+    def consume():
+        for _ in TFUtils.batch_iter(list(zip(x, labels)), flags.batch_size,
+                                    1):
+            pass
+
+    iter_ms = BenchUtils.ms_per_call(consume)
+
+    return load_ms, fit_ms, iter_ms
+
+
+def main(argv=None):
+    flags = InitProcessor().execute({})
+    logging.getLogger().setLevel(logging.WARNING)
+    np.random.seed(SEED)
+    suites = flags.bench_suites.split(",")
+
+    results = []
+
+    def add(bench, ms, **kwargs):
+        row = {"bench": bench, "ms": ms}
+        row.update(kwargs)
+        results.append(row)
+
+    for batch_size in BATCH_SIZES:
+        for seq_len in SEQ_LENS:
+            for vocab_size in VOCAB_SIZES:
+                shape = "b{}_t{}_v{}".format(batch_size, seq_len, vocab_size)
+                params = {
+                    "batch_size": batch_size,
+                    "seq_len": seq_len,
+                    "vocab_size": vocab_size
+                }
+                if "layers" in suites:
+                    for name in [
+                            "embedding", "textcnn", "textcnn_fused",
+                            "bilstm_att"
+                    ]:
+                        fwd_ms, bwd_ms = bench_layer(name, flags, batch_size,
+                                                     seq_len, vocab_size)
+                        add("layer/{}/fwd/{}".format(name, shape), fwd_ms,
+                            **params)
+                        add("layer/{}/fwd_bwd/{}".format(name, shape), bwd_ms,
+                            **params)
+                if "classifiers" in suites:
+                    for name in ["textcnn", "bilstm_att"]:
+                        fwd_ms, train_ms = bench_classifier(
+                            name, flags, batch_size, seq_len, vocab_size)
+                        add("classifier/{}/fwd/{}".format(name, shape),
+                            fwd_ms,
+                            examples_per_sec=batch_size * 1000.0 / fwd_ms,
+                            **params)
+                        add("classifier/{}/train/{}".format(name, shape),
+                            train_ms,
+                            examples_per_sec=batch_size * 1000.0 / train_ms,
+                            **params)
+    if "data" in suites:
+        for vocab_size in VOCAB_SIZES:
+            load_ms, fit_ms, iter_ms = bench_data(flags, flags.bench_docs,
+                                                  max(SEQ_LENS), vocab_size)
+            params = {"num_docs": flags.bench_docs, "vocab_size": vocab_size}
+            add("data/load_data_and_labels/v{}".format(vocab_size), load_ms,
+                **params)
+            add("data/vocab_fit/v{}".format(vocab_size), fit_ms, **params)
+            add("data/batch_iter/v{}".format(vocab_size), iter_ms, **params)
+
+    BenchUtils.report("suite", results, flags.bench_output)
+    if flags.bench_baseline and os.path.exists(flags.bench_baseline):
+        regressions = BenchUtils.compare(results, flags.bench_baseline,
+                                         flags.regression_threshold)
+        for bench, base, current, change in regressions:
+            logging.warning("REGRESSION {}: {:.3f}ms -> {:.3f}ms ({:+.1%})".
+                            format(bench, base, current, change))
+        if regressions:
+            sys.exit(1)
+        logging.warning("No regression against {} (threshold {:.0%})".format(
+            flags.bench_baseline, flags.regression_threshold))
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_integer("max_seq_len", 128,
+                            "max len of input seq(default: 128)")
+    tf.flags.DEFINE_integer("bench_steps", 20,
+                            "Number of timed steps per graph (default: 20)")
+    tf.flags.DEFINE_integer(
+        "bench_docs", 20000,
+        "Number of synthetic docs for data benchmarks (default: 20000)")
+    tf.flags.DEFINE_string("bench_suites", "layers,classifiers,data",
+                           "benchmarks to run(default: all)")
+    tf.flags.DEFINE_string("bench_output", "bench_report.json",
+                           "json file to save results(default: bench_report.json)")
+    tf.flags.DEFINE_string(
+        "bench_baseline", "",
+        "baseline json saved by a previous run to compare against(default: '')")
+    tf.flags.DEFINE_float(
+        "regression_threshold", 0.1,
+        "relative slowdown against baseline treated as regression(default: 0.1)")
+    tf.app.run()
@@ -4,30 +4,242 @@
 
 import os
 import sys
+import time
+import pickle
+import hashlib
 import logging
+import resource
+from multiprocessing.pool import ThreadPool
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 
 class Executor(object):
     '''执行器：执行器用于串联一系列processor，从而运行核心程序
+    1、processor间按声明的依赖构成DAG，无依赖关系的processor在线程池中并行执行
+    2、processor实现cache_key(params)时，结果按key pickle到cache_dir，
+       再次运行(如失败后重跑)时直接加载；可选实现restore(params, result)恢复副作用，
+       返回False表示缓存不可用
+    3、processor结果在所有下游processor执行完后从returns中释放，keep=True的除外
+    4、记录每个processor的耗时、执行前后的常驻内存增量及结束时的进程峰值内存
     '''
-    def __init__(self):
+    def __init__(self, returns=None, num_workers=1, cache_dir=""):
         '''初始化：执行哪个任务由task_name指定
+
+        Args:
+            returns: 已有的processor返回值，如多次实验共享的INIT、PRE结果
+            num_workers: 并行执行processor的线程数，1为在主线程按顺序执行
+            cache_dir: processor结果缓存目录，为空则不缓存
         '''
         # processor 返回值
-        self.returns = {}
+        self.returns = dict(returns or {})
         # processor list
         self.pro_list = []
+        # processor名 -> 依赖的processor名list
+        self.deps = {}
+        # 执行完后保留结果的processor名
+        self.keep = set()
+        self.num_workers = num_workers
+        self.cache_dir = cache_dir
+        # processor名 -> 耗时、内存增量、进程峰值内存、是否命中缓存
+        self.stats = {}
 
-    def add_processor(self, processor):
+    def add_processor(self, processor, deps=None, keep=False):
         '''添加一个processor
+
+        Args:
+            processor: 处理器
+            deps: 依赖的processor名list，为None时依赖外部传入的全部结果
+                及之前添加的全部processor
+            keep: 是否在执行完后保留结果，为False时下游都执行完即释放
         '''
+        if deps is None:
+            deps = list(self.returns) + [pro.name for pro in self.pro_list]
+        self.deps[processor.name] = list(deps)
+        if keep:
+            self.keep.add(processor.name)
         self.pro_list.append(processor)
 
     def run(self):
-        '''按顺序执行所有processor
+        '''按依赖执行所有processor
+        '''
+        names = set(pro.name for pro in self.pro_list) | set(self.returns)
+        for processor in self.pro_list:
+            missing = [d for d in self.deps[processor.name] if d not in names]
+            if missing:
+                raise ValueError("{} depends on unknown processors: {}".format(
+                    processor.name, ",".join(missing)))
+        # 被依赖计数，降到0时释放结果
+        consumers = dict((pro.name, 0) for pro in self.pro_list)
+        for processor in self.pro_list:
+            for dep in self.deps[processor.name]:
+                if dep in consumers:
+                    consumers[dep] += 1
+
+        if self.cache_dir and not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        done = set(self.returns)
+        pending = list(self.pro_list)
+        running = set()
+        finished = queue.Queue()
+        pool = ThreadPool(self.num_workers) if self.num_workers > 1 else None
+        error = None
+        try:
+            while pending or running:
+                # 提交依赖都已完成的processor
+                if error is None:
+                    for processor in list(pending):
+                        if not all(d in done
+                                   for d in self.deps[processor.name]):
+                            continue
+                        pending.remove(processor)
+                        running.add(processor.name)
+                        params = dict((d, self.returns[d])
+                                      for d in self.deps[processor.name])
+                        if pool is None:
+                            self._run_stage(processor, params, finished)
+                        else:
+                            pool.apply_async(self._run_stage,
+                                             (processor, params, finished))
+                if not running:
+                    if error is None:
+                        raise ValueError(
+                            "dependency cycle among processors: {}".format(
+                                ",".join(pro.name for pro in pending)))
+                    break
+                name, result, stage_error = finished.get()
+                running.remove(name)
+                if stage_error is not None:
+                    # 不再提交新的processor，等待执行中的结束
+                    error = error or stage_error
+                    continue
+                self.returns[name] = result
+                done.add(name)
+                self._release(name, consumers)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        self._log_stats()
+        if error is not None:
+            raise error
+
+    def _release(self, name, consumers):
+        '''processor执行完后，释放不再被依赖的上游结果
+        '''
+        for dep in self.deps[name]:
+            if dep not in consumers:
+                # 外部传入的结果由调用方管理
+                continue
+            consumers[dep] -= 1
+            if consumers[dep] == 0 and dep not in self.keep:
+                del self.returns[dep]
+                logging.info(dep + " processor result released.")
+
+    def _run_stage(self, processor, params, finished):
+        '''执行单个processor(可能在工作线程中)，结果放入finished队列
+        '''
+        logging.info(processor.name + " processor started.")
+        start = time.time()
+        start_rss = self._current_rss_mb()
+        try:
+            result, cached = self._execute(processor, params)
+        except Exception as e:
+            logging.exception(processor.name + " processor failed.")
+            finished.put((processor.name, None, e))
+            return
+        end_rss = self._current_rss_mb()
+        # 增量为该processor执行后多占用的常驻内存，并行执行时包含同时运行的processor；
+        # linux下ru_maxrss单位为KB，是进程启动以来的峰值，不是该processor的峰值
+        self.stats[processor.name] = {
+            "seconds": time.time() - start,
+            "rss_delta_mb": None if start_rss is None or end_rss is None else
+            end_rss - start_rss,
+            "process_peak_rss_mb":
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+            "cached": cached
+        }
+        logging.info(processor.name + " processor finished.")
+        finished.put((processor.name, result, None))
+
+    def _execute(self, processor, params):
+        '''执行processor，优先加载缓存
+
+        Returns:
+            (结果, 是否命中缓存)
+        '''
+        cache_file = self._cache_file(processor, params)
+        if cache_file and os.path.exists(cache_file):
+            loaded, result = self._load_cache(cache_file)
+            restore = getattr(processor, "restore", None)
+            if loaded and (restore is None
+                           or restore(params, result) is not False):
+                logging.info("{} processor loaded from {}".format(
+                    processor.name, cache_file))
+                return result, True
+        # 执行并存储返回值，返回值同时也是下游processor的输入参数
+        result = processor.execute(params)
+        if cache_file:
+            # 先写临时文件再改名，避免中断时留下不完整的缓存
+            tmp_file = cache_file + ".tmp"
+            with open(tmp_file, "wb") as fout:
+                pickle.dump(result, fout, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_file, cache_file)
+
+        return result, False
+
+    def _load_cache(self, cache_file):
+        '''加载缓存结果
+
+        Returns:
+            (是否加载成功, 结果)
+        '''
+        try:
+            with open(cache_file, "rb") as fin:
+                return True, pickle.load(fin)
+        except Exception:
+            # 缓存损坏或引用的文件已不存在，重新执行
+            logging.warning("Failed to load {}, ignored".format(cache_file))
+            return False, None
+
+    def _cache_file(self, processor, params):
+        '''processor结果缓存文件，不缓存时返回None
+        '''
+        if not self.cache_dir or not hasattr(processor, "cache_key"):
+            return None
+        key = processor.cache_key(params)
+        if key is None:
+            return None
+        md5 = hashlib.md5((processor.name + key).encode("utf-8"))
+
+        return os.path.join(self.cache_dir,
+                            "{}-{}.pkl".format(processor.name, md5.hexdigest()))
+
+    @staticmethod
+    def _current_rss_mb():
+        '''当前进程常驻内存(MB)，非linux无/proc时返回None
+        '''
+        try:
+            with open("/proc/self/statm") as fin:
+                pages = int(fin.read().split()[1])
+        except (IOError, OSError, IndexError, ValueError):
+            return None
+        return pages * resource.getpagesize() / 1024.0 / 1024.0
+
+    def _log_stats(self):
+        '''打印各processor耗时、内存增量及进程峰值内存
         '''
         for processor in self.pro_list:
-            logging.info(processor.name + " processor started.")
-            # 执行并存储返回值，返回值同时也是下一个processor的输入参数
-            self.returns[processor.name] = processor.execute(self.returns)
-            logging.info(processor.name + " processor finished.")
+            stat = self.stats.get(processor.name)
+            if stat is None:
+                continue
+            delta = stat["rss_delta_mb"]
+            logging.info(
+                "{}: {:.2f}s, rss {}, process peak rss {:.1f}MB{}".format(
+                    processor.name, stat["seconds"],
+                    "n/a" if delta is None else "{:+.1f}MB".format(delta),
+                    stat["process_peak_rss_mb"],
+                    ", cached" if stat["cached"] else ""))
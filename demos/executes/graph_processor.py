@@ -4,9 +4,12 @@
 
 import os
 import sys
+import json
 sys.path.append(os.getcwd() + "/../../")
+import logging
 import tensorflow as tf
 import numpy as np
+from utils.word_vec_utils import WordVecUtils
 from models.nlp.classification.tf_bilstmatt_classifier import TFBILSTMATTClassifier
 from models.nlp.classification.tf_textcnn_classifier import TFTextCNNClassifier
 
@@ -23,6 +26,29 @@ class GraphProcessor(object):
         # 获取前序processor结果
         flags = params["INIT"]
         x_train, y_train, vocab_processor, x_dev, y_dev = params["PRE"]
+        # 预训练词向量: 按词表对齐的memory-map，只在训练时用于初始化
+        pretrain_word_vecs = None
+        if flags.mode == "train" and flags.pretrain_vec_file:
+            pretrain_word_vecs = WordVecUtils.load_aligned(
+                flags.pretrain_vec_file,
+                vocab_processor,
+                os.path.abspath(
+                    os.path.join(os.path.curdir,
+                                 "../" + flags.save_path, "word_vecs")),
+                flags.pretrain_vec_format,
+                flags.pretrain_oov_init)
+            flags.emb_size = pretrain_word_vecs.shape[1]
+            logging.info("Pretrain word vectors: {}".format(
+                pretrain_word_vecs.shape))
+        # 预测时使用训练时的emb_size，旧checkpoint无该文件时使用flags
+        conf_file = os.path.join(flags.checkpoint_dir, "model_conf.json")
+        if flags.mode == "infer" and os.path.exists(conf_file):
+            with open(conf_file) as fin:
+                emb_size = json.load(fin)["emb_size"]
+            if emb_size != flags.emb_size:
+                logging.info("emb_size={} restored from {}".format(
+                    emb_size, conf_file))
+            flags.emb_size = emb_size
         # 创建图
         graph = tf.Graph()
         # 构图
@@ -30,9 +56,11 @@ class GraphProcessor(object):
             # 创建模型
             model = None
             if flags.task_name == "TextCNN":
-                model = TFTextCNNClassifier(flags).build_model()
+                model = TFTextCNNClassifier(flags)
             elif flags.task_name == "BILSTMAtt":
-                model = TFBILSTMATTClassifier(flags).build_model()
+                model = TFBILSTMATTClassifier(flags)
+            model.pretrain_word_vecs = pretrain_word_vecs
+            model.build_model()
             # 添加统计指标
             model.add_metrics()
             # 添加训练优化器等
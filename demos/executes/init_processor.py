@@ -42,6 +42,73 @@ class InitProcessor(object):
                          "../corpus/nlp/english/rt-polarity.neg"),
             "Data source for the negative data.(default: ../corpus/nlp/english/rt-polarity.neg)"
         )
+        # 分片语料流式读取，设置后替代positive/negative_data_file
+        tf.flags.DEFINE_string(
+            "corpus_files", "",
+            "sharded corpus files, comma separated, 'label:glob' for text or 'glob' for jsonl(default: '')"
+        )
+        tf.flags.DEFINE_string("corpus_format", "text",
+                               "corpus file format, text/jsonl(default: text)")
+        tf.flags.DEFINE_string(
+            "label_names", "",
+            "comma separated label names defining label order, auto-collected if empty(default: '')"
+        )
+
+        # 词表相关参数
+        tf.flags.DEFINE_integer(
+            "preprocess_workers", 4,
+            "Number of processes to count tokens (default: 4)")
+        tf.flags.DEFINE_integer(
+            "min_frequency", 0,
+            "Min token frequency to enter vocabulary (default: 0)")
+        tf.flags.DEFINE_integer(
+            "max_vocab_size", 0,
+            "Keep top-k frequent tokens only, 0 for unlimited (default: 0)")
+        # 文本预处理相关参数
+        tf.flags.DEFINE_boolean("text_lowercase", True,
+                                "Lowercase texts(default: True)")
+        tf.flags.DEFINE_boolean(
+            "text_split_punct", False,
+            "Keep punctuations as separate tokens instead of dropping them(default: False)"
+        )
+        tf.flags.DEFINE_string(
+            "text_chinese", "none",
+            "Chinese handling, none/char/word, word needs jieba(default: none)")
+
+        # 预处理缓存相关参数
+        tf.flags.DEFINE_string(
+            "cache_dir", "cache",
+            "dir of preprocessed data cache, under the parent of save_path, empty to disable(default: 'cache')"
+        )
+        tf.flags.DEFINE_integer("cache_max_mb", 2048,
+                                "Max size of data cache in MB (default: 2048)")
+
+        # 输入管道相关参数
+        tf.flags.DEFINE_string(
+            "input_mode", "feed_dict",
+            "train input mode, feed_dict/dataset/binary(default: feed_dict)")
+        tf.flags.DEFINE_string(
+            "data_path", "data",
+            "dir of tfrecord shards or binary corpus, under the parent of save_path(default: 'data')"
+        )
+        tf.flags.DEFINE_string(
+            "train_files", "",
+            "comma separated tfrecord files for dataset mode, will auto-update after PreProcessor(default: '')"
+        )
+        tf.flags.DEFINE_integer("num_shards", 4,
+                                "Number of tfrecord shards (default: 4)")
+        tf.flags.DEFINE_integer(
+            "shuffle_buffer_size", 10000,
+            "Size of dataset shuffle buffer (default: 10000)")
+        tf.flags.DEFINE_integer(
+            "num_parallel_calls", 4,
+            "Number of threads to read and parse records (default: 4)")
+        tf.flags.DEFINE_integer("prefetch_size", 2,
+                                "Number of batches to prefetch (default: 2)")
+        tf.flags.DEFINE_string(
+            "bucket_boundaries", "",
+            "comma separated seq length bucket boundaries, e.g. '16,32,64', pad per batch when set(default: '')"
+        )
 
         # 分类器公共参数
         tf.flags.DEFINE_integer("cls_num", 2, "size of classes(default: 2)")
@@ -55,8 +122,32 @@ class InitProcessor(object):
         )
         tf.flags.DEFINE_integer(
             "emb_size", 128, "Dimensionality of word embedding (default: 128)")
+        tf.flags.DEFINE_integer(
+            "emb_partitions", 1,
+            "Number of shards of the word embedding table, >1 uses a partitioned variable(default: 1)"
+        )
+        tf.flags.DEFINE_integer(
+            "hash_buckets", 0,
+            "Number of hash buckets for out-of-vocabulary words, 0 maps them all to id 0(default: 0)"
+        )
+        tf.flags.DEFINE_boolean(
+            "hash_only", False,
+            "Feature hashing, skip building vocabulary and hash all words into hash_buckets(default: False)"
+        )
         #tf.flags.DEFINE_integer("max_seq_len", 1024,
         #                        "max len of input seq(default: 1024)")
+        tf.flags.DEFINE_string(
+            "pretrain_vec_file", "",
+            "pretrained word2vec/GloVe vectors to init word embedding, emb_size follows its dim(default: '')"
+        )
+        tf.flags.DEFINE_string(
+            "pretrain_vec_format", "auto",
+            "pretrained vectors format, auto/text/binary, auto treats .bin as word2vec binary(default: auto)"
+        )
+        tf.flags.DEFINE_string(
+            "pretrain_oov_init", "random",
+            "init of vocab words missing in pretrained vectors, random/mean(default: random)"
+        )
         tf.flags.DEFINE_boolean(
             "word_emb_trainable", True,
             "pretrain word embedding trainable(default: True)")
@@ -67,6 +158,10 @@ class InitProcessor(object):
         tf.flags.DEFINE_integer(
             "num_filters", 128,
             "Number of filters per filter size (default: 128)")
+        tf.flags.DEFINE_boolean(
+            "textcnn_fused", False,
+            "run all filter sizes in one padded conv, same variables and outputs as per-filter convs(default: False)"
+        )
 
         # BILSTMATT相关参数
         tf.flags.DEFINE_string(
@@ -75,6 +170,14 @@ class InitProcessor(object):
         )
         tf.flags.DEFINE_integer("attention_size", 128,
                                 "BILSTM-Attention size(default: 128)")
+        tf.flags.DEFINE_integer(
+            "attention_heads", 1,
+            "Number of attention pooling heads, outputs are concatenated(default: 1)"
+        )
+        tf.flags.DEFINE_string(
+            "rnn_type", "lstm",
+            "BILSTM backend, lstm/lstm_block_fused/gru, lstm and lstm_block_fused share checkpoints(default: lstm)"
+        )
 
         # 训练相关参数
         tf.flags.DEFINE_float("lr", 1e-3, "learning rate (default: 1e-3)")
@@ -85,6 +188,9 @@ class InitProcessor(object):
                               "Dropout keep probability (default: 0.5)")
         tf.flags.DEFINE_float("l2_reg_lambda", 0.0,
                               "L2 regularization lambda (default: 0.0)")
+        tf.flags.DEFINE_integer(
+            "eval_batch_size", 256,
+            "Batch Size of chunked dev evaluation (default: 256)")
         tf.flags.DEFINE_integer(
             "evaluate_every", 100,
             "Evaluate model on dev set after this many steps (default: 100)")
@@ -93,9 +199,20 @@ class InitProcessor(object):
             "Save model after this many steps (default: 100)")
         tf.flags.DEFINE_integer("num_checkpoints", 5,
                                 "Number of checkpoints to store (default: 5)")
-        tf.flags.DEFINE_string("opt", "adam", "Optimizer name(default: adam)")
+        tf.flags.DEFINE_integer(
+            "num_towers", 1,
+            "Number of data-parallel towers sharing variables in one graph, batch is split across towers(default: 1)"
+        )
+        tf.flags.DEFINE_string(
+            "opt", "adam",
+            "Optimizer name, adam/lazy_adam/rmsprop/sgd, lazy_adam only updates embedding rows seen in the batch(default: adam)"
+        )
         tf.flags.DEFINE_float("max_grad_norm", 5.0,
                               "Max Gradient Norm(default: 5.0)")
+        tf.flags.DEFINE_string(
+            "precision", "float32",
+            "compute precision, float32/bfloat16, bfloat16 keeps float32 master weights and loss(default: float32)"
+        )
 
         #  设备及日志相关
         tf.flags.DEFINE_boolean(
@@ -103,8 +220,47 @@ class InitProcessor(object):
             "Allow device soft device placement")  # 如果指定设备不存在，tf自动分配设备
         tf.flags.DEFINE_boolean("log_device_placement", False,
                                 "Log placement of ops on devices")  # 是否打印备份日志
+        tf.flags.DEFINE_integer(
+            "intra_op_parallelism_threads", 0,
+            "Threads used inside one op, 0 for tf default(default: 0)")
+        tf.flags.DEFINE_integer(
+            "inter_op_parallelism_threads", 0,
+            "Threads used to run independent ops, 0 for tf default(default: 0)")
+        tf.flags.DEFINE_boolean("xla_jit", False,
+                                "Enable XLA JIT compilation(default: False)")
+        tf.flags.DEFINE_boolean(
+            "constant_folding", True,
+            "Enable grappler constant folding(default: True)")
+        tf.flags.DEFINE_boolean(
+            "use_tuned_session", True,
+            "Use session conf tuned for this host by tune_session.py if exists, non-zero thread flags take precedence(default: True)"
+        )
+        tf.flags.DEFINE_string(
+            "session_conf_dir", "session_conf",
+            "dir of tuned session conf per host, under the parent of save_path(default: 'session_conf')"
+        )
+        tf.flags.DEFINE_integer(
+            "summary_every", 100,
+            "Write model summaries to save_path/profile after this many steps, 0 to disable(default: 100)"
+        )
+        tf.flags.DEFINE_string(
+            "trace_steps", "",
+            "comma separated steps to capture full RunMetadata trace and chrome timeline, e.g. 10,500(default: '')"
+        )
         tf.flags.DEFINE_string("save_path", "save_models",
                                "save_path (default: 'save_models')")
+        tf.flags.DEFINE_boolean(
+            "export_model", False,
+            "export frozen inference SavedModel to save_path/export after training(default: False)"
+        )
+        tf.flags.DEFINE_string(
+            "export_quantize", "none",
+            "weight precision of exported model, none/int8/float16(default: none)"
+        )
+        tf.flags.DEFINE_string(
+            "checkpoint_dir", "",
+            "checkpoint dir to restore in infer mode or serving, e.g. ../save_models/1589251118/checkpoints(default: '')"
+        )
 
         # 打印所有参数
         for key in tf.flags.FLAGS.flag_values_dict():
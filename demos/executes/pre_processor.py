@@ -4,10 +4,15 @@
 
 import os
 import sys
+import json
 sys.path.append(os.getcwd() + "/../../")
 from utils.tf_utils import TFUtils
+from utils.corpus_reader import CorpusReader
+from utils.vocab_processor import VocabProcessor
+from utils.data_cache import DataCache
+from utils.text_processor import TextProcessor
+from utils.binary_corpus import BinaryCorpus
 import tensorflow as tf
-from tensorflow.contrib import learn
 import numpy as np
 import logging
 
@@ -26,16 +31,48 @@ class PreProcessor(object):
         # 脚本参数
         flags = params["INIT"]
 
+        # 预测模式使用训练时的词表
+        if flags.mode == "infer":
+            return self._execute_infer(flags)
+
+        # 分片语料流式处理
+        if flags.corpus_files:
+            return self._execute_streaming(flags)
+
+        # 优先从缓存memory-map加载
+        cache = None
+        if flags.cache_dir:
+            cache = DataCache(self._data_dir(flags, flags.cache_dir),
+                              flags.cache_max_mb << 20)
+            cache_key = cache.key(
+                [flags.positive_data_file, flags.negative_data_file], {
+                    "max_seq_len": flags.max_seq_len,
+                    "min_frequency": flags.min_frequency,
+                    "max_vocab_size": flags.max_vocab_size,
+                    "hash_buckets": flags.hash_buckets,
+                    "hash_only": flags.hash_only,
+                    "text_processor": self._new_text_processor(flags).config,
+                    "dev_sample_percentage": flags.dev_sample_percentage
+                })
+            cached = cache.load(cache_key)
+            if cached is not None:
+                arrays, entry_dir = cached
+                vocab_processor = VocabProcessor.restore(
+                    os.path.join(entry_dir, "vocab"))
+                flags.vocab_size = len(vocab_processor)
+                return self._finish(flags, arrays["x_train"],
+                                    arrays["y_train"], vocab_processor,
+                                    arrays["x_dev"], arrays["y_dev"])
+
         # 加载样本
-        x_text, y = TFUtils.load_data_and_labels(flags.positive_data_file,
-                                                 flags.negative_data_file)
+        x_text, y = TFUtils.load_data_and_labels(
+            flags.positive_data_file, flags.negative_data_file,
+            self._new_text_processor(flags))
 
         # 构建词表
-        max_document_length = flags.max_seq_len
-        vocab_processor = learn.preprocessing.VocabularyProcessor(
-            max_document_length)
-        x = np.array(list(vocab_processor.fit_transform(x_text)))
-        flags.vocab_size = len(vocab_processor.vocabulary_) + 1
+        vocab_processor = self._new_vocab_processor(flags)
+        x = vocab_processor.fit_transform(x_text, flags.preprocess_workers)
+        flags.vocab_size = len(vocab_processor)
 
         # 随机打乱数据
         np.random.seed(10)
@@ -51,9 +88,244 @@ class PreProcessor(object):
         y_train, y_dev = y_shuffled[:dev_sample_index], y_shuffled[
             dev_sample_index:]
 
-        logging.info("Vocabulary Size: {:d}".format(
-            len(vocab_processor.vocabulary_)))
+        if cache is not None:
+            cache.save(
+                cache_key, {
+                    "x_train": x_train,
+                    "y_train": y_train,
+                    "x_dev": x_dev,
+                    "y_dev": y_dev
+                }, {"vocab": vocab_processor.save})
+
+        return self._finish(flags, x_train, y_train, vocab_processor, x_dev,
+                            y_dev)
+
+    def cache_key(self, params):
+        '''Executor结果缓存key
+        只缓存分片语料流式预处理(词表、验证集，训练集TFRecord分片已落盘)，
+        内存语料由DataCache缓存，返回None
+
+        Returns:
+            key字符串或None
+        '''
+        flags = params["INIT"]
+        if not flags.corpus_files:
+            return None
+        reader = self._new_corpus_reader(flags)
+
+        return json.dumps(
+            {
+                "files": [DataCache.fingerprint(path)
+                          for path, _ in reader.files],
+                "label_names": reader.label_names,
+                "corpus_format": flags.corpus_format,
+                "max_seq_len": flags.max_seq_len,
+                "min_frequency": flags.min_frequency,
+                "max_vocab_size": flags.max_vocab_size,
+                "hash_buckets": flags.hash_buckets,
+                "hash_only": flags.hash_only,
+                "text_processor": self._new_text_processor(flags).config,
+                "dev_sample_percentage": flags.dev_sample_percentage,
+                "num_shards": flags.num_shards,
+                "binary": flags.input_mode == "binary",
+                "data_dir": self._data_dir(flags, flags.data_path)
+            },
+            sort_keys=True)
+
+    def restore(self, params, result):
+        '''加载缓存结果后恢复execute对flags的修改
+
+        Returns:
+            训练集分片或二进制语料不完整时返回False，重新预处理
+        '''
+        flags = params["INIT"]
+        if flags.input_mode == "binary":
+            if not BinaryCorpus.exists(self._binary_prefix(flags)):
+                return False
+        else:
+            train_files = self._train_files(flags)
+            if not all(os.path.exists(f) for f in train_files):
+                return False
+            flags.input_mode = "dataset"
+            flags.train_files = ",".join(train_files)
+        # 类目可能是遍历语料时收集的，从验证集标签维度恢复
+        flags.cls_num = result[4].shape[1]
+        flags.vocab_size = len(result[2])
+
+        return True
+
+    def _finish(self, flags, x_train, y_train, vocab_processor, x_dev, y_dev):
+        '''打印统计信息，dataset模式下写TFRecord分片，binary模式下写二进制语料
+
+        Returns:
+            x_train, y_train, vocab_processor, x_dev, y_dev
+        '''
+        logging.info("Vocabulary Size: {:d}".format(len(vocab_processor)))
         logging.info("Train/Dev split: {:d}/{:d}".format(
             len(y_train), len(y_dev)))
 
+        # tf.data输入模式：训练集写成TFRecord分片，训练时从文件流式读取
+        if flags.input_mode == "dataset":
+            self._write_train_files(flags, zip(x_train, y_train))
+        # 二进制语料模式：训练集写成memory-map文件，训练时按索引gather
+        elif flags.input_mode == "binary":
+            x_train = self._write_binary(flags, zip(x_train, y_train))
+            y_train = None
+
         return x_train, y_train, vocab_processor, x_dev, y_dev
+
+    def _execute_streaming(self, flags):
+        '''分片语料流式预处理，内存占用与语料规模无关
+        只有词表和验证集驻留内存，训练集边读边转id边写TFRecord分片或二进制语料。
+        '''
+        reader = self._new_corpus_reader(flags)
+
+        # 第一遍：流式构建词表，jsonl未指定类目名时同时收集类目
+        vocab_processor = self._new_vocab_processor(flags)
+        texts = reader.scan_texts()
+        vocab_processor.fit(texts, flags.preprocess_workers)
+        # hash_only时fit不遍历语料，类目仍需遍历收集
+        for _ in texts:
+            pass
+        flags.vocab_size = len(vocab_processor)
+        flags.cls_num = reader.cls_num
+        if not flags.cls_num:
+            raise ValueError("no labels found in corpus_files: {}".format(
+                flags.corpus_files))
+
+        # 第二遍：训练集走二进制语料或tf.data输入
+        train_samples = reader.iter_ids(vocab_processor, "train")
+        x_train = None
+        if flags.input_mode == "binary":
+            x_train = self._write_binary(flags, train_samples)
+        else:
+            if flags.input_mode != "dataset":
+                logging.info(
+                    "corpus_files is set, switch input_mode to dataset")
+                flags.input_mode = "dataset"
+            self._write_train_files(flags, train_samples)
+
+        # 验证集
+        x_dev, y_dev = reader.load_split(vocab_processor, "dev")
+
+        logging.info("Vocabulary Size: {:d}".format(len(vocab_processor)))
+        logging.info("Labels: {}, Dev size: {:d}".format(
+            ",".join(reader.label_names), len(y_dev)))
+
+        return x_train, None, vocab_processor, x_dev, y_dev
+
+    def _execute_infer(self, flags):
+        '''预测模式: 加载checkpoint目录下训练时保存的词表，编码全部样本作为预测集
+        重新fit的词表id与训练时不一致，大小也会改变embedding的形状，导致restore失败
+        '''
+        vocab_processor = VocabProcessor.restore(
+            os.path.join(flags.checkpoint_dir, "vocab"))
+        flags.vocab_size = len(vocab_processor)
+        # 与训练时相同的文本预处理，旧词表无配置时去首尾空白并小写
+        tokenizer = vocab_processor.tokenizer_fn
+        text_processor = tokenizer if isinstance(
+            tokenizer, TextProcessor) else TextProcessor()
+        if flags.corpus_files:
+            label_names = [n for n in flags.label_names.split(",") if n]
+            reader = CorpusReader(flags.corpus_files,
+                                  flags.corpus_format,
+                                  label_names,
+                                  flags.dev_sample_percentage,
+                                  text_processor=text_processor)
+            # jsonl未指定类目名时先遍历收集类目
+            for _ in reader.scan_texts():
+                pass
+            flags.cls_num = reader.cls_num
+            x, y = reader.load_split(vocab_processor, None)
+        else:
+            x_text, y = TFUtils.load_data_and_labels(
+                flags.positive_data_file, flags.negative_data_file,
+                text_processor)
+            x = vocab_processor.encode(x_text)
+        logging.info("Vocabulary Size: {:d}, restored from {}".format(
+            len(vocab_processor), flags.checkpoint_dir))
+        logging.info("Infer size: {:d}".format(len(x)))
+
+        return None, None, vocab_processor, x, y
+
+    def _data_dir(self, flags, name):
+        '''数据目录，与模型保存目录同级
+        '''
+        return os.path.abspath(
+            os.path.join(os.path.curdir, "../" + flags.save_path, name))
+
+    def _new_corpus_reader(self, flags):
+        '''根据flags创建分片语料读取器
+        '''
+        label_names = [n for n in flags.label_names.split(",") if n]
+        return CorpusReader(flags.corpus_files,
+                            flags.corpus_format,
+                            label_names,
+                            flags.dev_sample_percentage,
+                            text_processor=self._new_text_processor(flags))
+
+    def _new_text_processor(self, flags):
+        '''根据flags创建文本预处理，同时作为词表的分词器
+        '''
+        return TextProcessor(lowercase=flags.text_lowercase,
+                             split_punct=flags.text_split_punct,
+                             chinese=flags.text_chinese)
+
+    def _train_files(self, flags):
+        '''训练集TFRecord分片路径，与TFUtils.write_tfrecords命名一致
+        '''
+        path_prefix = os.path.join(self._data_dir(flags, flags.data_path),
+                                   "train")
+        return [
+            "{}-{:05d}-of-{:05d}.tfrecord".format(path_prefix, i,
+                                                  flags.num_shards)
+            for i in range(flags.num_shards)
+        ]
+
+    def _new_vocab_processor(self, flags):
+        '''根据flags创建词表处理器
+        '''
+        return VocabProcessor(flags.max_seq_len,
+                              min_frequency=flags.min_frequency,
+                              max_vocab_size=flags.max_vocab_size,
+                              tokenizer_fn=self._new_text_processor(flags),
+                              num_oov_buckets=flags.hash_buckets,
+                              hash_only=flags.hash_only)
+
+    def _binary_prefix(self, flags):
+        '''训练集二进制语料路径前缀
+        '''
+        return os.path.join(self._data_dir(flags, flags.data_path), "train")
+
+    def _write_binary(self, flags, train_samples):
+        '''训练集写成二进制语料
+
+        Args:
+            flags: 全局参数
+            train_samples: (x, y)样本的可迭代对象，可以是生成器
+
+        Returns:
+            BinaryCorpus
+        '''
+        corpus = BinaryCorpus.write(self._binary_prefix(flags), train_samples,
+                                    flags.cls_num)
+        logging.info("Wrote {:d} train docs, {:d} tokens to {}".format(
+            len(corpus), corpus.meta["num_tokens"], corpus.prefix))
+        return corpus
+
+    def _write_train_files(self, flags, train_samples):
+        '''训练集写成TFRecord分片，并更新flags.train_files
+
+        Args:
+            flags: 全局参数
+            train_samples: (x, y)样本的可迭代对象，可以是生成器
+        '''
+        data_dir = self._data_dir(flags, flags.data_path)
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+        train_files = TFUtils.write_tfrecords(train_samples,
+                                              os.path.join(data_dir, "train"),
+                                              flags.num_shards)
+        flags.train_files = ",".join(train_files)
+        logging.info("Wrote {:d} train shards to {}".format(
+            len(train_files), data_dir))
@@ -5,9 +5,12 @@
 import os
 import time
 import sys
+import logging
 sys.path.append(os.getcwd() + "/../../")
 import tensorflow as tf
 import numpy as np
+from utils.session_tuner import SessionTuner
+from utils.checkpoint_utils import AsyncCheckpointer
 from models.nlp.classification.tf_bilstmatt_classifier import TFBILSTMATTClassifier
 from models.nlp.classification.tf_textcnn_classifier import TFTextCNNClassifier
 
@@ -31,14 +34,18 @@ class SessionProcessor(object):
         self.save_path = os.path.abspath(
             os.path.join(os.path.curdir, "../" + flags.save_path, timestamp))
         # session配置
-        session_conf = tf.ConfigProto(
-            allow_soft_placement=flags.allow_soft_placement,
-            log_device_placement=flags.log_device_placement)
+        session_conf = SessionTuner.build_config(
+            self.get_session_conf(flags), flags.allow_soft_placement,
+            flags.log_device_placement)
         # 创建session
         with tf.Session(config=session_conf, graph=graph) as sess:
             # 保存器
             model.saver = tf.train.Saver(tf.global_variables(),
                                          max_to_keep=flags.num_checkpoints)
+            # 异步checkpoint，快照按原变量名保存
+            if flags.mode == "train":
+                model.checkpointer = AsyncCheckpointer(
+                    tf.global_variables(), model.saver, flags.num_checkpoints)
             # 变量initial
             sess.run(tf.global_variables_initializer())
             # 重置accuracy两个局部变量accuracy/count
@@ -47,11 +54,64 @@ class SessionProcessor(object):
             sess.run(tf.local_variables_initializer())
             # 训练or预测
             if flags.mode == "train":
+                # 预训练词向量赋值
+                model.init_pretrain(sess)
                 model.train(sess, vocab_processor, self.save_path, x_train,
                             y_train, x_dev, y_dev)
             else:
-                model.infer()
+                # 加载已训练模型，对PRE用训练词表编码的样本预测
+                checkpoint_file = tf.train.latest_checkpoint(
+                    flags.checkpoint_dir)
+                if checkpoint_file is None:
+                    raise ValueError("no checkpoint found in {}".format(
+                        flags.checkpoint_dir))
+                model.saver.restore(sess, checkpoint_file)
+                probability, predictions = model.infer(sess, x_dev)
+                logging.info("Restored {}, predicted {:d} samples".format(
+                    checkpoint_file, len(predictions)))
             # 关闭session节省资源
             sess.close()
 
         return None
+
+    def get_session_conf(self, flags):
+        '''线程池及图优化配置
+        开启use_tuned_session且本机有调优结果时使用调优结果，否则使用flags；
+        显式设置的flags(命令行给出或与默认值不同)优先于调优结果
+
+        Returns:
+            配置dict
+        '''
+        conf = {
+            "intra_op_parallelism_threads":
+            flags.intra_op_parallelism_threads,
+            "inter_op_parallelism_threads":
+            flags.inter_op_parallelism_threads,
+            "xla_jit": flags.xla_jit,
+            "constant_folding": flags.constant_folding
+        }
+        if flags.use_tuned_session:
+            conf_file = SessionTuner.default_conf_file(
+                os.path.abspath(
+                    os.path.join(os.path.curdir, "../" + flags.save_path,
+                                 flags.session_conf_dir)))
+            tuned = SessionTuner.load(conf_file, flags.task_name)
+            if tuned is not None:
+                logging.info("Use tuned session conf from {}".format(
+                    conf_file))
+                for key, value in tuned.items():
+                    if key in conf and self._is_explicit(flags, key):
+                        logging.info(
+                            "{}={} from flags overrides tuned {}".format(
+                                key, conf[key], value))
+                        continue
+                    conf[key] = value
+
+        return conf
+
+    @staticmethod
+    def _is_explicit(flags, key):
+        '''flags是否显式设置: 命令行给出，或值与默认值不同(如线程数非0、被override)
+        '''
+        flag = tf.flags.FLAGS[key]
+        return flag.present or getattr(flags, key) != flag.default
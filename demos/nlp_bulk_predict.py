@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''离线批量预测
+1、输入文件按字节区间切成分片，分片内逐块读取文本，用已保存的词表编码
+2、编码在后台线程预取，与模型前向计算重叠
+3、多个进程并行处理分片，每个进程常驻一个TFPredictor
+4、每个分片输出一个part文件，写完后生成.done标记，重跑时跳过已完成分片
+
+输入: text格式每行一条文本；jsonl格式每行一个json，文本字段为text_field
+输出: output_dir/part-xxxxx.tsv，每行为"输入文件\t行起始字节\t预测类目\t各类目概率"，
+     预测类目为逗号分隔的类目索引(或label_names中的类目名)；
+     output_dir/shards.json记录分片与输入文件字节区间的对应关系
+
+运行:
+    python nlp_bulk_predict.py --checkpoint_dir ../save_models/1589251118/checkpoints \
+        --input_files "../corpus/nlp/english/*.txt" --output_dir ../predictions
+'''
+
+import os
+import sys
+sys.path.append(os.getcwd() + "/../")
+import io
+import glob
+import json
+import time
+import logging
+import multiprocessing
+import numpy as np
+import tensorflow as tf
+from utils.tf_utils import TFUtils
+from utils.tf_predictor import TFPredictor
+
+FLAGS = tf.flags.FLAGS
+
+# 设定日志级别和格式
+logging.basicConfig(
+    level=logging.INFO,
+    format=
+    '%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
+
+# worker进程常驻的预测器
+_WORKER = {}
+
+
+def plan_shards(input_files, shard_bytes):
+    '''按字节区间切分输入文件
+
+    Args:
+        input_files: 逗号分隔的文件glob
+        shard_bytes: 分片大小上限
+
+    Returns:
+        [(文件路径, 起始字节, 结束字节)]
+    '''
+    shards = []
+    for spec in input_files.split(","):
+        for path in sorted(glob.glob(spec.strip())):
+            size = os.path.getsize(path)
+            for start in range(0, max(size, 1), shard_bytes):
+                shards.append((path, start, min(start + shard_bytes, size)))
+    return shards
+
+
+def iter_lines(path, start, end):
+    '''读取起始字节落在[start, end)内的行
+
+    Returns:
+        (行起始字节, 行文本)生成器
+    '''
+    with open(path, "rb") as fin:
+        if start > 0:
+            # 跳过属于上一分片的半行
+            fin.seek(start - 1)
+            fin.readline()
+        offset = fin.tell()
+        while offset < end:
+            line = fin.readline()
+            if not line:
+                break
+            yield offset, line.decode("utf-8", "ignore")
+            offset = fin.tell()
+
+
+def iter_batches(shard, predictor, batch_size):
+    '''分块读取，按训练时的文本预处理整块规范化后编码
+
+    Returns:
+        (行起始字节list, 补0后的词id数组)生成器
+    '''
+    offsets, texts = [], []
+    for offset, line in iter_lines(*shard):
+        if FLAGS.input_format == "jsonl":
+            if not line.strip():
+                continue
+            line = json.loads(line)[FLAGS.text_field]
+        offsets.append(offset)
+        texts.append(line)
+        if len(texts) == batch_size:
+            yield offsets, _encode(predictor, texts)
+            offsets, texts = [], []
+    if texts:
+        yield offsets, _encode(predictor, texts)
+
+
+def _encode(predictor, texts):
+    '''整批规范化后编码
+    '''
+    return predictor.vocab_processor.encode(
+        predictor.text_processor.normalize_lines(texts))
+
+
+def _init_worker(checkpoint_dir, num_threads):
+    '''worker进程加载预测器，只加载一次
+    '''
+    session_config = tf.ConfigProto(
+        intra_op_parallelism_threads=num_threads,
+        inter_op_parallelism_threads=2,
+        device_count={"GPU": 0})
+    _WORKER["predictor"] = TFPredictor(checkpoint_dir, session_config)
+
+
+def score_shard(args):
+    '''预测单个分片，写part文件及.done标记
+
+    Returns:
+        (分片序号, 样本数, 耗时)
+    '''
+    shard_id, shard = args
+    predictor = _WORKER["predictor"]
+    label_names = [n for n in FLAGS.label_names.split(",") if n]
+    part_file = os.path.join(FLAGS.output_dir, "part-%05d.tsv" % shard_id)
+    start = time.time()
+    num_docs = 0
+    # 先写临时文件，崩溃时不会留下看似完整的part
+    with io.open(part_file + ".tmp", "w", encoding="utf-8") as fout:
+        for offsets, x in TFUtils.prefetch_iter(
+                iter_batches(shard, predictor, FLAGS.predict_batch_size),
+                FLAGS.prefetch_size):
+            probability, predictions = predictor.predict_ids(x)
+            lines = []
+            for offset, prob, pred in zip(offsets, probability, predictions):
+                labels = np.flatnonzero(pred > 0.5)
+                if label_names:
+                    labels = [label_names[i] for i in labels]
+                lines.append(u"{}\t{}\t{}\t{}\n".format(
+                    shard[0], offset, ",".join(map(str, labels)),
+                    ",".join("%.6g" % p for p in prob)))
+            fout.write(u"".join(lines))
+            num_docs += len(offsets)
+    os.rename(part_file + ".tmp", part_file)
+    seconds = time.time() - start
+    with io.open(_done_file(shard_id), "w", encoding="utf-8") as fout:
+        fout.write(u"{}\n".format(
+            json.dumps({
+                "num_docs": num_docs,
+                "seconds": seconds
+            })))
+
+    return shard_id, num_docs, seconds
+
+
+def _done_file(shard_id):
+    return os.path.join(FLAGS.output_dir, "part-%05d.done" % shard_id)
+
+
+def main(argv=None):
+    if not os.path.exists(FLAGS.output_dir):
+        os.makedirs(FLAGS.output_dir)
+    shards = plan_shards(FLAGS.input_files, FLAGS.shard_mb << 20)
+    # 分片方案需与已完成的分片一致才能续跑
+    manifest_file = os.path.join(FLAGS.output_dir, "shards.json")
+    if os.path.exists(manifest_file):
+        with io.open(manifest_file, "r", encoding="utf-8") as fin:
+            if [tuple(shard) for shard in json.load(fin)] != shards:
+                raise ValueError(
+                    "{} was written for different inputs or shard_mb, "
+                    "use a new output_dir".format(manifest_file))
+    else:
+        with io.open(manifest_file, "w", encoding="utf-8") as fout:
+            fout.write(u"{}".format(json.dumps(shards)))
+    pending = [(shard_id, shard) for shard_id, shard in enumerate(shards)
+               if not os.path.exists(_done_file(shard_id))]
+    logging.info("{} shards, {} done, {} to run".format(
+        len(shards),
+        len(shards) - len(pending), len(pending)))
+    if not pending:
+        return
+
+    num_workers = min(FLAGS.num_workers, len(pending))
+    num_threads = FLAGS.threads_per_worker or max(
+        1, multiprocessing.cpu_count() // num_workers)
+    pool = multiprocessing.Pool(num_workers,
+                                initializer=_init_worker,
+                                initargs=(FLAGS.checkpoint_dir, num_threads))
+    start = time.time()
+    total_docs = 0
+    try:
+        for shard_id, num_docs, seconds in pool.imap_unordered(
+                score_shard, pending):
+            total_docs += num_docs
+            logging.info("Shard {} done: {} docs, {:.0f} docs/sec".format(
+                shard_id, num_docs, num_docs / max(seconds, 1e-6)))
+    finally:
+        pool.close()
+        pool.join()
+    logging.info("Scored {} docs in {:.1f}s, {:.0f} docs/sec".format(
+        total_docs,
+        time.time() - start, total_docs / max(time.time() - start, 1e-6)))
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_string(
+        "checkpoint_dir", "",
+        "checkpoint or export dir, e.g. ../save_models/1589251118/checkpoints")
+    tf.flags.DEFINE_string("input_files", "",
+                           "comma separated globs of input files")
+    tf.flags.DEFINE_string("input_format", "text",
+                           "input file format, text/jsonl(default: text)")
+    tf.flags.DEFINE_string("text_field", "text",
+                           "text field of jsonl input(default: text)")
+    tf.flags.DEFINE_string("output_dir", "../predictions",
+                           "dir of output parts(default: ../predictions)")
+    tf.flags.DEFINE_string(
+        "label_names", "",
+        "comma separated label names in label index order, output indices if empty(default: '')"
+    )
+    tf.flags.DEFINE_integer("shard_mb", 64,
+                            "Max input bytes per shard in MB(default: 64)")
+    tf.flags.DEFINE_integer("num_workers", 2,
+                            "Number of scoring processes(default: 2)")
+    tf.flags.DEFINE_integer(
+        "threads_per_worker", 0,
+        "intra-op threads per process, 0 for cpu_count / num_workers(default: 0)"
+    )
+    tf.flags.DEFINE_integer("predict_batch_size", 1024,
+                            "Batch size of each forward pass(default: 1024)")
+    tf.flags.DEFINE_integer("prefetch_size", 4,
+                            "Number of encoded batches prefetched(default: 4)")
+    tf.app.run()
@@ -25,9 +25,10 @@ logging.basicConfig(
 
 
 def main(argv=None):
-    # 定义执行器
-    exe = Executor()
-    # 添加processor
+    # 定义执行器，流式预处理结果缓存到stage_cache，失败重跑时跳过
+    exe = Executor(cache_dir=os.path.abspath(
+        os.path.join(os.path.curdir, "../stage_cache")))
+    # 添加processor，未指定依赖时依赖之前的全部processor
     exe.add_processor(InitProcessor())  # 参数初始化
     exe.add_processor(PreProcessor())  # 样本预处理
     exe.add_processor(GraphProcessor())  # 构建模型
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''分类器预测服务
+加载checkpoint及词表常驻内存，提供HTTP/JSON或stdin/stdout JSONL两种预测接口，
+并发请求通过动态batch合并计算。
+
+HTTP: POST /predict {"texts": ["...", ...]}
+      返回 {"probability": [[...], ...], "predictions": [[...], ...]}
+JSONL: 每行输入{"text": "..."}，按行输出{"probability": [...], "predictions": [...]}
+'''
+
+import os
+import sys
+sys.path.append(os.getcwd() + "/../")
+import json
+import logging
+import collections
+import tensorflow as tf
+from utils.tf_predictor import TFPredictor
+from utils.dynamic_batcher import DynamicBatcher
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+# 设定日志级别和格式
+logging.basicConfig(
+    level=logging.INFO,
+    format=
+    '%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
+
+
+class PredictService(object):
+    '''预测服务：单条请求进入动态batch，batch线程统一调用predictor
+    '''
+    def __init__(self, predictor, max_batch_size, max_wait_ms):
+        self.predictor = predictor
+        self.batcher = DynamicBatcher(self._predict_batch, max_batch_size,
+                                      max_wait_ms)
+
+    def _predict_batch(self, texts):
+        '''batch预测，返回逐条结果
+        '''
+        probability, predictions = self.predictor.predict(texts)
+        return [{
+            "probability": prob.tolist(),
+            "predictions": pred.tolist()
+        } for prob, pred in zip(probability, predictions)]
+
+    def submit(self, text):
+        '''异步提交单条文本
+        '''
+        return self.batcher.submit(text)
+
+    def predict(self, texts):
+        '''预测多条文本，每条单独进入动态batch，可与其他请求合并
+        '''
+        results = [request.get() for request in map(self.submit, texts)]
+        return {
+            "probability": [result["probability"] for result in results],
+            "predictions": [result["predictions"] for result in results]
+        }
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    '''每个连接一个线程，并发请求才能被动态batch合并
+    '''
+    daemon_threads = True
+
+
+def make_handler(service):
+    '''生成绑定了预测服务的HTTP handler
+    '''
+    class PredictHandler(BaseHTTPRequestHandler):
+        def _reply(self, code, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._reply(200, {"status": "ok"})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length).decode("utf-8"))
+                texts = request["texts"] if "texts" in request else [
+                    request["text"]
+                ]
+            except (ValueError, KeyError) as e:
+                self._reply(400, {"error": str(e)})
+                return
+            self._reply(200, service.predict(texts))
+
+        def log_message(self, format, *args):
+            # 关闭逐请求访问日志
+            pass
+
+    return PredictHandler
+
+
+def serve_jsonl(service, max_pending):
+    '''stdin逐行读入JSONL，按输入顺序逐行输出结果
+    保持最多max_pending条在途请求，使其可被合并成batch
+    '''
+    pending = collections.deque()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        pending.append(service.submit(json.loads(line)["text"]))
+        while len(pending) >= max_pending:
+            sys.stdout.write(json.dumps(pending.popleft().get()) + "\n")
+    while pending:
+        sys.stdout.write(json.dumps(pending.popleft().get()) + "\n")
+    sys.stdout.flush()
+
+
+def main(argv=None):
+    flags = tf.flags.FLAGS
+    predictor = TFPredictor(flags.checkpoint_dir)
+    service = PredictService(predictor, flags.max_batch_size,
+                             flags.max_wait_ms)
+    if flags.serve_mode == "http":
+        server = ThreadingHTTPServer(("", flags.port), make_handler(service))
+        logging.info("Serving on port {:d}".format(flags.port))
+        server.serve_forever()
+    else:
+        serve_jsonl(service, flags.max_batch_size * 2)
+    predictor.close()
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_string(
+        "checkpoint_dir", "",
+        "checkpoint dir, e.g. ../save_models/1589251118/checkpoints")
+    tf.flags.DEFINE_string("serve_mode", "http",
+                           "http or jsonl(stdin/stdout)(default: http)")
+    tf.flags.DEFINE_integer("port", 8080, "http port(default: 8080)")
+    tf.flags.DEFINE_integer("max_batch_size", 64,
+                            "max requests merged into a batch(default: 64)")
+    tf.flags.DEFINE_integer(
+        "max_wait_ms", 5,
+        "max time the first request waits for a batch(default: 5)")
+    tf.app.run()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''超参搜索
+1、按网格或随机方式展开搜索空间，每组参数为一个trial
+2、INIT、PRE只在主进程执行一次，子进程fork时继承其结果(copy-on-write只读共享)，不重复预处理
+3、worker进程池并行执行GRAPH+SESSION，每个worker独占一份线程预算
+4、根据验证集指标提前停止表现差的trial: 连续early_stop_patience次评估无提升，
+   或最优值低于其他trial同一步数的中位数(median stopping rule)
+5、结果按指标排序输出到save_path/sweep_<时间戳>/results.tsv及results.jsonl
+
+运行:
+    python nlp_sweep.py --task_name TextCNN --sweep_space \
+        '{"lr": [0.001, 0.0005], "keep_prob": [0.5, 0.7], "filter_sizes": ["2,3,4", "3,4,5"]}'
+    python nlp_sweep.py --sweep_mode random --sweep_trials 20 --sweep_space \
+        '{"lr": {"min": 0.0001, "max": 0.01, "log": true}, "keep_prob": {"min": 0.3, "max": 0.9}}'
+--sweep_space也可以是json文件路径。
+'''
+
+import os
+import sys
+sys.path.append(os.getcwd() + "/../")
+import io
+import json
+import time
+import math
+import random
+import logging
+import itertools
+import multiprocessing
+import numpy as np
+import tensorflow as tf
+from utils.tf_utils import TFUtils
+from executes.executor import Executor
+from executes.init_processor import InitProcessor
+from executes.pre_processor import PreProcessor
+from executes.graph_processor import GraphProcessor
+from executes.session_processor import SessionProcessor
+
+FLAGS = tf.flags.FLAGS
+
+# 设定日志级别和格式
+logging.basicConfig(
+    level=logging.INFO,
+    format=
+    '%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
+
+# 主进程执行一次的INIT、PRE结果，worker fork后直接继承
+_SHARED = {}
+
+
+def expand_space(space, mode, num_trials, seed):
+    '''展开搜索空间
+
+    Args:
+        space: 参数名 -> 取值list，随机模式下也可以是{"min", "max", "log"}区间
+        mode: grid/random
+        num_trials: 随机模式的trial数
+        seed: 随机种子
+
+    Returns:
+        参数dict的list
+    '''
+    names = sorted(space)
+    if mode == "grid":
+        return [
+            dict(zip(names, values))
+            for values in itertools.product(*[space[name] for name in names])
+        ]
+    rng = random.Random(seed)
+    trials = []
+    for _ in range(num_trials):
+        params = {}
+        for name in names:
+            spec = space[name]
+            if isinstance(spec, list):
+                params[name] = rng.choice(spec)
+            elif spec.get("log"):
+                params[name] = math.exp(
+                    rng.uniform(math.log(spec["min"]), math.log(spec["max"])))
+            else:
+                params[name] = rng.uniform(spec["min"], spec["max"])
+        trials.append(params)
+    return trials
+
+
+class EarlyStopper(object):
+    '''trial评估回调，返回True时停止训练
+    各trial在每个评估步的最优指标记录在进程间共享的dict中，用于中位数比较
+    '''
+    def __init__(self, metric, patience, min_evals, history, lock):
+        '''初始化
+
+        Args:
+            metric: 比较的指标名，越大越好
+            patience: 连续多少次评估无提升即停止，0为不启用
+            min_evals: 至少评估多少次后才启用中位数规则
+            history: 共享dict，评估步数 -> 各trial截至该步的最优指标list
+            lock: 共享dict的锁
+        '''
+        self.metric = metric
+        self.patience = patience
+        self.min_evals = min_evals
+        self.history = history
+        self.lock = lock
+        self.values = []
+        self.reason = ""
+
+    def __call__(self, metrics):
+        self.values.append(float(metrics[self.metric]))
+        best = max(self.values)
+        with self.lock:
+            others = self.history.get(metrics["step"], [])
+            self.history[metrics["step"]] = others + [best]
+        since_best = len(self.values) - 1 - self.values.index(best)
+        if self.patience and since_best >= self.patience:
+            self.reason = "no improvement in {} evals".format(since_best)
+        elif (len(self.values) >= self.min_evals and len(others) >= 2
+              and best < np.median(others)):
+            self.reason = "below median {:.4f} at step {}".format(
+                np.median(others), metrics["step"])
+        return bool(self.reason)
+
+
+class EarlyStopProcessor(object):
+    '''在GRAPH与SESSION之间为模型挂上评估回调
+    '''
+    def __init__(self, callback):
+        self.name = "EARLY_STOP"
+        self.callback = callback
+
+    def execute(self, params):
+        model, _ = params["GRAPH"]
+        model.eval_callback = self.callback
+
+
+def _init_worker(history, lock):
+    _SHARED["history"] = history
+    _SHARED["lock"] = lock
+
+
+def run_trial(args):
+    '''worker: 以trial参数运行GRAPH+SESSION
+
+    Returns:
+        结果dict
+    '''
+    trial_id, params = args
+    flags = _SHARED["flags"]
+    overrides = dict(params)
+    overrides.update({
+        "mode": "train",
+        "save_path": os.path.join(flags.save_path, _SHARED["sweep_name"],
+                                  "trial_%d" % trial_id),
+        "intra_op_parallelism_threads": _SHARED["threads"],
+        "inter_op_parallelism_threads": 2,
+        "use_tuned_session": False,
+        "export_model": False
+    })
+    trial_flags = TFUtils.override_flags(flags, **overrides)
+    stopper = EarlyStopper(flags.sweep_metric, flags.early_stop_patience,
+                           flags.early_stop_min_evals, _SHARED["history"],
+                           _SHARED["lock"])
+    start = time.time()
+    result = {"trial": trial_id, "params": params}
+    try:
+        exe = Executor({"INIT": trial_flags, "PRE": _SHARED["PRE"]})
+        exe.add_processor(GraphProcessor(), keep=True)
+        exe.add_processor(EarlyStopProcessor(stopper))
+        exe.add_processor(SessionProcessor())
+        exe.run()
+        history = exe.returns["GRAPH"][0].eval_history
+        result.update({
+            "status": "stopped" if stopper.reason else "finished",
+            "reason": stopper.reason,
+            "num_evals": len(history)
+        })
+        if history:
+            best = max(history, key=lambda m: m[flags.sweep_metric])
+            result.update({
+                "best_" + flags.sweep_metric: float(best[flags.sweep_metric]),
+                "best_step": best["step"],
+                "best_loss": float(best["loss"])
+            })
+    except Exception as e:
+        logging.exception("Trial {} failed".format(trial_id))
+        result.update({"status": "failed", "reason": repr(e)})
+    result["seconds"] = time.time() - start
+
+    return result
+
+
+def write_results(sweep_dir, metric, results):
+    '''按指标降序写结果表
+    '''
+    key = "best_" + metric
+    ranked = sorted(results,
+                    key=lambda r: (r.get(key) is None, -(r.get(key) or 0.0)))
+    names = sorted(set(itertools.chain(*[r["params"] for r in results])))
+    columns = ["rank", "trial", key, "best_step", "status"] + names
+    lines = ["\t".join(columns)]
+    for rank, row in enumerate(ranked, 1):
+        values = [rank, row["trial"], row.get(key), row.get("best_step"),
+                  row["status"]] + [row["params"].get(name) for name in names]
+        lines.append("\t".join(str(v) for v in values))
+    with io.open(os.path.join(sweep_dir, "results.tsv"), "w",
+                 encoding="utf-8") as fout:
+        fout.write(u"\n".join(lines) + u"\n")
+    with io.open(os.path.join(sweep_dir, "results.jsonl"), "w",
+                 encoding="utf-8") as fout:
+        for row in ranked:
+            fout.write(u"{}\n".format(json.dumps(row, sort_keys=True)))
+    logging.info("Sweep results:\n" + "\n".join(lines))
+
+
+def main(argv=None):
+    # INIT、PRE只执行一次
+    exe = Executor()
+    exe.add_processor(InitProcessor(), keep=True)
+    exe.add_processor(PreProcessor())
+    exe.run()
+    flags = exe.returns["INIT"]
+
+    space = FLAGS.sweep_space
+    if os.path.exists(space):
+        with io.open(space, "r", encoding="utf-8") as fin:
+            space = fin.read()
+    trials = expand_space(json.loads(space), FLAGS.sweep_mode,
+                          FLAGS.sweep_trials, FLAGS.sweep_seed)
+    num_workers = min(FLAGS.sweep_workers, len(trials))
+    sweep_name = "sweep_" + str(int(time.time()))
+    sweep_dir = os.path.abspath(
+        os.path.join(os.path.curdir, "../" + flags.save_path, sweep_name))
+    os.makedirs(sweep_dir)
+    # 每个worker的线程预算
+    threads = FLAGS.sweep_threads_per_worker or max(
+        1, multiprocessing.cpu_count() // num_workers)
+    logging.info("Sweep {}: {} trials, {} workers x {} threads".format(
+        sweep_name, len(trials), num_workers, threads))
+
+    # fork前放入全局，worker继承后只读使用
+    _SHARED.update({
+        "flags": flags,
+        "PRE": exe.returns["PRE"],
+        "sweep_name": sweep_name,
+        "threads": threads
+    })
+    manager = multiprocessing.Manager()
+    # 每个trial一个新进程，结束后释放图和会话占用的内存
+    pool = multiprocessing.Pool(num_workers,
+                                initializer=_init_worker,
+                                initargs=(manager.dict(), manager.Lock()),
+                                maxtasksperchild=1)
+    results = []
+    try:
+        for result in pool.imap_unordered(run_trial, enumerate(trials)):
+            logging.info("Trial {trial} {status} {reason}".format(**result))
+            results.append(result)
+            write_results(sweep_dir, flags.sweep_metric, results)
+    finally:
+        pool.close()
+        pool.join()
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_integer("max_seq_len", 128,
+                            "max len of input seq(default: 128)")
+    tf.flags.DEFINE_string(
+        "sweep_space", "{}",
+        "json search space or json file, name -> list of values, or {min, max, log} in random mode"
+    )
+    tf.flags.DEFINE_string("sweep_mode", "grid",
+                           "grid/random(default: grid)")
+    tf.flags.DEFINE_integer("sweep_trials", 10,
+                            "Number of trials in random mode(default: 10)")
+    tf.flags.DEFINE_integer("sweep_seed", 10,
+                            "Random seed of random mode(default: 10)")
+    tf.flags.DEFINE_integer("sweep_workers", 2,
+                            "Number of parallel trial processes(default: 2)")
+    tf.flags.DEFINE_integer(
+        "sweep_threads_per_worker", 0,
+        "intra-op threads per trial, 0 for cpu_count / sweep_workers(default: 0)"
+    )
+    tf.flags.DEFINE_string("sweep_metric", "accuracy",
+                           "dev metric to rank and early stop(default: accuracy)")
+    tf.flags.DEFINE_integer(
+        "early_stop_patience", 3,
+        "stop a trial after this many evals without improvement, 0 to disable(default: 3)"
+    )
+    tf.flags.DEFINE_integer(
+        "early_stop_min_evals", 2,
+        "evals before comparing a trial with the median of others(default: 2)"
+    )
+    tf.app.run()
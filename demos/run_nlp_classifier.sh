@@ -14,5 +14,23 @@ run_bilstm_att() {
     --max_seq_len 128
 }
 
+run_textcnn_sharded() {
+  python ./nlp_classifier.py \
+    --task_name "TextCNN" \
+    --max_seq_len 128 \
+    --corpus_files "pos:../corpus/nlp/english/rt-polarity.pos,neg:../corpus/nlp/english/rt-polarity.neg" \
+    --label_names "neg,pos"
+}
+
+run_sweep() {
+  python ./nlp_sweep.py \
+    --task_name "TextCNN" \
+    --max_seq_len 128 \
+    --sweep_workers 2 \
+    --sweep_space '{"lr": [0.001, 0.0005], "keep_prob": [0.5, 0.7], "filter_sizes": ["2,3,4", "3,4,5"]}'
+}
+
 run_textcnn
 # run_bilstm_att
+# run_textcnn_sharded
+# run_sweep
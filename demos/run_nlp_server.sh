@@ -0,0 +1,33 @@
+#!/usr/bin/env bash
+# @Author wensong
+# @Env tensorflow 1.5.0|Python2.7
+
+# 用法: ./run_nlp_server.sh ../save_models/1589251118/checkpoints
+run_http_server() {
+  python ./nlp_server.py \
+    --checkpoint_dir "$1" \
+    --serve_mode "http" \
+    --port 8080 \
+    --max_batch_size 64 \
+    --max_wait_ms 5
+}
+
+run_jsonl_server() {
+  python ./nlp_server.py \
+    --checkpoint_dir "$1" \
+    --serve_mode "jsonl"
+}
+
+# 离线批量预测，重跑时跳过已完成的分片
+run_bulk_predict() {
+  python ./nlp_bulk_predict.py \
+    --checkpoint_dir "$1" \
+    --input_files "../corpus/nlp/english/rt-polarity.pos,../corpus/nlp/english/rt-polarity.neg" \
+    --output_dir "../predictions" \
+    --num_workers 2 \
+    --predict_batch_size 1024
+}
+
+run_http_server "$1"
+# run_jsonl_server "$1"
+# run_bulk_predict "$1"
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+'''本机session配置自动调优
+分别对TextCNN和BILSTMAtt测量不同intra/inter线程数及XLA、常量折叠选项下的训练速度，
+最优配置保存到../save_models/session_conf/<hostname>.json，
+之后nlp_classifier.py在--use_tuned_session(默认开启)时自动使用。
+'''
+
+import os
+import sys
+sys.path.append(os.getcwd() + "/../")
+import time
+import logging
+import tensorflow as tf
+from utils.session_tuner import SessionTuner
+from executes.init_processor import InitProcessor
+from executes.pre_processor import PreProcessor
+from executes.graph_processor import GraphProcessor
+
+# 设定日志级别和格式
+logging.basicConfig(
+    level=logging.INFO,
+    format=
+    '%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
+
+
+def make_bench_fn(flags, model, graph, x_train, y_train):
+    '''生成测速函数: 给定session配置，返回训练steps/sec
+    由SessionTuner在fork出的子进程中调用，图和数据随fork继承
+    '''
+    def bench_fn(conf):
+        with tf.Session(config=SessionTuner.build_config(conf),
+                        graph=graph) as sess:
+            sess.run(tf.global_variables_initializer())
+            sess.run(tf.local_variables_initializer())
+            batches = model.get_batches(sess, x_train, y_train)
+
+            def step():
+                x_batch, y_batch = next(batches)
+                model.train_onestep(sess, x_batch, y_batch)
+
+            # 预热，包括XLA编译
+            for _ in range(10):
+                step()
+            start = time.time()
+            for _ in range(flags.tune_steps):
+                step()
+            return flags.tune_steps / (time.time() - start)
+
+    return bench_fn
+
+
+def main(argv=None):
+    flags = InitProcessor().execute({})
+    flags.input_mode = "feed_dict"
+    pre_returns = PreProcessor().execute({"INIT": flags})
+    x_train, y_train = pre_returns[0], pre_returns[1]
+    conf_file = SessionTuner.default_conf_file(
+        os.path.abspath(
+            os.path.join(os.path.curdir, "../" + flags.save_path,
+                         flags.session_conf_dir)))
+
+    for task_name in flags.tune_tasks.split(","):
+        flags.task_name = task_name
+        model, graph = GraphProcessor().execute({
+            "INIT": flags,
+            "PRE": pre_returns
+        })
+        # 调优期间关闭逐步日志
+        logging.getLogger().setLevel(logging.WARNING)
+        tuner = SessionTuner(
+            make_bench_fn(flags, model, graph, x_train, y_train),
+            flags.tune_max_threads)
+        best_conf = tuner.tune()
+        logging.getLogger().setLevel(logging.INFO)
+        SessionTuner.save(conf_file, task_name, best_conf)
+        logging.info("{} best session conf: {}, saved to {}".format(
+            task_name, best_conf, conf_file))
+
+
+if __name__ == '__main__':
+    tf.flags.DEFINE_integer("max_seq_len", 128,
+                            "max len of input seq(default: 128)")
+    tf.flags.DEFINE_string("tune_tasks", "TextCNN,BILSTMAtt",
+                           "tasks to tune(default: TextCNN,BILSTMAtt)")
+    tf.flags.DEFINE_integer("tune_steps", 30,
+                            "Number of timed train steps per conf(default: 30)")
+    tf.flags.DEFINE_integer(
+        "tune_max_threads", 0,
+        "Max threads to search, 0 for cpu count(default: 0)")
+    tf.app.run()
@@ -3,15 +3,30 @@
 # @author: wensong
 
 import tensorflow as tf
+from utils.tf_utils import TFUtils
 from tf_base_layer import TFBaseLayer
 from tf_soft_att_layer import TFSoftAttLayer
 
 
 class TFBILSTMAttLayer(TFBaseLayer):
     '''多层bi-lstm加attention层封装
-    底层可以多个双向lstm，顶层是SoftAttention加权隐层表示。
+    底层可以多个双向rnn，前后向输出拼接后作为下一层输入，顶层是SoftAttention加权隐层表示。
+    rnn_type可选:
+    1、lstm: LSTMCell + bidirectional_dynamic_rnn，python while循环逐步计算
+    2、lstm_block_fused: LSTMBlockFusedCell，整段序列一个op，time-major，
+       后向通过reverse_sequence按真实长度翻转实现；
+       与lstm共用同一套变量(名字、shape、kernel内门顺序均一致)，
+       两种rnn_type训练的checkpoint可直接互相加载，无需转换
+    3、gru: GRUCell + bidirectional_dynamic_rnn
     '''
-    def __init__(self, in_hidden, hidden_sizes, attention_size, keep_prob):
+    def __init__(self,
+                 in_hidden,
+                 hidden_sizes,
+                 attention_size,
+                 keep_prob,
+                 seq_len=None,
+                 rnn_type="lstm",
+                 num_heads=1):
         '''Bi-LSTM-ATTENTION初始化
 
         Args:
@@ -19,7 +34,12 @@ class TFBILSTMAttLayer(TFBaseLayer):
             hidden_sizes: 多层BILSTM中每层隐层维数大小
             attention_size: 注意力矩阵宽度
             keep_prob: 多层lstm之间dropout输出时激活概率
+            seq_len: 真实序列长度, shape [batch]，padding部分不参与计算
+            rnn_type: lstm/lstm_block_fused/gru
+            num_heads: attention头数
         '''
+        if rnn_type not in ("lstm", "lstm_block_fused", "gru"):
+            raise ValueError("Unknown rnn_type: {}".format(rnn_type))
         # 父类初始化
         TFBaseLayer.__init__(self)
         # 当前layer参数
@@ -27,50 +47,114 @@ class TFBILSTMAttLayer(TFBaseLayer):
         self.hidden_sizes = hidden_sizes
         self.att_size = attention_size
         self.keep_prob = keep_prob
+        self.seq_len = seq_len
+        self.rnn_type = rnn_type
+        self.num_heads = num_heads
+        # attention权重, [batch, time_step, num_heads]
+        self.alphas = None
 
     def build(self):
         '''多层bilstm-attention Layer隐层表示
 
         Returns:
-            返回经过BILSTM-ATTENTION后的隐层表示，shape为[Batch, In_Hidden_Size]
+            返回经过BILSTM-ATTENTION后的隐层表示，shape为[Batch, num_heads * 2 * Last_Hidden_Size]
         '''
-        layer_hidden = self.in_hidden
-        # 定义双向LSTM的模型结构
+        # 定义双向RNN的模型结构
         with tf.name_scope("BILSTM_Layer"):
-            # n个双层lstm
-            for idx, hidden_size in enumerate(self.hidden_sizes):
-                with tf.name_scope("BILSTM" + str(idx)):
-                    # forward LSTM
-                    fw_lstm_cell = tf.nn.rnn_cell.DropoutWrapper(
-                        tf.nn.rnn_cell.LSTMCell(num_units=hidden_size,
-                                                state_is_tuple=True),
-                        output_keep_prob=self.keep_prob)
-                    # backward LSTM
-                    bw_lstm_cell = tf.nn.rnn_cell.DropoutWrapper(
-                        tf.nn.rnn_cell.LSTMCell(num_units=hidden_size,
-                                                state_is_tuple=True),
-                        output_keep_prob=self.keep_prob)
-
-                    # outputs: (output_fw, output_bw)
-                    # 其中两个元素的维度都是[batch_size, max_time, hidden_size],
-                    outputs, current_state = tf.nn.bidirectional_dynamic_rnn(
-                        fw_lstm_cell,
-                        bw_lstm_cell,
-                        layer_hidden,  # 第一层输入是word_emb，第二层输入是上一层双向的拼接隐层
-                        dtype=tf.float32,
-                        scope="BILSTM" + str(idx))
-
-                    # 从第三维拼接：[batch_size, time_step, hidden_size]
-                    layer_hidden = tf.concat(outputs, 2)
-
-        # 分割成前向和后向的输出
-        outputs = tf.split(layer_hidden, num_or_size_splits=2, axis=-1)
-        # [Batch, TimeStep, In_Hidden_Size]
-        bilstm_layer = outputs[0] + outputs[1]
+            if self.rnn_type == "lstm_block_fused":
+                # 前后向拼接: [batch_size, time_step, 2 * hidden_size]
+                bilstm_layer = self._build_block_fused()
+            else:
+                bilstm_layer = self._build_dynamic()
 
         # Attention
         with tf.name_scope("SoftAtt_layer"):
-            self.output = TFSoftAttLayer(bilstm_layer, self.att_size).layer()
+            att_layer = TFSoftAttLayer(bilstm_layer, self.att_size,
+                                       self.seq_len, self.num_heads)
+            self.output = att_layer.build()
+            self.alphas = att_layer.alphas
 
-            # [Batch, In_Hidden_Size]
+            # [Batch, num_heads * 2 * Last_Hidden_Size]
             return self.output
+
+    def _new_cell(self, hidden_size):
+        '''bidirectional_dynamic_rnn使用的单向cell
+        '''
+        if self.rnn_type == "gru":
+            return tf.nn.rnn_cell.GRUCell(num_units=hidden_size)
+        return tf.nn.rnn_cell.LSTMCell(num_units=hidden_size,
+                                       state_is_tuple=True)
+
+    def _build_dynamic(self):
+        '''LSTMCell/GRUCell逐步计算
+
+        Returns:
+            [batch_size, time_step, 2 * hidden_size]
+        '''
+        layer_hidden = self.in_hidden
+        # n个双层lstm
+        for idx, hidden_size in enumerate(self.hidden_sizes):
+            with tf.name_scope("BILSTM" + str(idx)):
+                # outputs: (output_fw, output_bw)
+                # 其中两个元素的维度都是[batch_size, max_time, hidden_size],
+                outputs, current_state = tf.nn.bidirectional_dynamic_rnn(
+                    self._new_cell(hidden_size),
+                    self._new_cell(hidden_size),
+                    layer_hidden,  # 第一层输入是word_emb，第二层输入是上一层双向的拼接隐层
+                    sequence_length=self.seq_len,  # 超出长度的step输出0且不再更新状态
+                    dtype=self.in_hidden.dtype,
+                    scope="BILSTM" + str(idx))
+
+                # 从第三维拼接：[batch_size, time_step, 2 * hidden_size]
+                # 输出dropout在拼接后统一做，与DropoutWrapper的output_keep_prob等价，
+                # 且低精度下在float32中计算
+                layer_hidden = TFUtils.dropout(tf.concat(outputs, 2),
+                                               self.keep_prob)
+
+        return layer_hidden
+
+    def _build_block_fused(self):
+        '''LSTMBlockFusedCell整段计算，层间保持time-major，只在首尾各转置一次
+        变量名与_build_dynamic的lstm一致: BILSTM{idx}/fw|bw/lstm_cell/kernel|bias
+
+        Returns:
+            [batch_size, time_step, 2 * hidden_size]
+        '''
+        # [time_step, batch_size, emb_size]
+        # LSTMBlockFusedCell只有float32实现，低精度输入先转回float32
+        layer_hidden = tf.transpose(tf.cast(self.in_hidden, tf.float32),
+                                    [1, 0, 2])
+        seq_len = self.seq_len
+        if seq_len is None:
+            shape = tf.shape(layer_hidden)
+            seq_len = tf.fill([shape[1]], shape[0])
+        for idx, hidden_size in enumerate(self.hidden_sizes):
+            with tf.variable_scope("BILSTM" + str(idx)):
+                with tf.variable_scope("fw"):
+                    # 显式传入scope，避免默认名唯一化导致多塔复用时变量名不一致
+                    output_fw, _ = tf.contrib.rnn.LSTMBlockFusedCell(
+                        hidden_size)(layer_hidden,
+                                     dtype=tf.float32,
+                                     sequence_length=seq_len,
+                                     scope="lstm_cell")
+                with tf.variable_scope("bw"):
+                    # 只翻转每条样本的有效部分，padding仍在尾部
+                    reversed_hidden = tf.reverse_sequence(layer_hidden,
+                                                          seq_len,
+                                                          seq_axis=0,
+                                                          batch_axis=1)
+                    output_bw, _ = tf.contrib.rnn.LSTMBlockFusedCell(
+                        hidden_size)(reversed_hidden,
+                                     dtype=tf.float32,
+                                     sequence_length=seq_len,
+                                     scope="lstm_cell")
+                    output_bw = tf.reverse_sequence(output_bw,
+                                                    seq_len,
+                                                    seq_axis=0,
+                                                    batch_axis=1)
+                layer_hidden = TFUtils.dropout(
+                    tf.concat([output_fw, output_bw], 2), self.keep_prob)
+
+        # [batch_size, time_step, 2 * hidden_size]
+        return tf.cast(tf.transpose(layer_hidden, [1, 0, 2]),
+                       self.in_hidden.dtype)
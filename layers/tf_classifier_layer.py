@@ -49,29 +49,35 @@ class TFClassifierLayer(TFBaseLayer):
         dropout_layer = None
         # add dropout before classify layer
         with tf.name_scope('dropout_layer'):
-            dropout_layer = tf.nn.dropout(self.in_hidden, self.keep_prob)
+            dropout_layer = TFUtils.dropout(self.in_hidden, self.keep_prob)
         # 定义l2损失
         l2_loss = tf.constant(0.0)
         # fc layer
         probability = None
+        # 预测模式不计算loss
+        self.loss = None
         with tf.name_scope("fc_output_layer"):
             W = tf.get_variable(
                 "W",
                 shape=[self.hidden_size, self.cls_num],
-                initializer=tf.contrib.layers.xavier_initializer())
+                initializer=tf.contrib.layers.xavier_initializer(),
+                dtype=self.in_hidden.dtype)
             b = tf.get_variable('b',
                                 shape=[self.cls_num],
-                                initializer=tf.constant_initializer(0.1))
-            # logits
-            self.logits = tf.nn.xw_plus_b(dropout_layer, W, b, name="logits")
+                                initializer=tf.constant_initializer(0.1),
+                                dtype=self.in_hidden.dtype)
+            # logits，低精度计算时转回float32，概率与loss均为float32
+            self.logits = tf.cast(tf.nn.xw_plus_b(dropout_layer, W, b),
+                                  tf.float32,
+                                  name="logits")
             if self.cls_type == "multi-label":
                 probability = tf.nn.sigmoid(self.logits)
             else:
                 probability = tf.nn.softmax(self.logits)
             # 训练模式
             if self.mode == "train":
-                l2_loss += tf.nn.l2_loss(W)
-                l2_loss += tf.nn.l2_loss(b)
+                l2_loss += tf.nn.l2_loss(tf.cast(W, tf.float32))
+                l2_loss += tf.nn.l2_loss(tf.cast(b, tf.float32))
                 self.loss = self._cal_loss() + self.l2_reg_lambda * l2_loss
 
         return probability, self.logits, self.loss
@@ -4,25 +4,39 @@
 
 import tensorflow as tf
 from tf_base_layer import TFBaseLayer
+from utils.quantize_utils import QuantizeUtils
+
+# 预训练词向量初始化所用的placeholder及assign op所在collection
+PRETRAIN_PLACEHOLDER = "pretrain_word_vecs"
+PRETRAIN_INIT_OPS = "pretrain_init_ops"
 
 
 class TFEmbeddingLayer(TFBaseLayer):
     '''word->embedding层的封装，支持传入预训练word_emb
+    num_partitions>1时词向量表按行连续切分为多个分片变量，
+    大词表时单个变量不必占用一整块连续内存，查询按div策略路由到各分片。
+    预训练词向量不写入图中常量(GraphDef有2GB上限)，而是创建placeholder及assign op，
+    变量初始化后由TFBaseClassifier.init_pretrain一次性feed。
     '''
     def __init__(self,
                  input_x,
                  vocab_size,
                  emb_size,
                  pretrain_word_vecs=None,
-                 word_emb_trainable=True):
+                 word_emb_trainable=True,
+                 num_partitions=1,
+                 dtype=tf.float32):
         '''初始化
 
         Args:
             input_x: 词序列的one-hot表示, shape [batch, wordid_list]
             vocab_size: 词向量为空时，使用vocab_size来初始化词向量
             emb_size: 词向量维数
-            pretrain_word_vecs: 预训练词向量
+            pretrain_word_vecs: 预训练词向量，shape [vocab_size, emb_size]的数组，
+                可以是memory-map，构图时只使用其shape
             word_emb_trainable: 预训练词向量是否可update
+            num_partitions: 词向量表分片数
+            dtype: 输出词向量的计算精度，词向量表始终为float32，只cast查到的行
         '''
         TFBaseLayer.__init__(self)
         self.input_x = input_x
@@ -30,27 +44,59 @@ class TFEmbeddingLayer(TFBaseLayer):
         self.emb_size = emb_size
         self.pretrain_word_vecs = pretrain_word_vecs
         self.word_emb_trainable = word_emb_trainable
+        self.num_partitions = num_partitions
+        self.dtype = dtype
 
     def build(self):
         '''embedding layer
         '''
         # 词嵌入层
         with tf.name_scope("word_embedding"):
-            embedding = None
-            # 利用预训练的词向量初始化词嵌入矩阵
+            partitioner = None
+            if self.num_partitions > 1:
+                partitioner = tf.fixed_size_partitioner(self.num_partitions)
             if self.pretrain_word_vecs is not None:
+                # 利用预训练的词向量初始化词嵌入矩阵
+                self.vocab_size, self.emb_size = self.pretrain_word_vecs.shape
                 embedding = tf.get_variable(
-                    initializer=self.pretrain_word_vecs,
+                    "embedding",
+                    shape=[self.vocab_size, self.emb_size],
+                    initializer=tf.zeros_initializer(),
                     trainable=self.word_emb_trainable,
-                    name="embedding")
+                    partitioner=partitioner)
+                # 多塔复用变量时只创建一次
+                if not tf.get_variable_scope().reuse:
+                    self._add_pretrain_init(embedding)
             else:
                 embedding = tf.get_variable(
                     "embedding",
                     shape=[self.vocab_size, self.emb_size],
-                    initializer=tf.contrib.layers.xavier_initializer())
+                    initializer=tf.contrib.layers.xavier_initializer(),
+                    partitioner=partitioner)
             # 查询词嵌入矩阵
             # 将输入词索引转成词向量
             # 输出shape：[batch_size, seq_len, emb_size]
-            self.output = tf.nn.embedding_lookup(embedding, self.input_x)
+            # 兼容训练后量化的词向量表
+            self.output = QuantizeUtils.embedding_lookup(
+                embedding, self.input_x)
+            if self.output.dtype != self.dtype:
+                self.output = tf.cast(self.output, self.dtype)
 
             return self.output
+
+    def _add_pretrain_init(self, embedding):
+        '''创建预训练词向量的placeholder及assign op，分片变量按各分片行偏移切片赋值
+        '''
+        placeholder = tf.placeholder(tf.float32,
+                                     [self.vocab_size, self.emb_size],
+                                     name="pretrain_word_vecs")
+        parts = list(embedding) if self.num_partitions > 1 else [embedding]
+        assign_ops = []
+        for part in parts:
+            save_slice_info = part._get_save_slice_info()
+            offset = save_slice_info.var_offset[0] if save_slice_info else 0
+            rows = part.get_shape()[0].value
+            assign_ops.append(
+                tf.assign(part, placeholder[offset:offset + rows]))
+        tf.add_to_collection(PRETRAIN_PLACEHOLDER, placeholder)
+        tf.add_to_collection(PRETRAIN_INIT_OPS, tf.group(*assign_ops))
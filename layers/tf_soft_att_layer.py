@@ -9,58 +9,91 @@ from tf_base_layer import TFBaseLayer
 class TFSoftAttLayer(TFBaseLayer):
     '''soft attention层封装
     softmax求出attention score后，对隐层进行软加权。
+    1、打分合并为二维矩阵乘: [B*T, H] x [H, A] -> tanh -> [B*T, A] x [A, heads]
+    2、padding位置打分置为dtype最小值，softmax本身减去最大值，不会溢出；
+       整条序列都是padding时退化为均匀权重，不产生NaN
+    3、加权求和为一次batch矩阵乘: [B, T, heads]^T x [B, T, H] -> [B, heads, H]
+    4、num_heads>1时为多头注意力池化，各头独立打分，输出按头拼接
+    attention权重保存在self.alphas，便于可视化分析。
     '''
-    def __init__(self, in_hidden, attention_size):
+    def __init__(self, in_hidden, attention_size, seq_len=None, num_heads=1):
         '''初始化
 
         Args:
             in_hidden: 需要进行软加权的隐层
             attention_size: attention权重矩阵宽度
+            seq_len: 真实序列长度, shape [batch]，padding位置不分配权重
+            num_heads: 注意力头数
         '''
         # 父类初始化
-        BaseTFBaseLayer.__init__(self)
+        TFBaseLayer.__init__(self)
         # 当前层参数
         self.in_hidden = in_hidden
-        self.in_hidden_size = in_hidden.get_shape()[-1]
+        self.in_hidden_size = in_hidden.get_shape()[-1].value
         self.attention_size = attention_size
+        self.seq_len = seq_len
+        self.num_heads = num_heads
+        # attention权重, [B, T, heads]
+        self.alphas = None
 
     def build(self):
         """返回soft-attention后的向量表示
         输入Shape为[Batch, TimeStep, In_Hidden_Size]
 
         Returns:
-            返回shape为[Batch, In_Hidden_Size]
+            返回shape为[Batch, num_heads * In_Hidden_Size]
         """
         # 初始化att参数
         att_w = tf.get_variable(
             "attention_weight",
-            shape=[self.hidden_size, self.attention_size],
-            initializer=tf.contrib.layers.xavier_initializer())
+            shape=[self.in_hidden_size, self.attention_size],
+            initializer=tf.contrib.layers.xavier_initializer(),
+            dtype=self.in_hidden.dtype)
         att_b = tf.get_variable(
             "attention_bias",
             shape=[self.attention_size],
-            initializer=tf.contrib.layers.zeros_initializer())
-        att_u = tf.get_variable(
-            "attention_u",
-            shape=[self.attention_size],
-            initializer=tf.contrib.layers.zeros_initializer())
+            initializer=tf.zeros_initializer(),
+            dtype=self.in_hidden.dtype)
+        # 单头保持[A]，与已有checkpoint兼容
+        u_shape = [self.attention_size]
+        if self.num_heads > 1:
+            u_shape = [self.attention_size, self.num_heads]
+        att_u = tf.get_variable("attention_u",
+                                shape=u_shape,
+                                initializer=tf.zeros_initializer(),
+                                dtype=self.in_hidden.dtype)
+        att_u = tf.reshape(att_u, [self.attention_size, self.num_heads])
 
+        shape = tf.shape(self.in_hidden)
+        batch_size, time_step = shape[0], shape[1]
         # 非线性转换
-        # [B, T, H] dot [H, A] = [B, T, A]
-        att_v = tf.tanh(tf.tensordot(self.in_hidden, att_w, axes=1) + att_b)
+        # [B*T, H] x [H, A] = [B*T, A]
+        hidden_2d = tf.reshape(self.in_hidden, [-1, self.in_hidden_size])
+        att_v = tf.tanh(tf.nn.xw_plus_b(hidden_2d, att_w, att_b))
+
+        # [B*T, A] x [A, heads] = [B, T, heads]，低精度计算时softmax在float32下进行
+        att_vu = tf.cast(tf.reshape(tf.matmul(att_v, att_u),
+                                    [batch_size, time_step, self.num_heads]),
+                         tf.float32,
+                         name="attention_vu")
 
-        # [B, T, A] dot [A] = [B, T]
-        att_vu = tf.tensordot(att_v, att_u, axes=1, name='attention_vu')
+        # padding位置打分置为最小值，softmax后权重为0
+        if self.seq_len is not None:
+            mask = tf.sequence_mask(self.seq_len, time_step)
+            mask = tf.tile(tf.expand_dims(mask, -1), [1, 1, self.num_heads])
+            att_vu = tf.where(mask, att_vu,
+                              tf.ones_like(att_vu) * att_vu.dtype.min)
 
-        # attention score, [B, T]
-        att_alpha = tf.nn.softmax(att_vu, name='attention_alpha')
+        # attention score, 沿时间维softmax: [B, T, heads]
+        self.alphas = tf.nn.softmax(att_vu, axis=1, name="attention_alpha")
 
-        # expand to: [B, T] -> [B, T, 1]
-        att_expand = tf.expand_dims(att_alpha, -1)
-        # 注意是点乘: [B, T, H] * [B, T, 1] = [B, T, H]
-        att_ah = self.in_hidden * att_expand
-        # reduce_sum, axis=1: [B, T, H] -> [B, H]
-        self.output = tf.reduce_sum(att_ah, axis=1)
+        # 加权求和: [B, heads, T] x [B, T, H] = [B, heads, H]
+        att_ah = tf.matmul(tf.cast(self.alphas, self.in_hidden.dtype),
+                           self.in_hidden,
+                           transpose_a=True)
+        # [B, heads * H]
+        self.output = tf.reshape(att_ah,
+                                 [-1, self.num_heads * self.in_hidden_size])
 
-        # [Batch, In_Hidden_Size]
+        # [Batch, num_heads * In_Hidden_Size]
         return self.output
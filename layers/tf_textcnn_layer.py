@@ -8,25 +8,50 @@ from tf_base_layer import TFBaseLayer
 
 class TFTextCNNLayer(TFBaseLayer):
     '''TextCNN Layer
-    底层embedding layer, 再接多窗口多核卷积，最后最大池化max-pooling
+    底层embedding layer, 再接多窗口多核卷积，最后全局最大池化max-pooling
+    全局池化不依赖固定序列长度，可配合按batch动态padding使用
+    fused模式下所有窗口合并为一次1-D卷积：各W{k}在时间维补0到最大窗口K后按输出通道拼接，
+    输入末尾补K-min(k)个0，卷积后把窗口k越界的位置在relu后置0，
+    由于relu输出非负，最大池化结果与逐窗口卷积完全一致，变量及checkpoint也保持不变。
     '''
-    def __init__(self, in_hidden, max_seq_len, filter_sizes, num_filters):
+    def __init__(self, in_hidden, filter_sizes, num_filters, fused=False):
         '''TextCNN初始化
 
         Args:
             in_hidden: 输入层tensor, 通常是一个batch的词向量
-            max_seq_len: 序列最大长度
             filter_sizes: array类型，所有卷积核的大小，支持多个窗口同时卷积
             num_filters: 卷积核个数
+            fused: 是否将所有窗口合并为一次卷积
         '''
         # 父类初始化
         TFBaseLayer.__init__(self)
         # 参数
         self.in_hidden = in_hidden
         self.emb_size = self.in_hidden.get_shape()[-1]
-        self.max_seq_len = max_seq_len
         self.filter_sizes = filter_sizes
         self.num_filters = num_filters
+        self.fused = fused
+
+    def _get_params(self, filter_size):
+        '''窗口filter_size的卷积核及偏置
+
+        Returns:
+            W: shape [filter_size, emb_size, 1, num_filters]
+            b: shape [num_filters]
+        '''
+        # 卷积核shape：[卷积核大小，宽度，输入通数，输出通道数]
+        filter_shape = [filter_size, self.emb_size, 1, self.num_filters]
+        # 随机生成截断正态分布参数，大于两倍标准差stddev即截断
+        W = tf.get_variable(
+            "W" + str(filter_size),
+            shape=filter_shape,
+            initializer=tf.truncated_normal_initializer(stddev=0.1),
+            dtype=self.in_hidden.dtype)
+        b = tf.get_variable("b" + str(filter_size),
+                            shape=[self.num_filters],
+                            initializer=tf.zeros_initializer(),
+                            dtype=self.in_hidden.dtype)
+        return W, b
 
     def build(self):
         '''TextCNN Layer层
@@ -34,31 +59,30 @@ class TFTextCNNLayer(TFBaseLayer):
         Returns:
             返回经过TextCNN后的隐层表示，shape是[batch, feature_dim=filter_sizes*num_filters]
         '''
+        # batch内最大长度小于最大卷积窗口时补0，保证窄卷积至少有一个输出
+        seq_len = tf.shape(self.in_hidden)[1]
+        pad_len = tf.maximum(0, max(self.filter_sizes) - seq_len)
+        in_hidden = tf.pad(self.in_hidden, [[0, 0], [0, pad_len], [0, 0]])
+        if self.fused:
+            self.output = self._build_fused(in_hidden)
+        else:
+            self.output = self._build_loop(in_hidden)
+
+        return self.output
+
+    def _build_loop(self, in_hidden):
+        '''逐窗口卷积
+        '''
         # 在-1列扩展一维，tf.nn.conv2d的input参数为四维变量
         # shape: [batch_size, seq_len, emb_size, 1]
-        embedded_words_expanded = tf.expand_dims(self.in_hidden, -1)
+        embedded_words_expanded = tf.expand_dims(in_hidden, -1)
 
         # 所有卷积核的池化层
         pooled_outputs = []
         # 遍历卷积核：可以同时用3、4、5等多个窗口
         for i, filter_size in enumerate(self.filter_sizes):
             with tf.name_scope("conv-maxpool-%s" % filter_size):
-                # 卷积核shape：[卷积核大小，宽度，输入通数，输出通道数]
-                filter_shape = [
-                    filter_size, self.emb_size, 1, self.num_filters
-                ]
-                # 卷积核
-                # 随机生成截断正态分布参数，大于两倍标准差stddev即截断
-                filters = tf.Variable(tf.truncated_normal(filter_shape,
-                                                          stddev=0.1),
-                                      name="filters")
-                W = tf.get_variable(
-                    "W" + str(filter_size),
-                    shape=filter_shape,
-                    initializer=tf.truncated_normal_initializer(stddev=0.1))
-                b = tf.get_variable("b" + str(filter_size),
-                                    shape=[self.num_filters],
-                                    initializer=tf.zeros_initializer())
+                W, b = self._get_params(filter_size)
                 # 卷积
                 # 'SAME'为等长卷积填充0, 'VALID'为窄卷积不填充
                 conv = tf.nn.conv2d(embedded_words_expanded,
@@ -68,13 +92,12 @@ class TFTextCNNLayer(TFBaseLayer):
                                     name="conv" + str(filter_size))
                 # 非线性变换隐层
                 hidden = tf.nn.relu(tf.add(conv, b), name="relu")
-                # 最大池化
-                pooled = tf.nn.max_pool(
-                    hidden,
-                    ksize=[1, self.max_seq_len - filter_size + 1, 1, 1],
-                    strides=[1, 1, 1, 1],
-                    padding='VALID',
-                    name="pool" + str(filter_size))
+                # 全局最大池化: [batch, seq_len - filter_size + 1, 1, num_filters]
+                # -> [batch, 1, 1, num_filters]
+                pooled = tf.reduce_max(hidden,
+                                       axis=1,
+                                       keep_dims=True,
+                                       name="pool" + str(filter_size))
                 # 池化后的结果append起来
                 pooled_outputs.append(pooled)
 
@@ -84,6 +107,44 @@ class TFTextCNNLayer(TFBaseLayer):
         # [batch, emb_size, in_channel_num, out_channel_num]
         h_pool = tf.concat(pooled_outputs, 3)
         # reshape: [batch, feature_dim]
-        self.output = tf.reshape(h_pool, [-1, feature_dim])
+        return tf.reshape(h_pool, [-1, feature_dim])
 
-        return self.output
+    def _build_fused(self, in_hidden):
+        '''所有窗口一次卷积
+        '''
+        max_size = max(self.filter_sizes)
+        min_size = min(self.filter_sizes)
+        with tf.name_scope("conv-maxpool-fused"):
+            kernels, biases, limits = [], [], []
+            # 补0后的序列长度，窗口k的合法起始位置为[0, seq_len - k]
+            seq_len = tf.shape(in_hidden)[1]
+            for filter_size in self.filter_sizes:
+                with tf.name_scope("conv-maxpool-%s" % filter_size):
+                    W, b = self._get_params(filter_size)
+                # 时间维尾部补0到最大窗口: [max_size, emb_size, num_filters]
+                kernels.append(
+                    tf.pad(W[:, :, 0, :],
+                           [[0, max_size - filter_size], [0, 0], [0, 0]]))
+                biases.append(b)
+                limits.append(
+                    tf.fill([self.num_filters], seq_len - filter_size))
+            # [max_size, emb_size, num_filters * len(filter_sizes)]
+            kernel = tf.concat(kernels, 2)
+            bias = tf.concat(biases, 0)
+            limit = tf.concat(limits, 0)
+            # 输入尾部补0，使最小窗口的所有位置都有输出
+            padded = tf.pad(in_hidden,
+                            [[0, 0], [0, max_size - min_size], [0, 0]])
+            conv = tf.nn.conv1d(padded,
+                                kernel,
+                                stride=1,
+                                padding="VALID",
+                                name="conv")
+            hidden = tf.nn.relu(conv + bias, name="relu")
+            # 窗口越界位置置0: [out_len, feature_dim]
+            positions = tf.range(tf.shape(hidden)[1])
+            mask = tf.cast(
+                tf.less_equal(positions[:, None], limit[None, :]),
+                hidden.dtype)
+            # 全局最大池化: [batch, feature_dim]
+            return tf.reduce_max(hidden * mask, axis=1, name="pool")
@@ -4,11 +4,19 @@
 
 import os
 import sys
+import json
 import datetime
 import logging
 sys.path.append(os.getcwd() + "/../../")
 from utils.tf_utils import TFUtils
+from utils.quantize_utils import QuantizeGetter
+from utils.precision_utils import COMPUTE_DTYPES, MixedPrecisionGetter
+from utils.metrics_utils import MetricsUtils
+from utils.train_profiler import TrainProfiler
+from utils.binary_corpus import BinaryCorpus
+from layers.tf_embedding_layer import PRETRAIN_PLACEHOLDER, PRETRAIN_INIT_OPS
 import tensorflow as tf
+import numpy as np
 
 
 class TFBaseClassifier(object):
@@ -26,13 +34,38 @@ class TFBaseClassifier(object):
         # 获取全局参数
         self.flags = flags
 
+        # 计算精度，bfloat16时以float32主权重+低精度激活训练
+        self.compute_dtype = COMPUTE_DTYPES[self.flags.precision]
+
+        # 长度分桶边界，为空则不分桶
+        self.bucket_boundaries = [
+            int(b) for b in self.flags.bucket_boundaries.split(",") if b
+        ]
+
         # 输入&占位符
-        self.input_x = tf.placeholder(tf.int32, [None, None],
-                                      name="input_x")  # 输入二维张量
-        self.input_y = tf.placeholder(tf.float32, [None, self.flags.cls_num],
-                                      name="input_y")  # 标签
-        self.keep_prob = tf.placeholder(tf.float32, name="keep_prob")  # 激活概率
-        self.pretrain_word_vecs = None  # 预训练语言模型
+        self.iterator = None  # tf.data输入管道迭代器
+        if self.flags.mode == "train" and self.flags.input_mode == "dataset":
+            self._add_input_pipeline()
+        else:
+            self.input_x = tf.placeholder(tf.int32, [None, None],
+                                          name="input_x")  # 输入二维张量
+            self.input_y = tf.placeholder(tf.float32,
+                                          [None, self.flags.cls_num],
+                                          name="input_y")  # 标签
+        if self.flags.mode == "train":
+            self.keep_prob = tf.placeholder_with_default(
+                1.0, [], name="keep_prob")  # 激活概率，预测时不feed即不dropout
+        else:
+            # 预测图直接不构建dropout
+            self.keep_prob = 1.0
+        # batch样本数与非padding词数，用于吞吐统计，dataset模式下同样可取
+        self.batch_examples = None
+        self.batch_tokens = None
+        if self.flags.mode == "train":
+            self.batch_examples = tf.shape(self.input_x)[0]
+            self.batch_tokens = tf.reduce_sum(
+                tf.cast(tf.not_equal(self.input_x, 0), tf.int32))
+        self.pretrain_word_vecs = None  # 预训练词向量，构图前设置
 
         # 模型产生的变量
         self.loss = 0.0  # 损失
@@ -41,6 +74,11 @@ class TFBaseClassifier(object):
         self.logits = None  # 输出
         self.probability = None  # 预测概率
         self.saver = None  # 保存器: checkpoint模型
+        self.checkpointer = None  # 异步checkpoint
+        self.profiler = None  # 训练埋点
+        self.last_step = 0  # 最近一次训练的全局步数
+        self.eval_history = []  # 训练中每次评估的指标dict
+        self.eval_callback = None  # 评估后回调，参数为指标dict，返回True则提前停止训练
         self.predictions = None  # 预测结果
         self.global_step = None  # 全局训练步数
 
@@ -50,12 +88,108 @@ class TFBaseClassifier(object):
         self.accuracy = None  # 正确率
         self.f1_score = None  # f1-score
 
-    def build_model(self):
-        '''构建模型
+    def build_tower(self, input_x, input_y):
+        '''构建单个塔的前向计算
         子类实现
+
+        Args:
+            input_x: 输入词id, shape [batch, seq_len]
+            input_y: 标签, shape [batch, cls_num]
+
+        Returns:
+            probability, logits, loss
         '''
         raise NotImplementedError
 
+    def build_model(self):
+        '''构建模型
+        num_towers>1时将batch切成多份，在同一张图内构建多个共享参数的塔，
+        各塔由inter-op线程池并行执行；loss取各塔均值，梯度即为各塔梯度均值，
+        之后统一截断和更新。
+
+        Returns:
+            self
+        '''
+        # 混合精度: 可训练变量以float32存储，按计算精度cast后参与计算
+        getter = None
+        if self.compute_dtype != tf.float32:
+            getter = MixedPrecisionGetter(self.compute_dtype)
+        with tf.variable_scope(tf.get_variable_scope(), custom_getter=getter):
+            return self._build_towers()
+
+    def _build_towers(self):
+        '''构建单塔或多塔
+        '''
+        num_towers = self.flags.num_towers if self.flags.mode == "train" else 1
+        if num_towers <= 1:
+            self.probability, self.logits, self.loss = self.build_tower(
+                self.input_x, self.input_y)
+            return self
+
+        # 按batch连续切分，各塔样本数相差不超过1
+        batch_size = tf.shape(self.input_x)[0]
+        partitions = tf.range(batch_size) * num_towers // batch_size
+        x_parts = tf.dynamic_partition(self.input_x, partitions, num_towers)
+        y_parts = tf.dynamic_partition(self.input_y, partitions, num_towers)
+        index_parts = tf.dynamic_partition(tf.range(batch_size), partitions,
+                                           num_towers)
+        tower_probs, tower_logits, tower_losses = [], [], []
+        for i in range(num_towers):
+            # 第一个塔创建参数，其余塔复用
+            with tf.variable_scope(tf.get_variable_scope(), reuse=i > 0):
+                with tf.name_scope("tower_%d" % i):
+                    probability, logits, loss = self.build_tower(
+                        x_parts[i], y_parts[i])
+            tower_probs.append(probability)
+            tower_logits.append(logits)
+            # 塔内loss为样本均值，按样本数加权；空塔的均值为NaN，不计入
+            tower_size = tf.cast(tf.shape(x_parts[i])[0], loss.dtype)
+            tower_losses.append(
+                tf.where(tower_size > 0, loss * tower_size,
+                         tf.zeros_like(loss)))
+        # 按原batch顺序拼回
+        self.probability = tf.dynamic_stitch(index_parts, tower_probs)
+        self.logits = tf.dynamic_stitch(index_parts, tower_logits)
+        self.loss = tf.add_n(tower_losses) / tf.cast(batch_size,
+                                                     tower_losses[0].dtype)
+
+        return self
+
+    def _add_input_pipeline(self):
+        '''tf.data输入管道
+        训练数据直接以tensor形式进入图，不再经过feed_dict拷贝。
+        输入仍保留为placeholder_with_default，评估时可照常feed。
+        '''
+        with tf.name_scope("input_pipeline"):
+            dataset = TFUtils.tfrecord_dataset(
+                self.flags.train_files.split(","),
+                self.flags.cls_num,
+                self.flags.batch_size,
+                self.flags.num_epochs,
+                shuffle_buffer_size=self.flags.shuffle_buffer_size,
+                num_parallel_calls=self.flags.num_parallel_calls,
+                prefetch_size=self.flags.prefetch_size,
+                bucket_boundaries=self.bucket_boundaries)
+            self.iterator = dataset.make_initializable_iterator()
+            next_x, next_y = self.iterator.get_next()
+        self.input_x = tf.placeholder_with_default(next_x, [None, None],
+                                                   name="input_x")
+        self.input_y = tf.placeholder_with_default(
+            next_y, [None, self.flags.cls_num], name="input_y")
+
+    def init_pretrain(self, sess):
+        '''以预训练词向量赋值词嵌入矩阵，需在变量初始化之后调用
+        词向量通过placeholder一次性feed，不进入GraphDef
+
+        Args:
+            sess: 会话
+        '''
+        if self.pretrain_word_vecs is None:
+            return
+        placeholder = sess.graph.get_collection(PRETRAIN_PLACEHOLDER)[0]
+        sess.run(sess.graph.get_collection(PRETRAIN_INIT_OPS),
+                 feed_dict={placeholder: self.pretrain_word_vecs})
+
     def get_optimizer(self):
         '''获取优化器
 
@@ -66,6 +200,9 @@ class TFBaseClassifier(object):
 
         if self.flags.opt == "adam":
             optimizer = tf.train.AdamOptimizer(self.flags.lr)
+        # 稀疏梯度(词向量)只更新batch内出现的行及其动量，大词表下避免每步更新整张表
+        if self.flags.opt == "lazy_adam":
+            optimizer = tf.contrib.opt.LazyAdamOptimizer(self.flags.lr)
         if self.flags.opt == "rmsprop":
             optimizer = tf.train.RMSPropOptimizer(self.flags.lr)
         if self.flags.opt == "sgd":
@@ -116,6 +253,12 @@ class TFBaseClassifier(object):
         tf.summary.scalar('precision', self.precision_update)
         tf.summary.scalar('recall', self.recall_update)
         tf.summary.scalar('accuracy', self.accuracy_update)
+        # 重置streaming指标的局部变量
+        metric_vars = []
+        for scope in ["precision", "recall", "accuracy"]:
+            metric_vars.extend(
+                tf.get_collection(tf.GraphKeys.LOCAL_VARIABLES, scope=scope))
+        self.metrics_reset_op = tf.variables_initializer(metric_vars)
 
     def get_predictions(self):
         '''获取预测结果
@@ -136,6 +279,9 @@ class TFBaseClassifier(object):
             # 大于等于第k大，True转1.0，False转0.0
             self.predictions = tf.cast(
                 tf.greater_equal(self.probability, topk_values), tf.float32)
+        # 固定tensor名，供加载checkpoint后预测使用
+        self.probability = tf.identity(self.probability, name="probability")
+        self.predictions = tf.identity(self.predictions, name="predictions")
 
     def train_onestep(self, sess, x_batch, y_batch):
         '''单步训练
@@ -146,20 +292,41 @@ class TFBaseClassifier(object):
             y_batch: 标签batch
 
         Return:
-            返回训练记录、损失和预测结果
+            返回当前步数、损失、样本数和非padding词数
         '''
-        feed_dict = {
-            self.input_x: x_batch,
-            self.input_y: y_batch,
-            self.keep_prob: self.flags.keep_prob
-        }
+        feed_dict = {self.keep_prob: self.flags.keep_prob}
+        # dataset模式下batch为None，直接从输入管道取数据
+        if x_batch is not None:
+            feed_dict[self.input_x] = x_batch
+            feed_dict[self.input_y] = y_batch
+        fetches = [
+            self.train_op, self.global_step, self.loss, self.accuracy_update,
+            self.batch_examples, self.batch_tokens
+        ]
+        # 即将执行的步数，用于判断是否写summary和抓取trace
+        next_step = self.last_step + 1
+        with_summary = (self.profiler is not None and self.flags.summary_every
+                        and next_step % self.flags.summary_every == 0)
+        if with_summary:
+            fetches.append(self.summary_op)
+        options, run_metadata = (None, None)
+        if self.profiler is not None:
+            options, run_metadata = self.profiler.run_options(next_step)
         # 运行会话
-        _, step, loss, acc = sess.run(
-            [self.train_op, self.global_step, self.loss, self.accuracy_update],
-            feed_dict=feed_dict)
+        results = sess.run(fetches,
+                           feed_dict=feed_dict,
+                           options=options,
+                           run_metadata=run_metadata)
+        _, step, loss, acc, num_examples, num_tokens = results[:6]
+        self.last_step = step
+        if with_summary:
+            self.profiler.add_summary(results[6], step)
+        if run_metadata is not None:
+            self.profiler.add_trace(step, run_metadata)
         time_str = datetime.datetime.now().isoformat()
         logging.info("{}: step {}, loss {:g}, acc {}".format(
             time_str, step, loss, acc))
+        return step, loss, num_examples, num_tokens
 
     def train(self, sess, vocab_processor, save_path, x_train, y_train, x_dev,
               y_dev):
@@ -177,61 +344,264 @@ class TFBaseClassifier(object):
         # 创建目录
         checkpoint_dir = os.path.abspath(os.path.join(save_path,
                                                       "checkpoints"))
-        checkpoint_prefix = os.path.join(checkpoint_dir, "model")
         if not os.path.exists(checkpoint_dir):
             os.makedirs(checkpoint_dir)
-        # 生成batch, zip会将两个数组遍历打包成对元组
-        batches = TFUtils.batch_iter(list(zip(x_train,
-                                              y_train)), self.flags.batch_size,
-                                     self.flags.num_epochs)
+        # 词表预处理后不再变化，只写一次
+        vocab_processor.save(os.path.join(checkpoint_dir, "vocab"))
+        # emb_size可能由预训练词向量决定，随checkpoint保存，预测构图时恢复
+        with open(os.path.join(checkpoint_dir, "model_conf.json"),
+                  "w") as fout:
+            json.dump({"emb_size": self.flags.emb_size}, fout)
+        # 训练埋点：分阶段耗时、吞吐、summary与timeline
+        self.profiler = TrainProfiler(
+            os.path.join(save_path, "profile"), sess.graph,
+            [int(s) for s in self.flags.trace_steps.split(",") if s])
+        self.last_step = tf.train.global_step(sess, self.global_step)
         # 按batch训练
-        for batch in batches:
-            # zip(*)逆向解压
-            x_batch, y_batch = zip(*batch)
+        batches = iter(self.get_batches(sess, x_train, y_train))
+        while True:
+            # 取batch
+            with self.profiler.phase("input"):
+                batch = next(batches, None)
+            if batch is None:
+                break
+            x_batch, y_batch = batch
             # 单步训练
-            self.train_onestep(sess, x_batch, y_batch)
-            # 获取当前步数
-            current_step = tf.train.global_step(sess, self.global_step)
+            try:
+                with self.profiler.phase("run"):
+                    current_step, loss, num_examples, num_tokens = \
+                        self.train_onestep(sess, x_batch, y_batch)
+            except tf.errors.OutOfRangeError:
+                # 输入管道数据耗尽，训练结束
+                break
             # 评估
+            stop = False
             if current_step % self.flags.evaluate_every == 0:
-                logging.info("\nEvaluation:")
-                self.eval(sess, x_dev, y_dev)
-                logging.info("")
-            # 保存模型&词表
+                with self.profiler.phase("eval"):
+                    logging.info("\nEvaluation:")
+                    metrics = self.eval(sess, x_dev, y_dev)
+                    logging.info("")
+                self.eval_history.append(metrics)
+                if self.eval_callback is not None:
+                    stop = self.eval_callback(metrics)
+            # 异步保存模型
             if current_step % self.flags.checkpoint_every == 0:
-                path = self.saver.save(sess,
-                                       checkpoint_prefix,
-                                       global_step=current_step)
-                vocab_processor.save(os.path.join(checkpoint_dir, "vocab"))
-                logging.info("Saved model checkpoint to {}\n".format(path))
+                with self.profiler.phase("checkpoint"):
+                    self.checkpointer.save(sess, checkpoint_dir, current_step)
+            self.profiler.step_done(current_step, num_examples, num_tokens,
+                                    loss)
+            if stop:
+                logging.info("Early stopped at step {}".format(current_step))
+                break
+        self.profiler.close()
+        # 等待最后一次checkpoint写完
+        self.checkpointer.wait()
+        if self.checkpointer.stall_times:
+            logging.info(
+                "Checkpoint stall: {:d} saves, mean {:.3f}s, max {:.3f}s".
+                format(
+                    len(self.checkpointer.stall_times),
+                    sum(self.checkpointer.stall_times) /
+                    len(self.checkpointer.stall_times),
+                    max(self.checkpointer.stall_times)))
+        # 导出推理模型
+        if self.flags.export_model:
+            self.export(sess, os.path.join(save_path, "export"),
+                        vocab_processor, self.flags.export_quantize)
+
+    def export(self, sess, export_dir, vocab_processor=None, quantize="none"):
+        '''导出推理专用的SavedModel
+        以infer模式在新图中重建模型，不含dropout、metrics、summary和优化器，
+        载入当前参数后冻结为常量，签名为input_x -> probability, predictions。
+        同时导出frozen_graph.pb，以及词表(若传入)。
+
+        Args:
+            sess: 训练会话
+            export_dir: 导出目录，必须不存在
+            vocab_processor: 词表处理器
+            quantize: none/int8/float16，词向量、卷积核和全连接层W的存储精度
+        '''
+        # 训练图中变量的取值，分片变量按原变量名拼接为整张表
+        train_vars = dict(
+            (var.op.name, var) for var in sess.graph.get_collection(
+                tf.GraphKeys.GLOBAL_VARIABLES))
+        partitions = {}
+        for var in train_vars.values():
+            save_slice_info = var._get_save_slice_info()
+            if save_slice_info is not None:
+                partitions.setdefault(save_slice_info.full_name, []).append(
+                    (save_slice_info.var_offset, var))
 
-    def eval(self, sess, x_batch, y_batch):
-        '''验证模型
+        def value_fn(name):
+            if name in partitions:
+                return np.concatenate(
+                    sess.run([var for _, var in sorted(partitions[name])]), 0)
+            return sess.run(train_vars[name])
+
+        output_names = ["probability", "predictions"]
+        # 训练后量化: 构图时直接以量化常量替换对应变量
+        getter = None
+        if quantize != "none":
+            getter = QuantizeGetter(value_fn, quantize)
+        # 以infer模式重建推理图并冻结参数
+        infer_graph = tf.Graph()
+        with infer_graph.as_default():
+            with tf.variable_scope(tf.get_variable_scope(),
+                                   custom_getter=getter):
+                # 推理图参数冻结为常量，词向量表无需分片，按float32计算
+                model = self.__class__(
+                    TFUtils.override_flags(self.flags,
+                                           mode="infer",
+                                           emb_partitions=1,
+                                           precision="float32"))
+                model.build_model()
+                model.get_predictions()
+            infer_vars = tf.global_variables()
+            values = [value_fn(var.op.name) for var in infer_vars]
+            with tf.Session(graph=infer_graph) as infer_sess:
+                for var, value in zip(infer_vars, values):
+                    var.load(value, infer_sess)
+                frozen_graph_def = tf.graph_util.convert_variables_to_constants(
+                    infer_sess, infer_graph.as_graph_def(), output_names)
+
+        # 写SavedModel，图中已无变量
+        serving_graph = tf.Graph()
+        with serving_graph.as_default():
+            tf.import_graph_def(frozen_graph_def, name="")
+            signature = tf.saved_model.signature_def_utils.predict_signature_def(
+                inputs={"input_x": serving_graph.get_tensor_by_name("input_x:0")},
+                outputs=dict((name, serving_graph.get_tensor_by_name(name + ":0"))
+                             for name in output_names))
+            builder = tf.saved_model.builder.SavedModelBuilder(export_dir)
+            with tf.Session(graph=serving_graph) as serving_sess:
+                builder.add_meta_graph_and_variables(
+                    serving_sess, [tf.saved_model.tag_constants.SERVING],
+                    signature_def_map={
+                        tf.saved_model.signature_constants.
+                        DEFAULT_SERVING_SIGNATURE_DEF_KEY: signature
+                    })
+            builder.save()
+        tf.train.write_graph(frozen_graph_def,
+                             export_dir,
+                             "frozen_graph.pb",
+                             as_text=False)
+        if vocab_processor is not None:
+            vocab_processor.save(os.path.join(export_dir, "vocab"))
+        logging.info("Exported inference model to {}".format(export_dir))
+
+    def get_batches(self, sess, x_train, y_train):
+        '''训练batch生成器
 
         Args:
             sess: 会话
-            x_batch: 输入样本
-            y_batch: 输入标签
+            x_train: 训练集输入，binary模式下为BinaryCorpus
+            y_train: 训练集标签，binary模式下为None
+
+        Returns:
+            feed_dict/binary模式返回(x_batch, y_batch)；
+            dataset模式数据在图内，返回(None, None)直到管道耗尽
         '''
-        feed_dict = {
-            self.input_x: x_batch,
-            self.input_y: y_batch,
-            self.keep_prob: 1.0  # 评估时候通过dropout设置不更新参数
-        }
+        if self.iterator is not None:
+            sess.run(self.iterator.initializer)
+            while True:
+                yield None, None
+        elif isinstance(x_train, BinaryCorpus):
+            # memory-map语料按索引gather，batch内动态padding
+            for x_batch, y_batch in x_train.batch_iter(
+                    self.flags.batch_size, self.flags.num_epochs):
+                yield x_batch, y_batch
+        elif self.bucket_boundaries:
+            # 按长度分桶，batch内动态padding
+            for x_batch, y_batch in TFUtils.bucket_batch_iter(
+                    x_train, y_train, self.flags.batch_size,
+                    self.flags.num_epochs, self.bucket_boundaries):
+                yield x_batch, y_batch
+        else:
+            # 生成batch, zip会将两个数组遍历打包成对元组
+            batches = TFUtils.batch_iter(list(zip(x_train, y_train)),
+                                         self.flags.batch_size,
+                                         self.flags.num_epochs)
+            for batch in batches:
+                # zip(*)逆向解压
+                x_batch, y_batch = zip(*batch)
+                yield x_batch, y_batch
 
-        # 执行会话
-        step, loss, accuracy = sess.run(
-            [self.global_step, self.loss, self.accuracy], feed_dict)
+    def _eval_batches(self, x_dev, y_dev):
+        '''按eval_batch_size切分验证集，每块截断到块内最大长度
+        '''
+        batch_size = self.flags.eval_batch_size
+        for start in range(0, len(y_dev), batch_size):
+            x_batch = np.asarray(x_dev[start:start + batch_size])
+            y_batch = np.asarray(y_dev[start:start + batch_size])
+            max_len = max(1, TFUtils.seq_lengths(x_batch).max())
+            yield x_batch[:, :max_len], y_batch
+
+    def eval(self, sess, x_dev, y_dev):
+        '''分批评估验证集
+        按eval_batch_size分块预取并执行，避免整个验证集一次前向导致OOM；
+        由各块预测结果向量化计数，得到精确的整体指标。
+
+        Args:
+            sess: 会话
+            x_dev: 验证集输入
+            y_dev: 验证集标签
+
+        Returns:
+            指标dict: loss、accuracy、precision、recall、f1及每类指标
+        '''
+        # 训练中streaming指标从本次评估后重新累计
+        sess.run(self.metrics_reset_op)
+        cls_num = self.flags.cls_num
+        multi_label = self.flags.cls_type == "multi-label"
+        confusion = np.zeros((cls_num, cls_num), dtype=np.int64)
+        counts = np.zeros((3, cls_num), dtype=np.int64)
+        num_exact = 0
+        total_loss, num_samples = 0.0, 0
+        step = sess.run(self.global_step)
+        for x_batch, y_batch in TFUtils.prefetch_iter(
+                self._eval_batches(x_dev, y_dev), self.flags.prefetch_size):
+            # 执行会话，keep_prob默认为1.0，不dropout
+            loss, predictions = sess.run([self.loss, self.predictions], {
+                self.input_x: x_batch,
+                self.input_y: y_batch
+            })
+            total_loss += loss * len(y_batch)
+            num_samples += len(y_batch)
+            if multi_label:
+                counts += MetricsUtils.multilabel_counts(y_batch, predictions)
+                num_exact += np.sum(
+                    np.all((y_batch > 0.5) == (predictions > 0.5), axis=1))
+            else:
+                confusion += MetricsUtils.confusion_matrix(
+                    np.argmax(y_batch, 1), np.argmax(predictions, 1), cls_num)
+
+        if multi_label:
+            metrics = MetricsUtils.report_from_multilabel(
+                counts, num_samples, num_exact)
+        else:
+            metrics = MetricsUtils.report_from_confusion(confusion)
+        metrics["loss"] = total_loss / max(num_samples, 1)
+        metrics["step"] = int(step)
         time_str = datetime.datetime.now().isoformat()
-        logging.info("{}: step {}, loss {:g}, acc {:g}".format(
-            time_str, step, loss, accuracy))
+        logging.info(
+            "{}: step {}, loss {:g}, acc {:g}, precision {:g}, recall {:g}, f1 {:g}"
+            .format(time_str, step, metrics["loss"], metrics["accuracy"],
+                    metrics["precision"], metrics["recall"], metrics["f1"]))
+        if not multi_label:
+            logging.info("confusion matrix: {}".format(
+                metrics["confusion_matrix"]))
 
-    def infer(self, sess, x_batch, y_batch):
-        '''验证模型
+        return metrics
+
+    def infer(self, sess, x_batch):
+        '''预测
 
         Args:
             sess: 会话
             x_batch: 输入样本
-            y_batch: 输入标签
+
+        Returns:
+            预测概率probability、预测结果predictions
         '''
-        self.eval(sess, x_batch, y_batch)
+        return sess.run([self.probability, self.predictions],
+                        {self.input_x: x_batch})
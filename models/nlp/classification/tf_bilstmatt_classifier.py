@@ -6,6 +6,7 @@ import os
 import sys
 sys.path.append(os.getcwd() + "/../../")
 import tensorflow as tf
+from utils.tf_utils import TFUtils
 from tf_base_classifier import TFBaseClassifier
 from layers.tf_embedding_layer import TFEmbeddingLayer
 from layers.tf_bilstm_att_layer import TFBILSTMAttLayer
@@ -25,17 +26,26 @@ class TFBILSTMATTClassifier(TFBaseClassifier):
         # 此分类器参数
         self.hidden_sizes = list(map(int, flags.hidden_sizes.split(",")))
 
-    def build_model(self):
+    def build_tower(self, input_x, input_y):
         '''构建模型
+
+        Returns:
+            probability, logits, loss
         '''
-        embedding_layer = TFEmbeddingLayer(self.input_x, self.flags.vocab_size,
+        # 真实序列长度
+        seq_len = TFUtils.sequence_length(input_x)
+        embedding_layer = TFEmbeddingLayer(input_x, self.flags.vocab_size,
                                            self.flags.emb_size,
-                                           self.pretrain_word_vecs).build()
+                                           self.pretrain_word_vecs,
+                                           self.flags.word_emb_trainable,
+                                           self.flags.emb_partitions,
+                                           self.compute_dtype).build()
         bilstmatt_layer = TFBILSTMAttLayer(embedding_layer, self.hidden_sizes,
                                            self.flags.attention_size,
-                                           self.flags.keep_prob).build()
-        self.probability, self.logits, self.loss = TFClassifierLayer(
-            self.flags.mode, bilstmatt_layer, self.flags.cls_num,
-            self.flags.cls_type, self.input_y, self.flags.keep_prob,
-            self.flags.l2_reg_lambda).build()
-        return self
+                                           self.keep_prob, seq_len,
+                                           self.flags.rnn_type,
+                                           self.flags.attention_heads).build()
+        return TFClassifierLayer(self.flags.mode, bilstmatt_layer,
+                                 self.flags.cls_num, self.flags.cls_type,
+                                 input_y, self.keep_prob,
+                                 self.flags.l2_reg_lambda).build()
@@ -26,17 +26,22 @@ class TFTextCNNClassifier(TFBaseClassifier):
         # 此分类器参数
         self.filter_sizes = list(map(int, flags.filter_sizes.split(",")))
 
-    def build_model(self):
+    def build_tower(self, input_x, input_y):
         '''构建模型
+
+        Returns:
+            probability, logits, loss
         '''
-        embedding_layer = TFEmbeddingLayer(self.input_x, self.flags.vocab_size,
+        embedding_layer = TFEmbeddingLayer(input_x, self.flags.vocab_size,
                                            self.flags.emb_size,
-                                           self.pretrain_word_vecs).build()
-        textcnn_layer = TFTextCNNLayer(embedding_layer, self.flags.max_seq_len,
-                                       self.filter_sizes,
-                                       self.flags.num_filters).build()
-        self.probability, self.logits, self.loss = TFClassifierLayer(
-            self.flags.mode, textcnn_layer, self.flags.cls_num,
-            self.flags.cls_type, self.input_y, self.flags.keep_prob,
-            self.flags.l2_reg_lambda).build()
-        return self
+                                           self.pretrain_word_vecs,
+                                           self.flags.word_emb_trainable,
+                                           self.flags.emb_partitions,
+                                           self.compute_dtype).build()
+        textcnn_layer = TFTextCNNLayer(embedding_layer, self.filter_sizes,
+                                       self.flags.num_filters,
+                                       self.flags.textcnn_fused).build()
+        return TFClassifierLayer(self.flags.mode, textcnn_layer,
+                                 self.flags.cls_num, self.flags.cls_type,
+                                 input_y, self.keep_prob,
+                                 self.flags.l2_reg_lambda).build()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+import pickle
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from utils.binary_corpus import BinaryCorpus
+
+# 补0后的词id: 普通、中间有未登录词0、全部未登录、空文档
+X = [[3, 4, 5, 0], [6, 0, 7, 0], [0, 0, 0, 0], [0, 0, 0, 0], [8, 9, 10, 11]]
+Y = [[0, 1], [1, 0], [0, 1], [1, 0], [1, 1]]
+
+
+class BinaryCorpusTest(unittest.TestCase):
+    '''二进制语料写入、memory-map读取及gather
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.prefix = os.path.join(self.tmp_dir, "data", "train")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_write_strips_trailing_padding(self):
+        # chunk_size小于样本数，覆盖跨块的偏移累加
+        corpus = BinaryCorpus.write(self.prefix, zip(X, Y), 2, chunk_size=2)
+        self.assertTrue(BinaryCorpus.exists(self.prefix))
+        self.assertEqual(len(corpus), 5)
+        self.assertEqual(corpus.meta["num_tokens"], 3 + 3 + 0 + 0 + 4)
+        np.testing.assert_array_equal(corpus.offsets, [0, 3, 6, 6, 6, 10])
+        np.testing.assert_array_equal(corpus.tokens,
+                                      [3, 4, 5, 6, 0, 7, 8, 9, 10, 11])
+        self.assertEqual(corpus.labels.dtype, np.uint8)
+        np.testing.assert_array_equal(corpus.labels, Y)
+
+    def test_gather(self):
+        corpus = BinaryCorpus.write(self.prefix, zip(X, Y), 2)
+        x, y = corpus.gather([4, 1, 2])
+        np.testing.assert_array_equal(
+            x, [[8, 9, 10, 11], [6, 0, 7, 0], [0, 0, 0, 0]])
+        np.testing.assert_array_equal(y, [[1, 1], [1, 0], [0, 1]])
+        self.assertEqual(y.dtype, np.float32)
+        # 补齐到batch内最大长度，而非写入时的长度
+        x, _ = corpus.gather([1, 0])
+        np.testing.assert_array_equal(x, [[6, 0, 7], [3, 4, 5]])
+        x, _ = corpus.gather([4, 0], max_len=2)
+        np.testing.assert_array_equal(x, [[8, 9], [3, 4]])
+
+    def test_gather_empty_docs(self):
+        '''batch内全是空文档时返回宽度1的全0数组
+        '''
+        corpus = BinaryCorpus.write(self.prefix, zip(X, Y), 2)
+        x, y = corpus.gather([2, 3])
+        np.testing.assert_array_equal(x, [[0], [0]])
+        np.testing.assert_array_equal(y, [[0, 1], [1, 0]])
+        x, y = corpus.gather([])
+        self.assertEqual(x.shape, (0, 1))
+        self.assertEqual(y.shape, (0, 2))
+
+    def test_all_oov_corpus(self):
+        '''全部未登录词时tokens为空，仍可读取
+        '''
+        corpus = BinaryCorpus.write(self.prefix, zip(X[2:4], Y[2:4]), 2)
+        self.assertEqual(corpus.meta["num_tokens"], 0)
+        x, _ = corpus.gather([0, 1])
+        np.testing.assert_array_equal(x, [[0], [0]])
+
+    def test_batch_iter_covers_all_docs(self):
+        corpus = BinaryCorpus.write(self.prefix, zip(X, Y), 2)
+        batches = list(corpus.batch_iter(2, 2, shuffle=True))
+        self.assertEqual(len(batches), 6)
+        self.assertEqual(sum(len(x) for x, _ in batches), 10)
+
+    def test_pickle_reopens_memmap(self):
+        corpus = BinaryCorpus.write(self.prefix, zip(X, Y), 2)
+        restored = pickle.loads(pickle.dumps(corpus))
+        np.testing.assert_array_equal(restored.gather([0])[0], [[3, 4, 5]])
+
+    def test_rewrite_removes_meta_first(self):
+        '''重写中途失败时不会被当作完整语料
+        '''
+        BinaryCorpus.write(self.prefix, zip(X, Y), 2)
+
+        def broken():
+            yield X[0], Y[0]
+            raise IOError("interrupted")
+
+        with self.assertRaises(IOError):
+            BinaryCorpus.write(self.prefix, broken(), 2, chunk_size=1)
+        self.assertFalse(BinaryCorpus.exists(self.prefix))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+
+import os
+import sys
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "demos"))
+import io
+import shutil
+import tempfile
+import unittest
+from nlp_bulk_predict import plan_shards, iter_lines
+
+# 含多字节字符、空行，末行无换行
+LINES = [u"first line", u"", u"中文 第二行", u"x", u"a much longer line " * 5,
+         u"last without newline"]
+
+
+class IterLinesTest(unittest.TestCase):
+    '''按字节区间分片读取: 任意分片大小下每行恰好读出一次
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "input.txt")
+        with io.open(self.path, "w", encoding="utf-8", newline="\n") as fout:
+            fout.write(u"\n".join(LINES))
+        # 每行的起始字节
+        self.offsets = []
+        offset = 0
+        for line in LINES:
+            self.offsets.append(offset)
+            offset += len((line + u"\n").encode("utf-8"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _read_all(self, shard_bytes):
+        rows = []
+        for shard in plan_shards(self.path, shard_bytes):
+            rows.extend(iter_lines(*shard))
+        return rows
+
+    def test_every_line_once_for_any_shard_size(self):
+        size = os.path.getsize(self.path)
+        for shard_bytes in range(1, size + 2):
+            rows = self._read_all(shard_bytes)
+            self.assertEqual([offset for offset, _ in rows], self.offsets,
+                             "shard_bytes={}".format(shard_bytes))
+            self.assertEqual([line.rstrip(u"\n") for _, line in rows], LINES,
+                             "shard_bytes={}".format(shard_bytes))
+
+    def test_shard_starting_at_line_start_owns_the_line(self):
+        start = self.offsets[2]
+        rows = list(iter_lines(self.path, start, start + 1))
+        self.assertEqual(rows, [(start, u"中文 第二行\n")])
+        # 从行中间开始的分片跳过该行
+        self.assertEqual(list(iter_lines(self.path, start + 1, start + 2)),
+                         [])
+
+    def test_empty_file(self):
+        empty = os.path.join(self.tmp_dir, "empty.txt")
+        open(empty, "w").close()
+        shards = plan_shards(empty, 16)
+        self.assertEqual(shards, [(empty, 0, 0)])
+        self.assertEqual(list(iter_lines(*shards[0])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from utils.corpus_reader import CorpusReader
+from utils.vocab_processor import VocabProcessor
+
+
+class CorpusReaderTest(unittest.TestCase):
+    '''hash切分train/dev及jsonl类目收集
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, name, lines):
+        path = os.path.join(self.tmp_dir, name)
+        with io.open(path, "w", encoding="utf-8") as fout:
+            for line in lines:
+                fout.write(line + u"\n")
+        return path
+
+    def _write_text_shards(self):
+        for i in range(2):
+            self._write("pos-%d.txt" % i,
+                        [u"good %d %d" % (i, j) for j in range(200)])
+        self._write("neg.txt", [u"bad %d" % j for j in range(200)])
+        return "pos:{0}/pos-*.txt,neg:{0}/neg.txt".format(self.tmp_dir)
+
+    def test_text_split_is_disjoint_and_deterministic(self):
+        reader = CorpusReader(self._write_text_shards(),
+                              dev_sample_percentage=0.2)
+        self.assertEqual(reader.label_names, ["pos", "neg"])
+        self.assertEqual(len(reader.files), 3)
+        train = [text for text, _ in reader.iter_texts("train")]
+        dev = [text for text, _ in reader.iter_texts("dev")]
+        self.assertEqual(len(train) + len(dev), 600)
+        self.assertFalse(set(train) & set(dev))
+        # 比例大致符合，且按文本判断
+        self.assertTrue(60 < len(dev) < 180)
+        for text in dev:
+            self.assertTrue(reader.is_dev(text))
+        # 分片方式不同时，同一文本仍落在同一侧
+        merged = self._write("pos.txt", [
+            u"good %d %d" % (i, j) for i in range(2) for j in range(200)
+        ])
+        again = CorpusReader("pos:" + merged, dev_sample_percentage=0.2)
+        self.assertEqual(set(t for t, _ in again.iter_texts("dev")),
+                         set(t for t in dev if t.startswith(u"good")))
+
+    def test_text_labels(self):
+        reader = CorpusReader(self._write_text_shards(),
+                              dev_sample_percentage=0.0)
+        labels = dict(reader.iter_texts())
+        self.assertEqual(labels[u"good 1 3"], [1.0, 0.0])
+        self.assertEqual(labels[u"bad 7"], [0.0, 1.0])
+
+    def test_jsonl_collects_labels_in_order(self):
+        self._write("a.jsonl", [
+            json.dumps({"text": u"x", "label": "sports"}),
+            u"",
+            json.dumps({"text": u"y", "label": ["tech", "sports"]}),
+        ])
+        self._write("b.jsonl", [json.dumps({"text": u"z", "label": "food"})])
+        reader = CorpusReader(os.path.join(self.tmp_dir, "*.jsonl"),
+                              "jsonl",
+                              dev_sample_percentage=0.0)
+        # 类目未知时不能生成标签向量
+        with self.assertRaises(ValueError):
+            next(reader.iter_texts())
+        self.assertEqual(list(reader.scan_texts()), [u"x", u"y", u"z"])
+        self.assertEqual(reader.label_names, ["sports", "tech", "food"])
+        self.assertEqual(reader.cls_num, 3)
+        self.assertEqual(list(reader.iter_texts()),
+                         [(u"x", [1.0, 0.0, 0.0]), (u"y", [1.0, 1.0, 0.0]),
+                          (u"z", [0.0, 0.0, 1.0])])
+
+    def test_jsonl_with_label_names(self):
+        self._write("a.jsonl", [json.dumps({"text": u"x", "label": "b"})])
+        reader = CorpusReader(os.path.join(self.tmp_dir, "a.jsonl"),
+                              "jsonl",
+                              label_names=["a", "b"],
+                              dev_sample_percentage=0.0)
+        self.assertFalse(reader.collect_labels)
+        self.assertEqual(list(reader.iter_texts()), [(u"x", [0.0, 1.0])])
+
+    def test_load_split(self):
+        reader = CorpusReader(self._write_text_shards(),
+                              dev_sample_percentage=0.2)
+        vocab_processor = VocabProcessor(4).fit(reader.scan_texts())
+        x, y = reader.load_split(vocab_processor, "dev")
+        self.assertEqual(x.shape[1], 4)
+        self.assertEqual(y.shape, (len(x), 2))
+        self.assertEqual(len(x),
+                         len([t for t, _ in reader.iter_texts("dev")]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+
+import os
+import sys
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "demos", "executes"))
+import shutil
+import tempfile
+import unittest
+from executor import Executor
+
+
+class FakeProcessor(object):
+    '''记录收到的参数，返回固定结果
+    '''
+    def __init__(self, name, result=None, fail=False, key=None):
+        self.name = name
+        self.result = result if result is not None else name.lower()
+        self.fail = fail
+        self.key = key
+        self.calls = []
+        self.restored = []
+
+    def execute(self, params):
+        self.calls.append(dict(params))
+        if self.fail:
+            raise RuntimeError(self.name + " failed")
+        return self.result
+
+
+class CachedProcessor(FakeProcessor):
+    '''带cache_key及restore的processor
+    '''
+    def cache_key(self, params):
+        return self.key
+
+    def restore(self, params, result):
+        self.restored.append(result)
+
+
+class ExecutorTest(unittest.TestCase):
+    '''依赖、结果释放及缓存恢复
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_default_deps_include_returns_and_previous(self):
+        executor = Executor(returns={"INIT": "flags"})
+        pre, graph = FakeProcessor("PRE"), FakeProcessor("GRAPH")
+        executor.add_processor(pre)
+        executor.add_processor(graph)
+        executor.run()
+        self.assertEqual(executor.deps["GRAPH"], ["INIT", "PRE"])
+        self.assertEqual(graph.calls, [{"INIT": "flags", "PRE": "pre"}])
+
+    def test_explicit_deps_only_pass_declared_results(self):
+        executor = Executor()
+        executor.add_processor(FakeProcessor("A"))
+        executor.add_processor(FakeProcessor("B"))
+        c = FakeProcessor("C")
+        executor.add_processor(c, deps=["B"])
+        executor.run()
+        self.assertEqual(c.calls, [{"B": "b"}])
+
+    def test_release_and_keep(self):
+        '''下游都执行完后释放结果，keep及外部传入的结果保留
+        '''
+        executor = Executor(returns={"INIT": "flags"})
+        executor.add_processor(FakeProcessor("A"), keep=True)
+        executor.add_processor(FakeProcessor("B"))
+        executor.add_processor(FakeProcessor("C"), deps=["B"])
+        executor.run()
+        self.assertEqual(sorted(executor.returns), ["A", "C", "INIT"])
+
+    def test_unknown_dep_and_cycle(self):
+        executor = Executor()
+        executor.add_processor(FakeProcessor("A"), deps=["X"])
+        with self.assertRaises(ValueError):
+            executor.run()
+        executor = Executor()
+        executor.add_processor(FakeProcessor("A"), deps=["B"])
+        executor.add_processor(FakeProcessor("B"), deps=["A"])
+        with self.assertRaises(ValueError):
+            executor.run()
+
+    def test_failure_stops_downstream(self):
+        executor = Executor()
+        executor.add_processor(FakeProcessor("A", fail=True))
+        b = FakeProcessor("B")
+        executor.add_processor(b)
+        with self.assertRaises(RuntimeError):
+            executor.run()
+        self.assertEqual(b.calls, [])
+
+    def test_parallel_workers(self):
+        executor = Executor(num_workers=2)
+        executor.add_processor(FakeProcessor("A"), deps=[])
+        executor.add_processor(FakeProcessor("B"), deps=[])
+        d = FakeProcessor("D")
+        executor.add_processor(d, deps=["A", "B"])
+        executor.run()
+        self.assertEqual(d.calls, [{"A": "a", "B": "b"}])
+
+    def test_cache_resume(self):
+        '''第二次运行从缓存加载并调用restore，不再执行
+        '''
+        cache_dir = os.path.join(self.tmp_dir, "cache")
+        first = CachedProcessor("PRE", result=[1, 2, 3], key="k1")
+        executor = Executor(cache_dir=cache_dir)
+        executor.add_processor(first, keep=True)
+        executor.run()
+        self.assertEqual(len(first.calls), 1)
+        self.assertFalse(executor.stats["PRE"]["cached"])
+
+        second = CachedProcessor("PRE", result=[0], key="k1")
+        executor = Executor(cache_dir=cache_dir)
+        executor.add_processor(second, keep=True)
+        executor.run()
+        self.assertEqual(second.calls, [])
+        self.assertEqual(second.restored, [[1, 2, 3]])
+        self.assertEqual(executor.returns["PRE"], [1, 2, 3])
+        self.assertTrue(executor.stats["PRE"]["cached"])
+
+        # key不同时重新执行
+        third = CachedProcessor("PRE", result=[4], key="k2")
+        executor = Executor(cache_dir=cache_dir)
+        executor.add_processor(third, keep=True)
+        executor.run()
+        self.assertEqual(len(third.calls), 1)
+
+    def test_cache_rejected_by_restore(self):
+        '''restore返回False时重新执行，损坏的缓存同样重新执行
+        '''
+        cache_dir = os.path.join(self.tmp_dir, "cache")
+        executor = Executor(cache_dir=cache_dir)
+        executor.add_processor(CachedProcessor("PRE", key="k"))
+        executor.run()
+
+        class Rejecting(CachedProcessor):
+            def restore(self, params, result):
+                return False
+
+        rejecting = Rejecting("PRE", key="k")
+        executor = Executor(cache_dir=cache_dir)
+        executor.add_processor(rejecting)
+        executor.run()
+        self.assertEqual(len(rejecting.calls), 1)
+
+        for name in os.listdir(cache_dir):
+            with open(os.path.join(cache_dir, name), "wb") as fout:
+                fout.write(b"broken")
+        again = CachedProcessor("PRE", key="k")
+        executor = Executor(cache_dir=cache_dir)
+        executor.add_processor(again)
+        executor.run()
+        self.assertEqual(len(again.calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from utils.text_processor import TextProcessor
+from utils.vocab_processor import VocabProcessor
+
+DOCS = [u"a b c", u"a b", u"a d", u"e"]
+
+
+class VocabProcessorTest(unittest.TestCase):
+    '''词表构建、hash桶及保存加载
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_fit_order_and_encode(self):
+        '''按词频降序、同频按字典序编号，id 0为padding及未登录词
+        '''
+        processor = VocabProcessor(4).fit(DOCS)
+        self.assertEqual(processor.tokens, [u"a", u"b", u"c", u"d", u"e"])
+        self.assertEqual(len(processor), 6)
+        x = processor.encode([u"a b z", u"e e e e e"])
+        self.assertEqual(x.dtype, np.int32)
+        np.testing.assert_array_equal(x, [[1, 2, 0, 0], [5, 5, 5, 5]])
+
+    def test_min_frequency_and_max_vocab_size(self):
+        self.assertEqual(
+            VocabProcessor(4, min_frequency=2).fit(DOCS).tokens,
+            [u"a", u"b"])
+        self.assertEqual(
+            VocabProcessor(4, max_vocab_size=1).fit(DOCS).tokens, [u"a"])
+
+    def test_oov_buckets(self):
+        '''未登录词落在词表之后的hash桶内，同一个词总是同一个桶
+        '''
+        processor = VocabProcessor(3, num_oov_buckets=7).fit(DOCS)
+        self.assertEqual(len(processor), 1 + 5 + 7)
+        x = processor.encode([u"zz yy zz"])
+        self.assertTrue(((x >= 6) & (x < 13)).all())
+        self.assertEqual(x[0, 0], x[0, 2])
+        # 词表内的词不受hash桶影响
+        np.testing.assert_array_equal(processor.encode([u"a e"]),
+                                      [[1, 5, 0]])
+
+    def test_hash_only(self):
+        processor = VocabProcessor(3, num_oov_buckets=5,
+                                   hash_only=True).fit(DOCS)
+        self.assertEqual(processor.tokens, [])
+        self.assertEqual(len(processor), 6)
+        x = processor.encode([u"a b c"])
+        self.assertTrue(((x >= 1) & (x < 6)).all())
+        with self.assertRaises(ValueError):
+            VocabProcessor(3, hash_only=True)
+
+    def test_parallel_fit_matches_serial(self):
+        docs = DOCS * 50
+        serial = VocabProcessor(4).fit(docs)
+        parallel = VocabProcessor(4).fit(docs, num_workers=2, chunk_size=7)
+        self.assertEqual(serial.tokens, parallel.tokens)
+
+    def test_save_restore(self):
+        '''保存后加载的词表、hash桶及文本预处理配置与原词表一致
+        '''
+        processor = VocabProcessor(5,
+                                   min_frequency=1,
+                                   tokenizer_fn=TextProcessor(
+                                       lowercase=False, split_punct=True),
+                                   num_oov_buckets=3).fit(
+                                       [u"A b, c", u"A d"])
+        filename = os.path.join(self.tmp_dir, "vocab")
+        processor.save(filename)
+        restored = VocabProcessor.restore(filename)
+        self.assertEqual(restored.tokens, processor.tokens)
+        self.assertEqual(restored.num_oov_buckets, 3)
+        self.assertEqual(restored.max_document_length, 5)
+        self.assertEqual(restored.tokenizer_fn.config,
+                         processor.tokenizer_fn.config)
+        docs = [u"A b, zz", u"a D"]
+        np.testing.assert_array_equal(restored.encode(docs),
+                                      processor.encode(docs))
+
+
+if __name__ == '__main__':
+    unittest.main()
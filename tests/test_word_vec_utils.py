@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: wensong
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+import io
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from utils.word_vec_utils import WordVecUtils
+
+# 第4行为hash桶等词表外的行
+VOCAB = {u"apple": 1, u"banana": 2, u"cherry": 3}
+NUM_ROWS = 5
+# 大写词退化为小写匹配，精确匹配的apple覆盖之；cherry维数不对被跳过
+LINES = [u"Apple 1 1 1", u"apple 2 2 2", u"banana 3 3 3", u"date 4 4 4",
+         u"cherry 5 5"]
+
+
+class WordVecUtilsTest(unittest.TestCase):
+    '''文本、二进制词向量按词表对齐转换
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.output_file = os.path.join(self.tmp_dir, "vecs.npy")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write_text(self, header):
+        path = os.path.join(self.tmp_dir, "vecs.txt")
+        with io.open(path, "w", encoding="utf-8") as fout:
+            if header:
+                fout.write(u"{} 3\n".format(len(LINES)))
+            for line in LINES:
+                fout.write(line + u"\n")
+        return path
+
+    def _write_binary(self):
+        path = os.path.join(self.tmp_dir, "vecs.bin")
+        rows = [(u"Apple", 1.0), (u"apple", 2.0), (u"banana", 3.0),
+                (u"中文", 4.0)]
+        with open(path, "wb") as fout:
+            fout.write(u"{} 3\n".format(len(rows)).encode("utf-8"))
+            for word, value in rows:
+                fout.write(word.encode("utf-8") + b" ")
+                fout.write(np.full(3, value, dtype=np.float32).tobytes())
+                fout.write(b"\n")
+        return path
+
+    def _convert(self, vec_file, file_format, oov_init="mean"):
+        WordVecUtils.convert(vec_file, VOCAB, NUM_ROWS, self.output_file,
+                             file_format, oov_init, 10)
+        return np.load(self.output_file)
+
+    def _check_mean(self, table):
+        self.assertEqual(table.shape, (NUM_ROWS, 3))
+        self.assertEqual(table.dtype, np.float32)
+        np.testing.assert_array_equal(table[0], [0, 0, 0])
+        np.testing.assert_array_equal(table[1], [2, 2, 2])
+        np.testing.assert_array_equal(table[2], [3, 3, 3])
+        # 未命中行取命中向量的均值
+        np.testing.assert_allclose(table[3:], np.full((2, 3), 2.5))
+
+    def test_word2vec_text(self):
+        self._check_mean(self._convert(self._write_text(True), "text"))
+
+    def test_glove_text(self):
+        '''无首行时按第一行推断维数
+        '''
+        self._check_mean(self._convert(self._write_text(False), "text"))
+
+    def test_binary(self):
+        self._check_mean(self._convert(self._write_binary(), "binary"))
+
+    def test_random_oov_init(self):
+        table = self._convert(self._write_text(True), "text", "random")
+        np.testing.assert_array_equal(table[1], [2, 2, 2])
+        self.assertTrue((np.abs(table[3:]) <= 0.25).all())
+        self.assertFalse((table[3:] == 0).all())
+        # 同一种子结果确定
+        again = self._convert(self._write_text(True), "text", "random")
+        np.testing.assert_array_equal(table, again)
+
+
+if __name__ == '__main__':
+    unittest.main()
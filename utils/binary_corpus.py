@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import io
+import os
+import json
+import itertools
+import numpy as np
+
+
+class BinaryCorpus(object):
+    '''二进制语料: 变长词id序列的零拷贝随机访问
+    1、所有样本去掉末尾padding后首尾相接存为一个int32词id文件(.tokens)
+    2、int64偏移索引(.offsets)，第i个样本为tokens[offsets[i]:offsets[i+1]]
+    3、标签存为uint8的0/1矩阵(.labels)，比float32稠密标签小4倍
+    4、读取时memory-map，按索引gather组batch并补齐到batch内最大长度，
+       打乱只打乱索引，不拷贝样本
+
+    元信息(.meta)最后写入，存在即表示文件完整。
+    '''
+    def __init__(self, prefix):
+        '''memory-map已写好的语料
+
+        Args:
+            prefix: 文件路径前缀
+        '''
+        self.prefix = prefix
+        with io.open(prefix + ".meta", "r", encoding="utf-8") as fin:
+            self.meta = json.load(fin)
+        self.num_docs = self.meta["num_docs"]
+        self.cls_num = self.meta["cls_num"]
+        self.tokens = self._memmap(".tokens", np.int32,
+                                   (self.meta["num_tokens"], ))
+        self.offsets = self._memmap(".offsets", np.int64, (self.num_docs + 1, ))
+        self.labels = self._memmap(".labels", np.uint8,
+                                   (self.num_docs, self.cls_num))
+
+    def _memmap(self, suffix, dtype, shape):
+        # 空数组无法memory-map
+        if not np.prod(shape):
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.prefix + suffix, dtype=dtype, mode="r",
+                         shape=shape)
+
+    def __len__(self):
+        return self.num_docs
+
+    def __getstate__(self):
+        # pickle时只保存路径，避免序列化整个memory-map
+        return {"prefix": self.prefix}
+
+    def __setstate__(self, state):
+        self.__init__(state["prefix"])
+
+    @staticmethod
+    def exists(prefix):
+        '''语料是否已完整写入
+        '''
+        return os.path.exists(prefix + ".meta")
+
+    @staticmethod
+    def write(prefix, samples, cls_num, chunk_size=10000):
+        '''写入语料
+
+        Args:
+            prefix: 文件路径前缀
+            samples: (补0词id序列, 稠密标签)的可迭代对象，可以是生成器
+            cls_num: 类目数
+            chunk_size: 每次向量化处理的样本数
+
+        Returns:
+            BinaryCorpus
+        '''
+        dirname = os.path.dirname(prefix)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        # 先删除元信息，中途失败时不会被当作完整语料
+        if os.path.exists(prefix + ".meta"):
+            os.remove(prefix + ".meta")
+        num_docs, num_tokens = 0, 0
+        samples = iter(samples)
+        with open(prefix + ".tokens", "wb") as f_tokens, \
+                open(prefix + ".offsets", "wb") as f_offsets, \
+                open(prefix + ".labels", "wb") as f_labels:
+            np.zeros(1, dtype=np.int64).tofile(f_offsets)
+            while True:
+                chunk = list(itertools.islice(samples, chunk_size))
+                if not chunk:
+                    break
+                x, y = zip(*chunk)
+                x = np.asarray(x, dtype=np.int32)
+                # 去掉末尾padding，序列中间的0(未登录词)保留
+                nonzero = x != 0
+                lengths = np.where(
+                    nonzero.any(axis=1),
+                    x.shape[1] - np.argmax(nonzero[:, ::-1], axis=1), 0)
+                # 行优先的布尔索引即为各行前lengths[i]个元素首尾相接
+                x[np.arange(x.shape[1]) < lengths[:, None]].tofile(f_tokens)
+                (num_tokens + np.cumsum(lengths)).astype(
+                    np.int64).tofile(f_offsets)
+                (np.asarray(y) > 0.5).astype(np.uint8).reshape(
+                    len(chunk), cls_num).tofile(f_labels)
+                num_docs += len(chunk)
+                num_tokens += int(lengths.sum())
+        with io.open(prefix + ".meta", "w", encoding="utf-8") as fout:
+            fout.write(u"{}".format(
+                json.dumps({
+                    "num_docs": num_docs,
+                    "num_tokens": num_tokens,
+                    "cls_num": cls_num
+                })))
+
+        return BinaryCorpus(prefix)
+
+    def gather(self, indices, max_len=0):
+        '''按索引取一个batch，补齐到batch内最大长度
+
+        Args:
+            indices: 样本索引数组
+            max_len: 截断长度，0为不截断
+
+        Returns:
+            (int32词id数组, float32标签数组)
+        '''
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+        if max_len > 0:
+            lengths = np.minimum(lengths, max_len)
+        width = max(1, int(lengths.max())) if len(indices) else 1
+        # 各样本的token位置首尾相接，一次gather
+        total = int(lengths.sum())
+        row_starts = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - row_starts, lengths) + np.arange(total)
+        x = np.zeros((len(indices), width), dtype=np.int32)
+        x[np.arange(width) < lengths[:, None]] = self.tokens[positions]
+        y = self.labels[indices].astype(np.float32)
+
+        return x, y
+
+    def batch_iter(self, batch_size, num_epochs, shuffle=True, max_len=0):
+        '''batch生成器，每个epoch只打乱索引
+
+        Returns:
+            (x_batch, y_batch)生成器
+        '''
+        for epoch in range(num_epochs):
+            if shuffle:
+                indices = np.random.permutation(self.num_docs)
+            else:
+                indices = np.arange(self.num_docs)
+            for start in range(0, self.num_docs, batch_size):
+                yield self.gather(indices[start:start + batch_size], max_len)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import os
+import glob
+import time
+import shutil
+import logging
+import threading
+import collections
+import tensorflow as tf
+
+
+class AsyncCheckpointer(object):
+    '''异步checkpoint
+    1、保存时先在图内把变量拷贝到快照变量，训练线程只等待这次内存拷贝
+    2、后台线程把快照写入临时目录，完成后rename到checkpoint目录，再更新checkpoint状态文件，
+       中断时不会留下不完整的checkpoint
+    3、只保留最近max_to_keep份
+    快照按原变量名保存，与tf.train.Saver的checkpoint完全兼容；
+    分片变量的快照带上原分片信息，按整表名切片保存，与Saver的写法一致。
+    '''
+    def __init__(self, var_list, meta_saver, max_to_keep=5):
+        '''初始化，需在模型所在图内调用
+
+        Args:
+            var_list: 需要保存的变量
+            meta_saver: 模型的tf.train.Saver，用于导出meta graph，使加载时恢复到原变量
+            max_to_keep: 保留的checkpoint份数
+        '''
+        self.meta_saver = meta_saver
+        # meta graph只在训练线程导出一次，默认图是线程局部的，后台线程拿不到模型图
+        self.meta_graph_def = None
+        self.max_to_keep = max_to_keep
+        snapshots = {}
+        copy_ops = []
+        with tf.name_scope("checkpoint_snapshot"):
+            for var in var_list:
+                # 不加入任何collection，不会被global_variables_initializer和Saver看到
+                snapshot = tf.Variable(tf.zeros(var.get_shape(),
+                                                var.dtype.base_dtype),
+                                       trainable=False,
+                                       collections=[],
+                                       name=var.op.name.replace("/", "_"))
+                save_slice_info = var._get_save_slice_info()
+                if save_slice_info is None:
+                    snapshots[var.op.name] = snapshot
+                else:
+                    snapshot._set_save_slice_info(save_slice_info)
+                    snapshots.setdefault(save_slice_info.full_name,
+                                         []).append(snapshot)
+                copy_ops.append(tf.assign(snapshot, var))
+        self.copy_op = tf.group(*copy_ops)
+        self.saver = tf.train.Saver(snapshots, sharded=False)
+        # 已保存的checkpoint前缀，按时间先后
+        self.kept = collections.deque()
+        self.thread = None
+        # 每次保存训练线程的阻塞时间(秒)
+        self.stall_times = []
+
+    def save(self, sess, checkpoint_dir, global_step):
+        '''异步保存
+
+        Args:
+            sess: 会话
+            checkpoint_dir: checkpoint目录
+            global_step: 当前步数
+
+        Returns:
+            本次阻塞训练的时间(秒)
+        '''
+        start = time.time()
+        # 同一时刻只有一份快照在写，上一次未写完需等待
+        self.wait()
+        if self.meta_graph_def is None:
+            with sess.graph.as_default():
+                self.meta_graph_def = self.meta_saver.export_meta_graph()
+        sess.run(self.copy_op)
+        stall = time.time() - start
+        self.stall_times.append(stall)
+        self.thread = threading.Thread(target=self._write,
+                                       args=(sess, checkpoint_dir,
+                                             global_step))
+        self.thread.start()
+        logging.info("Checkpoint step {} snapshot taken, stall {:.3f}s".format(
+            global_step, stall))
+
+        return stall
+
+    def wait(self):
+        '''等待后台写入完成
+        '''
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _write(self, sess, checkpoint_dir, global_step):
+        '''后台线程: 写临时目录后原子rename，并清理旧checkpoint
+        '''
+        start = time.time()
+        tmp_dir = os.path.join(checkpoint_dir, ".tmp")
+        try:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir)
+            os.makedirs(tmp_dir)
+            tmp_path = self.saver.save(sess,
+                                       os.path.join(tmp_dir, "model"),
+                                       global_step=global_step,
+                                       write_meta_graph=False,
+                                       write_state=False)
+            with tf.gfile.GFile(tmp_path + ".meta", "wb") as meta_file:
+                meta_file.write(self.meta_graph_def.SerializeToString())
+            # index最后移动，index存在即代表数据文件完整
+            names = sorted(os.listdir(tmp_dir),
+                           key=lambda name: name.endswith(".index"))
+            for name in names:
+                os.rename(os.path.join(tmp_dir, name),
+                          os.path.join(checkpoint_dir, name))
+            path = os.path.join(checkpoint_dir, os.path.basename(tmp_path))
+            self.kept.append(path)
+            while len(self.kept) > self.max_to_keep:
+                for old_file in glob.glob(self.kept.popleft() + ".*"):
+                    os.remove(old_file)
+            tf.train.update_checkpoint_state(
+                checkpoint_dir,
+                path,
+                all_model_checkpoint_paths=list(self.kept))
+            logging.info("Saved model checkpoint to {} in {:.3f}s".format(
+                path, time.time() - start))
+        except Exception:
+            logging.exception("Failed to save checkpoint at step {}".format(
+                global_step))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import os
+import io
+import glob
+import json
+import hashlib
+import logging
+import numpy as np
+import tensorflow as tf
+from utils.text_processor import TextProcessor
+
+
+class CorpusReader(object):
+    '''分片语料流式读取器
+    1、支持多个分片的text/jsonl文件，任意类目数，逐行惰性读取
+    2、按文本hash确定性地切分train/dev，无需将全量语料载入内存
+    3、可返回python生成器或tf.data.Dataset
+    '''
+    def __init__(self,
+                 corpus_files,
+                 file_format="text",
+                 label_names=None,
+                 dev_sample_percentage=0.1,
+                 text_field="text",
+                 label_field="label",
+                 text_processor=None):
+        '''初始化
+
+        Args:
+            corpus_files: 语料文件，逗号分隔。
+                text格式为"label:glob"，文件内每行一个样本，label为该文件所有样本的类目；
+                jsonl格式为"glob"，每行一个json，包含text_field和label_field，
+                label可以是单个类目或类目list(multi-label)
+            file_format: text/jsonl
+            label_names: 类目名list，决定类目索引顺序，为空则按出现顺序自动生成，
+                jsonl格式在scan_texts遍历时收集
+            dev_sample_percentage: 验证集比例
+            text_field: jsonl文本字段名
+            label_field: jsonl标签字段名
+            text_processor: 文本规范化，为None时去首尾空白并小写
+        '''
+        self.file_format = file_format
+        self.text_processor = text_processor or TextProcessor()
+        self.dev_sample_percentage = dev_sample_percentage
+        self.text_field = text_field
+        self.label_field = label_field
+        # [(文件路径, 文件类目)]，jsonl格式文件类目为None
+        self.files = []
+        self.label_names = list(label_names) if label_names else []
+        # jsonl未指定类目名时，类目需遍历语料后才能确定
+        self.collect_labels = file_format == "jsonl" and not self.label_names
+        for spec in corpus_files.split(","):
+            spec = spec.strip()
+            if not spec:
+                continue
+            label = None
+            if file_format == "text":
+                label, spec = spec.split(":", 1)
+                if label not in self.label_names:
+                    self.label_names.append(label)
+            for path in sorted(glob.glob(spec)):
+                self.files.append((path, label))
+        # 类目名->索引
+        self.label_index = dict(
+            (name, idx) for idx, name in enumerate(self.label_names))
+
+    @property
+    def cls_num(self):
+        '''类目数
+        '''
+        return len(self.label_names)
+
+    def is_dev(self, text):
+        '''按文本hash判断样本是否属于验证集
+        相同文本总是落在同一侧，与文件顺序、分片方式无关
+        '''
+        digest = hashlib.md5(text.encode("utf-8")).hexdigest()
+        return int(digest[:8], 16) % 10000 < int(
+            self.dev_sample_percentage * 10000)
+
+    def _labels_to_vec(self, labels):
+        '''类目名转为稠密标签向量
+        '''
+        vec = [0.0] * self.cls_num
+        for label in labels:
+            vec[self.label_index[label]] = 1.0
+        return vec
+
+    def _iter_file(self, path, label):
+        '''逐行读取单个文件，返回(text, labels)
+        '''
+        if self.file_format == "text":
+            # 按块规范化
+            for lines in self.text_processor.read_lines(path):
+                for line in lines:
+                    yield line, [label]
+            return
+        with io.open(path, "r", encoding="utf-8") as fin:
+            for line in fin:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                labels = item[self.label_field]
+                if not isinstance(labels, list):
+                    labels = [labels]
+                yield self.text_processor.normalize(
+                    item[self.text_field]), labels
+
+    def scan_texts(self):
+        '''遍历全部文本，用于构建词表的第一遍
+        jsonl未指定类目名时同时按出现顺序收集类目，遍历完后cls_num才确定
+
+        Returns:
+            text生成器
+        '''
+        for path, label in self.files:
+            for text, labels in self._iter_file(path, label):
+                if self.collect_labels:
+                    for name in labels:
+                        if name not in self.label_index:
+                            self.label_index[name] = len(self.label_names)
+                            self.label_names.append(name)
+                yield text
+
+    def iter_texts(self, split=None):
+        '''惰性遍历所有分片
+
+        Args:
+            split: train/dev，为None时返回全部样本
+
+        Returns:
+            (text, label_vec)生成器
+        '''
+        if self.collect_labels and not self.label_names:
+            raise ValueError(
+                "labels of jsonl corpus are unknown, call scan_texts first "
+                "or set label_names")
+        for path, label in self.files:
+            for text, labels in self._iter_file(path, label):
+                if split is not None and (split == "dev") != self.is_dev(text):
+                    continue
+                yield text, self._labels_to_vec(labels)
+
+    def iter_ids(self, vocab_processor, split=None, chunk_size=10000):
+        '''惰性地分词并转换为词id，按chunk_size批量编码
+
+        Args:
+            vocab_processor: 已fit的词表处理器，需提供encode(docs)
+            split: train/dev/None
+            chunk_size: 每批编码的文本数
+
+        Returns:
+            (ids, label_vec)生成器
+        '''
+        texts, label_vecs = [], []
+        for text, label_vec in self.iter_texts(split):
+            texts.append(text)
+            label_vecs.append(label_vec)
+            if len(texts) == chunk_size:
+                for item in zip(vocab_processor.encode(texts), label_vecs):
+                    yield item
+                texts, label_vecs = [], []
+        if texts:
+            for item in zip(vocab_processor.encode(texts), label_vecs):
+                yield item
+
+    def to_dataset(self, vocab_processor, batch_size, split=None):
+        '''以tf.data.Dataset形式返回，batch内按最大长度补0
+
+        Args:
+            vocab_processor: 已fit的词表处理器
+            batch_size: batch大小
+            split: train/dev/None
+
+        Returns:
+            (x, y)的tf.data.Dataset
+        '''
+        dataset = tf.data.Dataset.from_generator(
+            lambda: self.iter_ids(vocab_processor, split),
+            output_types=(tf.int32, tf.float32),
+            output_shapes=(tf.TensorShape([None]),
+                           tf.TensorShape([self.cls_num])))
+
+        return dataset.padded_batch(batch_size,
+                                    padded_shapes=([None], [self.cls_num]))
+
+    def load_split(self, vocab_processor, split):
+        '''将某个split一次性转换为数组，仅用于较小的验证集
+
+        Returns:
+            x, y数组，y为[样本数, cls_num]
+        '''
+        x, y = [], []
+        for ids, label_vec in self.iter_ids(vocab_processor, split):
+            x.append(ids)
+            y.append(label_vec)
+
+        return np.array(x), np.array(y).reshape(-1, self.cls_num)
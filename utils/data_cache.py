@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import numpy as np
+
+# 计算文件指纹时读取的头部字节数
+FINGERPRINT_HEAD_BYTES = 1 << 16
+
+
+class DataCache(object):
+    '''预处理结果磁盘缓存
+    1、key由输入文件指纹和预处理参数共同决定，任一变化都会重新计算
+    2、数组以.npy保存，加载时memory-map，不占用进程内存
+    3、按最近使用时间淘汰，保证缓存总大小不超过上限
+    '''
+    def __init__(self, cache_dir, max_bytes):
+        '''初始化
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限
+        '''
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    @staticmethod
+    def fingerprint(filename):
+        '''文件指纹: 绝对路径、大小、修改时间及头部内容md5
+        '''
+        stat = os.stat(filename)
+        md5 = hashlib.md5()
+        with open(filename, "rb") as fin:
+            md5.update(fin.read(FINGERPRINT_HEAD_BYTES))
+
+        return "{}:{}:{}:{}".format(os.path.abspath(filename), stat.st_size,
+                                    int(stat.st_mtime), md5.hexdigest())
+
+    def key(self, filenames, params):
+        '''生成缓存key
+
+        Args:
+            filenames: 输入文件list
+            params: 影响预处理结果的参数dict
+
+        Returns:
+            key字符串
+        '''
+        md5 = hashlib.md5()
+        for filename in filenames:
+            md5.update(DataCache.fingerprint(filename).encode("utf-8"))
+        md5.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+
+        return md5.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key):
+        '''读取缓存
+
+        Returns:
+            命中返回(数组dict, 缓存目录)，数组均为只读memory-map；未命中返回None
+        '''
+        entry_dir = self._entry_dir(key)
+        meta_file = os.path.join(entry_dir, "meta.json")
+        if not os.path.exists(meta_file):
+            return None
+        with open(meta_file) as fin:
+            meta = json.load(fin)
+        arrays = {}
+        for name in meta["arrays"]:
+            arrays[name] = np.load(os.path.join(entry_dir, name + ".npy"),
+                                   mmap_mode="r")
+        # 更新访问时间，用于LRU淘汰
+        os.utime(entry_dir, None)
+        logging.info("Load cache {}".format(entry_dir))
+
+        return arrays, entry_dir
+
+    def save(self, key, arrays, extra_files=None):
+        '''写入缓存，先写临时目录再rename，避免并发或中断时读到半成品
+
+        Args:
+            key: 缓存key
+            arrays: 数组dict
+            extra_files: {文件名: 写文件函数}，用于保存词表等非数组结果
+
+        Returns:
+            缓存目录
+        '''
+        entry_dir = self._entry_dir(key)
+        tmp_dir = "{}.tmp.{}".format(entry_dir, os.getpid())
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, name + ".npy"), array)
+        for name, write_fn in (extra_files or {}).items():
+            write_fn(os.path.join(tmp_dir, name))
+        # meta最后写，存在meta即代表条目完整
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as fout:
+            json.dump({"arrays": sorted(arrays), "time": time.time()}, fout)
+        if os.path.exists(entry_dir):
+            shutil.rmtree(tmp_dir)
+        else:
+            os.rename(tmp_dir, entry_dir)
+        logging.info("Save cache {}".format(entry_dir))
+        self.evict()
+
+        return entry_dir
+
+    def evict(self):
+        '''按最近访问时间从旧到新淘汰，直到总大小不超过上限
+        '''
+        entries = []
+        total_bytes = 0
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(entry_dir) or ".tmp." in name:
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(entry_dir, f))
+                for f in os.listdir(entry_dir))
+            entries.append((os.path.getmtime(entry_dir), size, entry_dir))
+            total_bytes += size
+        for _, size, entry_dir in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_bytes -= size
+            logging.info("Evict cache {}".format(entry_dir))
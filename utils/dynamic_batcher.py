@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import time
+import logging
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class _Request(object):
+    '''单个请求，结果由batch线程回填
+    '''
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def get(self):
+        '''阻塞等待结果
+        '''
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class DynamicBatcher(object):
+    '''动态batch: 将并发的单条请求合并成batch统一计算
+    凑满max_batch_size或第一条请求等待超过max_wait_ms即执行一次。
+    '''
+    def __init__(self, batch_fn, max_batch_size=64, max_wait_ms=5):
+        '''初始化
+
+        Args:
+            batch_fn: 输入item list，返回等长结果list
+            max_batch_size: batch最大样本数
+            max_wait_ms: 第一条请求的最长等待时间(毫秒)
+        '''
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self._loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, item):
+        '''异步提交一条请求
+
+        Returns:
+            请求句柄，调用get()获取结果
+        '''
+        request = _Request(item)
+        self.requests.put(request)
+        return request
+
+    def __call__(self, item):
+        '''同步提交一条请求并返回结果
+        '''
+        return self.submit(item).get()
+
+    def _next_batch(self):
+        '''阻塞取第一条请求，再在截止时间前尽量凑满batch
+        '''
+        batch = [self.requests.get()]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        '''batch线程主循环
+        '''
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self.batch_fn([request.item for request in batch])
+                for request, result in zip(batch, results):
+                    request.result = result
+            except Exception as e:
+                logging.exception("batch failed")
+                for request in batch:
+                    request.error = e
+            for request in batch:
+                request.done.set()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import numpy as np
+
+
+class MetricsUtils(object):
+    '''分类指标工具类，基于numpy向量化计数，结果精确可累加
+    '''
+    @staticmethod
+    def confusion_matrix(labels, predictions, cls_num):
+        '''多分类混淆矩阵
+
+        Args:
+            labels: 真实类目索引, shape [n]
+            predictions: 预测类目索引, shape [n]
+            cls_num: 类目数
+
+        Returns:
+            shape为[cls_num, cls_num]的int64矩阵，行为真实类目，列为预测类目
+        '''
+        return np.bincount(np.asarray(labels) * cls_num +
+                           np.asarray(predictions),
+                           minlength=cls_num * cls_num).reshape(
+                               cls_num, cls_num).astype(np.int64)
+
+    @staticmethod
+    def multilabel_counts(labels, predictions):
+        '''多标签每个类目的tp/fp/fn计数
+
+        Args:
+            labels: 0/1标签矩阵, shape [n, cls_num]
+            predictions: 0/1预测矩阵, shape [n, cls_num]
+
+        Returns:
+            shape为[3, cls_num]的int64数组，依次为tp、fp、fn
+        '''
+        labels = np.asarray(labels) > 0.5
+        predictions = np.asarray(predictions) > 0.5
+        return np.stack([
+            np.sum(labels & predictions, axis=0),
+            np.sum(~labels & predictions, axis=0),
+            np.sum(labels & ~predictions, axis=0)
+        ]).astype(np.int64)
+
+    @staticmethod
+    def _prf(tp, fp, fn):
+        '''由计数计算precision/recall/f1，分母为0时记为0
+        '''
+        tp = tp.astype(np.float64)
+        precision = np.where(tp + fp > 0, tp / np.maximum(tp + fp, 1), 0.0)
+        recall = np.where(tp + fn > 0, tp / np.maximum(tp + fn, 1), 0.0)
+        f1 = np.where(precision + recall > 0,
+                      2 * precision * recall /
+                      np.maximum(precision + recall, 1e-12), 0.0)
+        return precision, recall, f1
+
+    @staticmethod
+    def report_from_confusion(confusion):
+        '''由混淆矩阵计算多分类指标
+
+        Returns:
+            dict: accuracy，宏平均precision/recall/f1，以及每类指标list
+        '''
+        tp = np.diag(confusion)
+        fp = confusion.sum(axis=0) - tp
+        fn = confusion.sum(axis=1) - tp
+        precision, recall, f1 = MetricsUtils._prf(tp, fp, fn)
+        return {
+            "accuracy": float(tp.sum()) / max(confusion.sum(), 1),
+            "precision": float(precision.mean()),
+            "recall": float(recall.mean()),
+            "f1": float(f1.mean()),
+            "class_precision": precision.tolist(),
+            "class_recall": recall.tolist(),
+            "class_f1": f1.tolist(),
+            "confusion_matrix": confusion.tolist()
+        }
+
+    @staticmethod
+    def report_from_multilabel(counts, num_samples, num_exact):
+        '''由多标签计数计算指标
+
+        Args:
+            counts: multilabel_counts的累加结果
+            num_samples: 样本数
+            num_exact: 所有标签全部预测正确的样本数
+
+        Returns:
+            dict: 子集accuracy，micro precision/recall/f1，以及每类指标list
+        '''
+        tp, fp, fn = counts
+        precision, recall, f1 = MetricsUtils._prf(tp, fp, fn)
+        micro_p, micro_r, micro_f1 = MetricsUtils._prf(
+            np.array([tp.sum()]), np.array([fp.sum()]), np.array([fn.sum()]))
+        return {
+            "accuracy": float(num_exact) / max(num_samples, 1),
+            "precision": float(micro_p[0]),
+            "recall": float(micro_r[0]),
+            "f1": float(micro_f1[0]),
+            "class_precision": precision.tolist(),
+            "class_recall": recall.tolist(),
+            "class_f1": f1.tolist()
+        }
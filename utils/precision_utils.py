@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import tensorflow as tf
+
+# precision flag -> 计算精度
+COMPUTE_DTYPES = {"float32": tf.float32, "bfloat16": tf.bfloat16}
+
+
+class MixedPrecisionGetter(object):
+    '''variable_scope的custom_getter，混合精度训练
+    layer以计算精度(如bfloat16)申请可训练变量时，实际创建float32主权重，
+    再在图内cast为计算精度返回：前向/反向以低精度计算，梯度cast回float32后更新主权重。
+    以float32申请的变量(如词向量表，先gather再cast)及不可训练变量照常创建。
+    bfloat16与float32指数位相同，梯度不会下溢，无需loss scaling。
+    '''
+    def __init__(self, compute_dtype=tf.bfloat16):
+        '''初始化
+
+        Args:
+            compute_dtype: 计算精度
+        '''
+        self.compute_dtype = compute_dtype
+
+    def __call__(self, getter, name, *args, **kwargs):
+        dtype = kwargs.get("dtype")
+        if dtype != self.compute_dtype or kwargs.get("trainable") is False:
+            return getter(name, *args, **kwargs)
+        kwargs["dtype"] = tf.float32
+        variable = getter(name, *args, **kwargs)
+
+        return tf.cast(variable, dtype, name=name.split("/")[-1] + "_cast")
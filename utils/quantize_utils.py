@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import re
+import numpy as np
+import tensorflow as tf
+
+# 默认量化的变量: 词向量表、TextCNN卷积核W{filter_size}、全连接层W
+QUANTIZE_PATTERN = r"^(embedding|W\d*)$"
+
+
+class QuantizeUtils(object):
+    '''训练后量化工具类
+    '''
+    @staticmethod
+    def quantize_per_channel(value, axis):
+        '''按通道对称量化为int8
+
+        Args:
+            value: float32数组
+            axis: 通道所在维度，每个通道一个scale
+
+        Returns:
+            int8数组，以及可直接广播的float32 scale数组
+        '''
+        reduce_axes = tuple(i for i in range(value.ndim) if i != axis)
+        max_abs = np.max(np.abs(value), axis=reduce_axes, keepdims=True)
+        scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+        quantized = np.clip(np.round(value / scale), -127,
+                            127).astype(np.int8)
+
+        return quantized, scale
+
+    @staticmethod
+    def dequantize(quantized, scale):
+        '''int8数组反量化为float32
+        '''
+        return quantized.astype(np.float32) * scale
+
+    @staticmethod
+    def embedding_lookup(params, ids):
+        '''词向量查询，兼容量化后的词向量表及分片词向量表
+        量化表只gather用到的行再反量化，不展开整张表
+
+        Args:
+            params: 词向量表、分片词向量表(PartitionedVariable)，
+                或QuantizeGetter返回的反量化tensor
+            ids: 词id张量
+
+        Returns:
+            float32词向量
+        '''
+        quantized = getattr(params, "quantized", None)
+        if quantized is None:
+            # fixed_size_partitioner按行连续切分，对应div策略
+            return tf.nn.embedding_lookup(params,
+                                          ids,
+                                          partition_strategy="div")
+        table, scale = quantized
+        output = tf.cast(tf.gather(table, ids), tf.float32)
+        if scale is not None:
+            output = output * tf.gather(scale, ids)
+
+        return output
+
+
+class QuantizeGetter(object):
+    '''variable_scope的custom_getter
+    构建推理图时，将匹配的变量替换为int8(按通道scale)或float16常量，
+    并在图内反量化为float32，其余变量照常创建。
+    '''
+    def __init__(self, value_fn, mode="int8", pattern=QUANTIZE_PATTERN):
+        '''初始化
+
+        Args:
+            value_fn: 根据变量名返回训练好的numpy值
+            mode: int8/float16
+            pattern: 需要量化的变量名(不含scope)正则
+        '''
+        self.value_fn = value_fn
+        self.mode = mode
+        self.pattern = re.compile(pattern)
+
+    def __call__(self, getter, name, *args, **kwargs):
+        short_name = name.split("/")[-1]
+        if not self.pattern.match(short_name):
+            return getter(name, *args, **kwargs)
+        value = self.value_fn(name)
+        if self.mode == "float16":
+            table = tf.constant(value.astype(np.float16),
+                                name=short_name + "_fp16")
+            tensor = tf.cast(table, tf.float32, name=short_name + "_dequant")
+            tensor.quantized = (table, None)
+        else:
+            # 词向量按行量化，卷积核与全连接层按输出通道量化
+            axis = 0 if short_name == "embedding" else value.ndim - 1
+            quantized, scale = QuantizeUtils.quantize_per_channel(value, axis)
+            table = tf.constant(quantized, name=short_name + "_int8")
+            scale = tf.constant(scale, name=short_name + "_scale")
+            tensor = tf.multiply(tf.cast(table, tf.float32),
+                                 scale,
+                                 name=short_name + "_dequant")
+            tensor.quantized = (table, scale)
+
+        return tensor
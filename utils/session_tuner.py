@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import os
+import json
+import socket
+import logging
+import multiprocessing
+import tensorflow as tf
+from tensorflow.core.protobuf import rewriter_config_pb2
+
+
+class SessionTuner(object):
+    '''session线程池及图优化选项自动调优
+    先在默认图优化选项下搜索intra/inter线程数，再在最优线程数上逐个切换图优化选项，
+    按steps/sec选出最优配置，并按主机名、任务名保存供后续运行复用。
+    tf的线程池是进程级的，进程内首个session创建后即固定，每组配置在fork出的子进程中测速，
+    调用方在调优前不能在本进程创建session。
+    '''
+    def __init__(self, bench_fn, max_threads=None):
+        '''初始化
+
+        Args:
+            bench_fn: 输入session配置dict，返回steps/sec，在子进程中调用
+            max_threads: 线程数搜索上限，默认为cpu核数
+        '''
+        self.bench_fn = bench_fn
+        self.max_threads = max_threads or multiprocessing.cpu_count()
+        # 所有测量结果
+        self.results = []
+
+    @staticmethod
+    def default_conf_file(conf_dir):
+        '''当前主机的调优结果文件
+        '''
+        return os.path.join(conf_dir, socket.gethostname() + ".json")
+
+    @staticmethod
+    def build_config(conf,
+                     allow_soft_placement=True,
+                     log_device_placement=False):
+        '''根据配置dict生成tf.ConfigProto
+
+        Args:
+            conf: 包含intra_op_parallelism_threads、inter_op_parallelism_threads、
+                xla_jit、constant_folding的dict，线程数为0表示使用tf默认值
+
+        Returns:
+            tf.ConfigProto
+        '''
+        config = tf.ConfigProto(
+            allow_soft_placement=allow_soft_placement,
+            log_device_placement=log_device_placement,
+            intra_op_parallelism_threads=conf["intra_op_parallelism_threads"],
+            inter_op_parallelism_threads=conf["inter_op_parallelism_threads"])
+        if conf["xla_jit"]:
+            config.graph_options.optimizer_options.global_jit_level = \
+                tf.OptimizerOptions.ON_1
+        if not conf["constant_folding"]:
+            config.graph_options.rewrite_options.constant_folding = \
+                rewriter_config_pb2.RewriterConfig.OFF
+
+        return config
+
+    @staticmethod
+    def load(conf_file, task_name):
+        '''读取某个任务的调优结果
+
+        Returns:
+            配置dict，不存在返回None
+        '''
+        if not os.path.exists(conf_file):
+            return None
+        with open(conf_file) as fin:
+            return json.load(fin).get(task_name)
+
+    @staticmethod
+    def save(conf_file, task_name, conf):
+        '''保存某个任务的调优结果，同一主机的多个任务保存在同一文件
+        '''
+        confs = {}
+        if os.path.exists(conf_file):
+            with open(conf_file) as fin:
+                confs = json.load(fin)
+        confs[task_name] = conf
+        conf_dir = os.path.dirname(conf_file)
+        if conf_dir and not os.path.exists(conf_dir):
+            os.makedirs(conf_dir)
+        with open(conf_file, "w") as fout:
+            json.dump(confs, fout, indent=2, sort_keys=True)
+
+    def _thread_candidates(self):
+        '''1, 2, 4, ... 直到max_threads
+        '''
+        candidates = []
+        threads = 1
+        while threads < self.max_threads:
+            candidates.append(threads)
+            threads *= 2
+        candidates.append(self.max_threads)
+        return candidates
+
+    def _run_isolated(self, conf):
+        '''在子进程中调用bench_fn，子进程异常退出时速度记为0
+        '''
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=lambda: queue.put(self.bench_fn(conf)))
+        process.start()
+        # 结果很小，先join不会阻塞
+        process.join()
+        if process.exitcode != 0:
+            logging.warning("session conf {} failed, exit code {}".format(
+                json.dumps(conf, sort_keys=True), process.exitcode))
+            return 0.0
+        return queue.get()
+
+    def _measure(self, conf):
+        steps_per_sec = self._run_isolated(conf)
+        result = dict(conf)
+        result["steps_per_sec"] = steps_per_sec
+        self.results.append(result)
+        logging.info("session conf {} : {:.2f} steps/sec".format(
+            json.dumps(conf, sort_keys=True), steps_per_sec))
+        return steps_per_sec
+
+    def tune(self):
+        '''搜索最优配置
+
+        Returns:
+            最优配置dict
+        '''
+        best_conf, best_speed = None, -1.0
+        # 第一阶段: 线程数网格
+        for intra in self._thread_candidates():
+            for inter in [1, 2, 4]:
+                if inter > self.max_threads:
+                    continue
+                conf = {
+                    "intra_op_parallelism_threads": intra,
+                    "inter_op_parallelism_threads": inter,
+                    "xla_jit": False,
+                    "constant_folding": True
+                }
+                speed = self._measure(conf)
+                if speed > best_speed:
+                    best_conf, best_speed = conf, speed
+        # 第二阶段: 在最优线程数上逐个切换图优化选项
+        for key in ["xla_jit", "constant_folding"]:
+            conf = dict(best_conf)
+            conf[key] = not conf[key]
+            speed = self._measure(conf)
+            if speed > best_speed:
+                best_conf, best_speed = conf, speed
+
+        return best_conf
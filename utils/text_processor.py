@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import io
+import re
+
+# 大小写切分部分，小写后不可能匹配，小写时省略
+CASE_PATTERN = r"[A-Z]{2,}(?![a-z])|[A-Z][a-z]+(?=[A-Z])"
+WORD_CHARS = r"[\'\w\-]+"
+# 与tf.contrib.learn的VocabularyProcessor保持一致的分词正则
+WORD_PATTERN = CASE_PATTERN + "|" + WORD_CHARS
+# CJK统一汉字、扩展A及兼容汉字
+CJK_CHARS = u"\u4e00-\u9fff\u3400-\u4dbf\uf900-\ufaff"
+# 中文处理方式: none为与英文相同(连续汉字作为一个词)，char为逐字，word为分词
+CHINESE_MODES = ["none", "char", "word"]
+
+
+def _segment_jieba(text):
+    '''默认中文分词钩子，需安装jieba
+    '''
+    import jieba
+    return jieba.lcut(text)
+
+
+class TextProcessor(object):
+    '''文本预处理: 规范化+分词
+    1、规范化(去首尾空白、小写)按块处理，一次lower整块文本，不逐行调用函数
+    2、分词为单个预编译正则，一次findall完成，可逐块map；小写后省去大小写切分分支
+    3、可选标点单独成词、中文逐字或分词(segment_fn钩子，默认jieba)
+    4、实例可直接作为VocabProcessor的tokenizer_fn，配置随词表保存
+
+    默认配置(小写、标点不单独成词、中文不切分)与TFUtils.preprocess+VocabProcessor默认分词结果一致。
+    '''
+    def __init__(self,
+                 lowercase=True,
+                 split_punct=False,
+                 chinese="none",
+                 segment_fn=None):
+        '''初始化
+
+        Args:
+            lowercase: 是否小写
+            split_punct: 标点等非词字符是否单独成词，为False时丢弃
+            chinese: none/char/word
+            segment_fn: chinese为word时对连续汉字分词的函数，返回词list，
+                多进程时需为模块顶层函数，为None使用jieba
+        '''
+        if chinese not in CHINESE_MODES:
+            raise ValueError("chinese must be one of {}, got {}".format(
+                "/".join(CHINESE_MODES), chinese))
+        self.lowercase = lowercase
+        self.split_punct = split_punct
+        self.chinese = chinese
+        self.segment_fn = segment_fn or _segment_jieba
+        patterns = [] if lowercase else [CASE_PATTERN]
+        if chinese == "none":
+            patterns.append(WORD_CHARS)
+        else:
+            # 汉字优先单独匹配，词中不含汉字
+            patterns.insert(0, u"[{}]".format(CJK_CHARS) +
+                            (u"+" if chinese == "word" else u""))
+            patterns.append(u"(?:[\\'\\-]|[^\\W{}])+".format(CJK_CHARS))
+        if split_punct:
+            patterns.append(r"[^\w\s]")
+        self.pattern = re.compile(u"|".join(patterns), re.UNICODE)
+        if chinese == "word":
+            self.cjk_run = re.compile(u"[{}]+$".format(CJK_CHARS), re.UNICODE)
+
+    @property
+    def config(self):
+        '''可序列化的配置，segment_fn不保存
+        '''
+        return {
+            "lowercase": self.lowercase,
+            "split_punct": self.split_punct,
+            "chinese": self.chinese
+        }
+
+    def normalize(self, text):
+        '''单条文本规范化
+        '''
+        text = text.strip()
+        return text.lower() if self.lowercase else text
+
+    def normalize_lines(self, texts):
+        '''一批文本规范化
+
+        Returns:
+            规范化后的文本list
+        '''
+        texts = [text.strip() for text in texts]
+        return [text.lower() for text in texts] if self.lowercase else texts
+
+    def normalize_block(self, block):
+        '''规范化按行分隔的一整块文本，整块只做一次lower
+
+        Args:
+            block: 多行文本
+
+        Returns:
+            逐行规范化后的文本list
+        '''
+        if self.lowercase:
+            block = block.lower()
+        lines = block.split(u"\n")
+        # 末尾换行不产生空行
+        if lines and not lines[-1]:
+            lines.pop()
+        return [line.strip() for line in lines]
+
+    def read_lines(self, filename, block_bytes=1 << 22):
+        '''按块读取文件并规范化
+
+        Args:
+            filename: utf-8文本文件
+            block_bytes: 每块大约的字符数
+
+        Returns:
+            逐块返回规范化后的行list的生成器
+        '''
+        with io.open(filename, "r", encoding="utf-8") as fin:
+            while True:
+                block = fin.read(block_bytes)
+                if not block:
+                    break
+                # 补全最后一行，保证块按行切分
+                if not block.endswith(u"\n"):
+                    block += fin.readline()
+                yield self.normalize_block(block)
+
+    def tokenize(self, text):
+        '''单条文本分词
+        '''
+        tokens = self.pattern.findall(text)
+        if self.chinese == "word":
+            tokens = self._segment(tokens)
+        return tokens
+
+    def tokenize_lines(self, texts):
+        '''一批文本分词，非分词模式下直接map预编译正则
+
+        Returns:
+            词list的list
+        '''
+        if self.chinese == "word":
+            return [self.tokenize(text) for text in texts]
+        return list(map(self.pattern.findall, texts))
+
+    def _segment(self, tokens):
+        '''连续汉字交给segment_fn分词
+        '''
+        output = []
+        for token in tokens:
+            if self.cjk_run.match(token):
+                output.extend(self.segment_fn(token))
+            else:
+                output.append(token)
+        return output
+
+    def __call__(self, text):
+        '''作为tokenizer_fn使用
+        '''
+        return self.tokenize(text)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import os
+import logging
+import numpy as np
+import tensorflow as tf
+from utils.tf_utils import TFUtils
+from utils.vocab_processor import VocabProcessor
+from utils.text_processor import TextProcessor
+
+
+class TFPredictor(object):
+    '''分类器预测器
+    从checkpoint目录或导出的SavedModel目录加载图、参数和词表，
+    常驻一个session，避免每次预测重复加载。
+    '''
+    def __init__(self, checkpoint_dir, session_config=None):
+        '''初始化
+
+        Args:
+            checkpoint_dir: 训练保存的checkpoints目录或export导出目录，需包含vocab
+            session_config: tf.ConfigProto，为空使用默认配置
+        '''
+        self.vocab_processor = VocabProcessor.restore(
+            os.path.join(checkpoint_dir, "vocab"))
+        # 与训练时相同的文本预处理，旧词表无配置时去首尾空白并小写
+        tokenizer = self.vocab_processor.tokenizer_fn
+        self.text_processor = tokenizer if isinstance(
+            tokenizer, TextProcessor) else TextProcessor()
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            self.sess = tf.Session(graph=self.graph, config=session_config)
+            if tf.saved_model.loader.maybe_saved_model_directory(
+                    checkpoint_dir):
+                # 冻结的推理图
+                tf.saved_model.loader.load(
+                    self.sess, [tf.saved_model.tag_constants.SERVING],
+                    checkpoint_dir)
+                checkpoint_file = checkpoint_dir
+            else:
+                # 训练checkpoint
+                checkpoint_file = tf.train.latest_checkpoint(checkpoint_dir)
+                if checkpoint_file is None:
+                    raise ValueError(
+                        "no checkpoint or SavedModel found in {}".format(
+                            checkpoint_dir))
+                saver = tf.train.import_meta_graph(checkpoint_file + ".meta")
+                saver.restore(self.sess, checkpoint_file)
+        self.input_x = self.graph.get_tensor_by_name("input_x:0")
+        self.probability = self.graph.get_tensor_by_name("probability:0")
+        self.predictions = self.graph.get_tensor_by_name("predictions:0")
+        logging.info("Restored model from {}".format(checkpoint_file))
+
+    def predict_ids(self, x):
+        '''对词id序列预测
+
+        Args:
+            x: 补0后的二维词id数组
+
+        Returns:
+            预测概率probability、预测结果predictions
+        '''
+        # 截断到batch内最大长度，减少padding计算
+        max_len = max(1, TFUtils.seq_lengths(x).max())
+        return self.sess.run([self.probability, self.predictions],
+                             {self.input_x: x[:, :max_len]})
+
+    def predict(self, texts):
+        '''对原始文本预测
+
+        Args:
+            texts: 文本list
+
+        Returns:
+            预测概率probability、预测结果predictions
+        '''
+        texts = self.text_processor.normalize_lines(texts)
+        return self.predict_ids(self.vocab_processor.encode(texts))
+
+    def close(self):
+        '''关闭session
+        '''
+        self.sess.close()
@@ -8,6 +8,32 @@ import re
 import sys
 import io
 import logging
+import threading
+from utils.text_processor import TextProcessor
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class _FlagsOverride(object):
+    '''只读的flags视图，部分参数被覆盖，其余透传原flags
+    '''
+    def __init__(self, flags, overrides):
+        self.__dict__["_flags"] = flags
+        self.__dict__["_overrides"] = overrides
+
+    def __getattr__(self, name):
+        if name in self._overrides:
+            return self._overrides[name]
+        return getattr(self._flags, name)
+
+    def __setattr__(self, name, value):
+        self._overrides[name] = value
+
+
+# 与原preprocess一致: 去首尾空白并小写
+_DEFAULT_TEXT_PROCESSOR = TextProcessor()
 
 
 class TFUtils(object):
@@ -22,6 +48,29 @@ class TFUtils(object):
 
         return dct[key]
 
+    @staticmethod
+    def override_flags(flags, **overrides):
+        '''返回部分参数被覆盖的flags视图，不修改全局flags
+
+        Returns:
+            flags视图
+        '''
+        return _FlagsOverride(flags, overrides)
+
+    @staticmethod
+    def dropout(inputs, keep_prob):
+        '''dropout，低精度(bfloat16)激活转为float32后dropout再转回
+        keep_prob为float32，且CPU上没有bfloat16的除法kernel
+
+        Returns:
+            与inputs同dtype的张量
+        '''
+        if inputs.dtype.base_dtype == tf.float32:
+            return tf.nn.dropout(inputs, keep_prob)
+
+        return tf.cast(tf.nn.dropout(tf.cast(inputs, tf.float32), keep_prob),
+                       inputs.dtype)
+
     @staticmethod
     def nonzero_indices(inputs):
         '''获取张量非零索引
@@ -36,27 +85,75 @@ class TFUtils(object):
         return indices
 
     @staticmethod
-    def preprocess(strs):
-        '''字符串预处理
+    def sequence_length(input_x):
+        '''计算补0输入的真实序列长度，即最后一个非0词id的位置+1
+        词表中未登录词id同样为0，因此不能直接统计非0个数
+
+        Args:
+            input_x: 词id张量, shape [batch, seq_len]
+
+        Returns:
+            长度张量, shape [batch]
+        '''
+        mask = tf.cast(tf.not_equal(input_x, 0), tf.int32)
+        positions = tf.range(1, tf.shape(input_x)[1] + 1)
+
+        return tf.reduce_max(mask * positions, axis=1)
+
+    @staticmethod
+    def seq_lengths(x):
+        '''sequence_length的numpy版本
+
+        Args:
+            x: 补0后的二维词id数组
+
+        Returns:
+            每行真实长度数组
+        '''
+        nonzero = np.asarray(x) != 0
+        last = nonzero.shape[1] - np.argmax(nonzero[:, ::-1], axis=1)
+
+        return np.where(nonzero.any(axis=1), last, 0)
+
+    @staticmethod
+    def preprocess(strs, text_processor=None):
+        '''字符串预处理，默认去首尾空白并小写
+        '''
+        return (text_processor or _DEFAULT_TEXT_PROCESSOR).normalize(strs)
+
+    @staticmethod
+    def read_lines(filename, text_processor=None):
+        '''按块读取文件并逐行预处理，整块只做一次规范化
+
+        Returns:
+            预处理后的行list
         '''
-        strs = strs.strip().rstrip().lower()
-        return strs
+        text_processor = text_processor or _DEFAULT_TEXT_PROCESSOR
+        lines = []
+        for block in text_processor.read_lines(filename):
+            lines.extend(block)
+        return lines
 
     @staticmethod
-    def load_data_and_labels(positive_data_file, negative_data_file):
+    def load_data_and_labels(positive_data_file,
+                             negative_data_file,
+                             text_processor=None):
         '''加载样本、分词、打label
 
+        Args:
+            positive_data_file: 正样本文件
+            negative_data_file: 负样本文件
+            text_processor: TextProcessor，为None时去首尾空白并小写
+
         Returns:
             words and labels.
         '''
         # Load data from files
-        # file => array
-        positive_examples = list(
-            io.open(positive_data_file, "r", encoding='utf-8').readlines())
-        positive_examples = [TFUtils.preprocess(s) for s in positive_examples]
-        negative_examples = list(
-            io.open(negative_data_file, "r", encoding='utf-8').readlines())
-        negative_examples = [TFUtils.preprocess(s) for s in negative_examples]
+        # 按块读取，避免readlines额外保留一份原始行
+        positive_examples = TFUtils.read_lines(positive_data_file,
+                                               text_processor)
+        negative_examples = TFUtils.read_lines(negative_data_file,
+                                               text_processor)
         # Split by words
         texts = positive_examples + negative_examples
         # Generate labels
@@ -78,12 +175,219 @@ class TFUtils(object):
         num_batches_per_epoch = int((len(data) - 1) / batch_size) + 1
         # 每个epoch
         for epoch in range(num_epochs):
-            # Shuffle the data at each epoch
+            # 只打乱索引，按batch取数，不整体重排数据
             if shuffle:
-                np.random.shuffle(data)
+                indices = np.random.permutation(data_size)
             # 遍历batch
             for batch_index in range(num_batches_per_epoch):
                 start_index = batch_index * batch_size
                 end_index = min((batch_index + 1) * batch_size, data_size)
                 # 使用yield动态返回batch
-                yield data[start_index:end_index]
+                if shuffle:
+                    yield data[indices[start_index:end_index]]
+                else:
+                    yield data[start_index:end_index]
+
+    @staticmethod
+    def bucket_batch_iter(x,
+                          y,
+                          batch_size,
+                          num_epochs,
+                          bucket_boundaries,
+                          shuffle=True):
+        '''按长度分桶的batch生成器
+        长度相近的样本落在同一个桶内组batch，每个batch只补齐到batch内最大长度，
+        避免大量计算消耗在padding上。
+
+        Args:
+            x: 补0后的二维词id数组
+            y: 标签数组
+            batch_size: batch大小
+            num_epochs: epoch数
+            bucket_boundaries: 递增的桶边界，例如[16, 32, 64]
+            shuffle: 是否打乱桶内样本及batch顺序
+
+        Returns:
+            (x_batch, y_batch)生成器
+        '''
+        x = np.asarray(x)
+        y = np.asarray(y)
+        lengths = TFUtils.seq_lengths(x)
+        # 每个样本所在桶: [0, len(bucket_boundaries)]
+        bucket_ids = np.digitize(lengths, bucket_boundaries)
+        buckets = [
+            np.where(bucket_ids == bucket_id)[0]
+            for bucket_id in range(len(bucket_boundaries) + 1)
+        ]
+        for epoch in range(num_epochs):
+            batches = []
+            for indices in buckets:
+                if shuffle:
+                    indices = np.random.permutation(indices)
+                for start in range(0, len(indices), batch_size):
+                    batches.append(indices[start:start + batch_size])
+            # 打乱batch顺序，避免按桶顺序训练
+            if shuffle:
+                np.random.shuffle(batches)
+            for batch in batches:
+                # 动态padding: 截断到batch内最大长度
+                max_len = max(1, lengths[batch].max())
+                yield x[batch, :max_len], y[batch]
+
+    @staticmethod
+    def prefetch_iter(iterable, buffer_size=2):
+        '''后台线程预取，使数据准备与调用方的计算重叠
+
+        Args:
+            iterable: 任意可迭代对象
+            buffer_size: 预取个数
+
+        Returns:
+            与iterable元素相同的生成器，生产线程的异常会在此重新抛出
+        '''
+        items = queue.Queue(max(1, buffer_size))
+        end = object()
+        errors = []
+
+        def produce():
+            try:
+                for item in iterable:
+                    items.put(item)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                items.put(end)
+
+        thread = threading.Thread(target=produce)
+        thread.daemon = True
+        thread.start()
+        while True:
+            item = items.get()
+            if item is end:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def write_tfrecords(samples, path_prefix, num_shards=1):
+        '''将样本按行轮转写入多个TFRecord分片文件
+
+        Args:
+            samples: (词id序列, 标签)的可迭代对象，可以是生成器
+            path_prefix: 分片文件路径前缀
+            num_shards: 分片个数
+
+        Returns:
+            分片文件路径列表
+        '''
+        filenames = [
+            "{}-{:05d}-of-{:05d}.tfrecord".format(path_prefix, i, num_shards)
+            for i in range(num_shards)
+        ]
+        writers = [tf.python_io.TFRecordWriter(f) for f in filenames]
+        for idx, (x_item, y_item) in enumerate(samples):
+            # 去掉末尾padding，读取时按batch动态补齐
+            x_item = np.trim_zeros(np.asarray(x_item), "b")
+            example = tf.train.Example(features=tf.train.Features(
+                feature={
+                    "x":
+                    tf.train.Feature(int64_list=tf.train.Int64List(
+                        value=list(x_item))),
+                    "y":
+                    tf.train.Feature(float_list=tf.train.FloatList(
+                        value=list(y_item)))
+                }))
+            writers[idx % num_shards].write(example.SerializeToString())
+        for writer in writers:
+            writer.close()
+
+        return filenames
+
+    @staticmethod
+    def tfrecord_dataset(filenames,
+                         cls_num,
+                         batch_size,
+                         num_epochs,
+                         shuffle=True,
+                         shuffle_buffer_size=10000,
+                         num_parallel_calls=4,
+                         prefetch_size=2,
+                         bucket_boundaries=None):
+        '''基于tf.data的输入管道：读文件、有界buffer打乱、并行解析、预取
+
+        Args:
+            filenames: TFRecord分片文件列表
+            cls_num: 类目数
+            batch_size: batch大小
+            num_epochs: epoch数
+            shuffle: 是否打乱
+            shuffle_buffer_size: 打乱buffer大小，内存占用与其成正比
+            num_parallel_calls: 并行读取分片及解析的线程数
+            prefetch_size: 预取batch个数，与训练计算重叠
+            bucket_boundaries: 长度分桶边界，为空则不分桶
+
+        Returns:
+            返回(x, y)的tf.data.Dataset，x按batch内最大长度补0
+        '''
+        features = {
+            "x": tf.VarLenFeature(tf.int64),
+            "y": tf.FixedLenFeature([cls_num], tf.float32)
+        }
+
+        def _parse(records):
+            '''整个batch一起解析，比逐条解析少很多op调度
+            '''
+            parsed = tf.parse_example(records, features)
+            x = tf.cast(tf.sparse_tensor_to_dense(parsed["x"]), tf.int32)
+            return x, parsed["y"]
+
+        def _parse_single(record):
+            '''逐条解析，分桶时需要按单条样本长度分组
+            '''
+            parsed = tf.parse_single_example(record, features)
+            x = tf.cast(tf.sparse_tensor_to_dense(parsed["x"]), tf.int32)
+            return x, parsed["y"]
+
+        def _bucket_key(x, y):
+            '''样本所在桶id
+            '''
+            return tf.reduce_sum(
+                tf.cast(
+                    tf.greater_equal(tf.shape(x)[0],
+                                     tf.constant(bucket_boundaries)),
+                    tf.int64))
+
+        def _bucket_batch(key, window):
+            '''桶内组batch，按batch内最大长度补0
+            '''
+            return window.padded_batch(batch_size,
+                                       padded_shapes=([None], [cls_num]))
+
+        dataset = tf.data.Dataset.from_tensor_slices(filenames)
+        if shuffle:
+            dataset = dataset.shuffle(len(filenames))
+        # 多个分片交错读取
+        dataset = dataset.interleave(tf.data.TFRecordDataset,
+                                     cycle_length=max(
+                                         1,
+                                         min(len(filenames),
+                                             num_parallel_calls)),
+                                     block_length=1)
+        if shuffle:
+            dataset = dataset.shuffle(shuffle_buffer_size)
+        dataset = dataset.repeat(num_epochs)
+        if bucket_boundaries:
+            dataset = dataset.map(_parse_single,
+                                  num_parallel_calls=num_parallel_calls)
+            dataset = dataset.apply(
+                tf.contrib.data.group_by_window(_bucket_key,
+                                                _bucket_batch,
+                                                window_size=batch_size))
+        else:
+            dataset = dataset.batch(batch_size)
+            dataset = dataset.map(_parse,
+                                  num_parallel_calls=num_parallel_calls)
+        dataset = dataset.prefetch(prefetch_size)
+
+        return dataset
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import os
+import json
+import time
+import contextlib
+import tensorflow as tf
+from tensorflow.python.client import timeline
+
+
+class TrainProfiler(object):
+    '''训练循环埋点
+    1、每步耗时拆分为input(取batch)、run(sess.run)、eval、checkpoint
+    2、统计examples/sec、tokens/sec
+    3、在指定步抓取tf.RunMetadata，写入TensorBoard并导出chrome timeline
+    4、每步一行写入JSONL指标文件，同时以scalar summary写入TensorBoard
+    '''
+
+    PHASES = ["input", "run", "eval", "checkpoint"]
+
+    def __init__(self, log_dir, graph=None, trace_steps=None):
+        '''初始化
+
+        Args:
+            log_dir: TensorBoard及指标文件目录
+            graph: 写入TensorBoard的图
+            trace_steps: 需要抓取RunMetadata的步数集合
+        '''
+        self.log_dir = log_dir
+        if not os.path.exists(log_dir):
+            os.makedirs(log_dir)
+        self.writer = tf.summary.FileWriter(log_dir, graph)
+        self.metrics_file = open(os.path.join(log_dir, "metrics.jsonl"), "a")
+        self.trace_steps = set(trace_steps or [])
+        # 当前步各阶段耗时
+        self.phase_times = dict((phase, 0.0) for phase in self.PHASES)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        '''统计with块耗时，累加到当前步的name阶段
+        '''
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.phase_times[name] += time.time() - start
+
+    def run_options(self, step):
+        '''下一步需要抓取时返回FULL_TRACE的RunOptions与RunMetadata，否则返回None
+
+        Args:
+            step: 即将执行的步数
+        '''
+        if step not in self.trace_steps:
+            return None, None
+        return tf.RunOptions(
+            trace_level=tf.RunOptions.FULL_TRACE), tf.RunMetadata()
+
+    def add_trace(self, step, run_metadata):
+        '''写入RunMetadata及chrome timeline(chrome://tracing打开)
+        '''
+        self.writer.add_run_metadata(run_metadata, "step%d" % step, step)
+        trace = timeline.Timeline(run_metadata.step_stats)
+        with open(os.path.join(self.log_dir, "timeline_step%d.json" % step),
+                  "w") as fout:
+            fout.write(trace.generate_chrome_trace_format())
+
+    def add_summary(self, summary, step):
+        '''写入模型summary
+        '''
+        self.writer.add_summary(summary, step)
+
+    def step_done(self, step, num_examples, num_tokens, loss):
+        '''一步结束，输出该步指标并清零计时
+
+        Args:
+            step: 全局步数
+            num_examples: 该步样本数
+            num_tokens: 该步非padding词数
+            loss: 该步loss
+        '''
+        total = sum(self.phase_times.values())
+        record = {
+            "step": int(step),
+            "time": time.time(),
+            "loss": float(loss),
+            "step_sec": total,
+            "examples_per_sec": num_examples / max(total, 1e-9),
+            "tokens_per_sec": num_tokens / max(total, 1e-9)
+        }
+        for phase in self.PHASES:
+            record[phase + "_sec"] = self.phase_times[phase]
+            self.phase_times[phase] = 0.0
+        self.metrics_file.write(json.dumps(record, sort_keys=True) + "\n")
+        # 逐步刷新，训练中途即可tail或被中断时不丢记录
+        self.metrics_file.flush()
+        self.writer.add_summary(
+            tf.Summary(value=[
+                tf.Summary.Value(tag="profile/" + key,
+                                 simple_value=record[key])
+                for key in sorted(record) if key not in ("step", "time")
+            ]), step)
+
+    def close(self):
+        '''刷新并关闭输出
+        '''
+        self.metrics_file.close()
+        self.writer.close()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import io
+import re
+import json
+import zlib
+import itertools
+import collections
+import multiprocessing
+import numpy as np
+from utils.text_processor import TextProcessor, WORD_PATTERN
+
+# 与tf.contrib.learn的VocabularyProcessor保持一致的分词正则
+TOKENIZER_RE = re.compile(WORD_PATTERN, re.UNICODE)
+
+
+def tokenize(text):
+    '''默认分词器
+    '''
+    return TOKENIZER_RE.findall(text)
+
+
+def _tokenize_all(tokenizer, documents):
+    '''一批文本分词，TextProcessor整批处理，其余逐条调用
+    '''
+    if isinstance(tokenizer, TextProcessor):
+        return tokenizer.tokenize_lines(documents)
+    return map(tokenizer, documents)
+
+
+def _count_tokens(args):
+    '''子进程内统计一个分块的词频，需定义在模块顶层才能被pickle
+    '''
+    tokenizer, documents = args
+    counter = collections.Counter()
+    for tokens in _tokenize_all(tokenizer, documents):
+        counter.update(tokens)
+    return counter
+
+
+def _hash_bucket(token, num_buckets):
+    '''稳定的词->桶映射，不依赖进程的hash随机种子
+    '''
+    if not isinstance(token, bytes):
+        token = token.encode("utf-8")
+    return (zlib.crc32(token) & 0xffffffff) % num_buckets
+
+
+def _chunks(iterable, chunk_size):
+    '''按chunk_size切分任意可迭代对象，不要求整体载入内存
+    '''
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class VocabProcessor(object):
+    '''词表处理器，替代tf.contrib.learn.preprocessing.VocabularyProcessor
+    1、多进程并行统计词频后合并
+    2、支持最小词频及top-k裁剪
+    3、按批向量化编码为int32数组
+    4、词表以纯文本保存，一行一个词
+    5、未登录词可按hash分到num_oov_buckets个桶；hash_only时不建词表，
+       所有词都hash到桶内(feature hashing)，词向量表大小固定，适合开放词表
+
+    id 0保留给padding，未设置hash桶时也用于未登录词，与VocabularyProcessor一致。
+    词表id为[1, len(tokens)]，hash桶id紧随其后。
+    '''
+    def __init__(self,
+                 max_document_length,
+                 min_frequency=0,
+                 max_vocab_size=0,
+                 tokenizer_fn=tokenize,
+                 num_oov_buckets=0,
+                 hash_only=False):
+        '''初始化
+
+        Args:
+            max_document_length: 编码后的序列长度，超长截断，不足补0
+            min_frequency: 词频小于该值的词不进入词表
+            max_vocab_size: 只保留词频最高的max_vocab_size个词，0为不限制
+            tokenizer_fn: 分词函数，多进程时需为模块顶层函数；
+                为TextProcessor时按批分词，配置随词表保存
+            num_oov_buckets: 未登录词hash桶数，0为未登录词统一映射为0
+            hash_only: 不建词表，所有词hash到num_oov_buckets个桶
+        '''
+        if hash_only and num_oov_buckets <= 0:
+            raise ValueError("hash_only requires num_oov_buckets > 0")
+        self.max_document_length = max_document_length
+        self.min_frequency = min_frequency
+        self.max_vocab_size = max_vocab_size
+        self.tokenizer_fn = tokenizer_fn
+        self.num_oov_buckets = num_oov_buckets
+        self.hash_only = hash_only
+        # 词 -> id
+        self.vocab = {}
+        # id - 1 -> 词
+        self.tokens = []
+
+    def __len__(self):
+        '''词表大小，包含保留的id 0及hash桶
+        '''
+        return len(self.tokens) + 1 + self.num_oov_buckets
+
+    def fit(self, documents, num_workers=1, chunk_size=10000):
+        '''统计词频并构建词表
+
+        Args:
+            documents: 文本的可迭代对象，可以是生成器
+            num_workers: 统计词频的进程数
+            chunk_size: 每个进程一次处理的文本数
+
+        Returns:
+            self
+        '''
+        # feature hashing无需统计词频
+        if self.hash_only:
+            self._build(collections.Counter())
+            return self
+        counter = collections.Counter()
+        chunks = _chunks(documents, chunk_size)
+        if num_workers <= 1:
+            for chunk in chunks:
+                counter.update(_count_tokens((self.tokenizer_fn, chunk)))
+        else:
+            pool = multiprocessing.Pool(num_workers)
+            try:
+                # 每轮只取num_workers个分块，避免pool提前读完整个生成器
+                while True:
+                    wave = list(itertools.islice(chunks, num_workers))
+                    if not wave:
+                        break
+                    for part in pool.map(_count_tokens,
+                                         [(self.tokenizer_fn, chunk)
+                                          for chunk in wave]):
+                        counter.update(part)
+            finally:
+                pool.close()
+                pool.join()
+        self._build(counter)
+
+        return self
+
+    def _build(self, counter):
+        '''根据词频裁剪并生成词表，按词频降序、同频按字典序，保证结果确定
+        '''
+        items = [(token, count) for token, count in counter.items()
+                 if count >= self.min_frequency]
+        items.sort(key=lambda item: (-item[1], item[0]))
+        if self.max_vocab_size > 0:
+            items = items[:self.max_vocab_size]
+        self.tokens = [token for token, _ in items]
+        self.vocab = dict(
+            (token, idx + 1) for idx, token in enumerate(self.tokens))
+
+    def encode(self, documents):
+        '''将一批文本编码为int32二维数组
+
+        Args:
+            documents: 文本list
+
+        Returns:
+            shape为[len(documents), max_document_length]的int32数组
+        '''
+        max_len = self.max_document_length
+        if self.num_oov_buckets > 0:
+            lookup = self._lookup
+        else:
+            vocab = self.vocab
+            lookup = lambda token: vocab.get(token, 0)
+        rows = [[lookup(token) for token in tokens[:max_len]]
+                for tokens in _tokenize_all(self.tokenizer_fn, documents)]
+        lengths = np.array([len(row) for row in rows], dtype=np.int64)
+        flat = np.fromiter(itertools.chain.from_iterable(rows),
+                           dtype=np.int32,
+                           count=int(lengths.sum()))
+        # 一次性向量化填充: 每行前lengths[i]个位置依次放入flat
+        output = np.zeros((len(rows), max_len), dtype=np.int32)
+        output[np.arange(max_len) < lengths[:, None]] = flat
+
+        return output
+
+    def _lookup(self, token):
+        '''词 -> id，未登录词落入hash桶
+        '''
+        idx = self.vocab.get(token)
+        if idx is None:
+            idx = len(self.tokens) + 1 + _hash_bucket(token,
+                                                      self.num_oov_buckets)
+        return idx
+
+    def transform(self, documents, batch_size=10000):
+        '''按批编码任意可迭代文本
+
+        Returns:
+            逐行返回int32词id数组的生成器
+        '''
+        for chunk in _chunks(documents, batch_size):
+            for row in self.encode(chunk):
+                yield row
+
+    def fit_transform(self, documents, num_workers=1):
+        '''构建词表并编码
+
+        Args:
+            documents: 文本list
+
+        Returns:
+            int32二维数组
+        '''
+        return self.fit(documents, num_workers).encode(documents)
+
+    def save(self, filename):
+        '''保存词表: 首行为json元信息，之后按id顺序一行一个词
+        '''
+        meta = {
+            "max_document_length": self.max_document_length,
+            "min_frequency": self.min_frequency,
+            "max_vocab_size": self.max_vocab_size,
+            "num_oov_buckets": self.num_oov_buckets,
+            "hash_only": self.hash_only
+        }
+        # 预测时需用相同的预处理配置
+        if isinstance(self.tokenizer_fn, TextProcessor):
+            meta["text_processor"] = self.tokenizer_fn.config
+        with io.open(filename, "w", encoding="utf-8") as fout:
+            fout.write(u"{}\n".format(json.dumps(meta)))
+            for token in self.tokens:
+                fout.write(u"{}\n".format(token))
+
+    @classmethod
+    def restore(cls, filename, tokenizer_fn=None):
+        '''加载save保存的词表
+
+        Args:
+            filename: 词表文件
+            tokenizer_fn: 分词函数，为None时按保存的TextProcessor配置，
+                无配置时使用默认分词器
+        '''
+        with io.open(filename, "r", encoding="utf-8") as fin:
+            meta = json.loads(fin.readline())
+            if tokenizer_fn is None:
+                tokenizer_fn = TextProcessor(**meta["text_processor"]) \
+                    if "text_processor" in meta else tokenize
+            processor = cls(meta["max_document_length"],
+                            meta["min_frequency"],
+                            meta["max_vocab_size"],
+                            tokenizer_fn=tokenizer_fn,
+                            num_oov_buckets=meta.get("num_oov_buckets", 0),
+                            hash_only=meta.get("hash_only", False))
+            processor.tokens = [line.rstrip(u"\n") for line in fin]
+        processor.vocab = dict(
+            (token, idx + 1) for idx, token in enumerate(processor.tokens))
+
+        return processor
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author wensong
+
+import os
+import io
+import mmap
+import json
+import hashlib
+import logging
+import numpy as np
+from utils.data_cache import DataCache
+
+# OOV行分块初始化，避免一次生成整块随机矩阵
+OOV_CHUNK_ROWS = 100000
+
+
+class WordVecUtils(object):
+    '''预训练词向量工具类
+    1、流式读取word2vec/GloVe文本或word2vec二进制文件，只保留词表内的词
+    2、按词表id对齐，直接写入memory-map的.npy(open_memmap)，不在内存中构造整张表
+    3、未命中词表的行随机初始化或取已命中向量的均值，id 0(padding)为全0
+    转换结果按词向量文件指纹和词表内容缓存，同一词表只转换一次。
+    '''
+    @staticmethod
+    def load_aligned(vec_file,
+                     vocab_processor,
+                     cache_dir,
+                     file_format="auto",
+                     oov_init="random",
+                     seed=10):
+        '''加载与词表对齐的词向量，首次加载时转换并缓存
+
+        Args:
+            vec_file: 词向量文件
+            vocab_processor: 词表处理器
+            cache_dir: 转换后.npy的存放目录
+            file_format: auto/text/binary，auto时.bin后缀为二进制，其余为文本
+            oov_init: random/mean，未命中行的初始化方式
+            seed: 随机初始化种子
+
+        Returns:
+            shape为[len(vocab_processor), dim]的只读float32 memory-map
+        '''
+        if file_format == "auto":
+            file_format = "binary" if vec_file.endswith(".bin") else "text"
+        md5 = hashlib.md5()
+        md5.update(DataCache.fingerprint(vec_file).encode("utf-8"))
+        md5.update(
+            json.dumps({
+                "file_format": file_format,
+                "oov_init": oov_init,
+                "seed": seed,
+                "vocab_size": len(vocab_processor)
+            }, sort_keys=True).encode("utf-8"))
+        for token in vocab_processor.tokens:
+            md5.update(token.encode("utf-8") + b"\n")
+        output_file = os.path.join(cache_dir, md5.hexdigest() + ".npy")
+        if not os.path.exists(output_file):
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            # 先写临时文件再rename，中断不会留下半成品
+            tmp_file = output_file + ".tmp.npy"
+            WordVecUtils.convert(vec_file, vocab_processor.vocab,
+                                 len(vocab_processor), tmp_file, file_format,
+                                 oov_init, seed)
+            os.rename(tmp_file, output_file)
+
+        return np.load(output_file, mmap_mode="r")
+
+    @staticmethod
+    def convert(vec_file, vocab, num_rows, output_file, file_format, oov_init,
+                seed):
+        '''一遍扫描词向量文件，写出按词表对齐的.npy
+
+        Args:
+            vec_file: 词向量文件
+            vocab: 词 -> id
+            num_rows: 输出行数，即词表大小(含id 0及hash桶)
+            output_file: 输出.npy文件
+            file_format: text/binary
+            oov_init: random/mean
+            seed: 随机初始化种子
+        '''
+        if file_format == "binary":
+            vectors = WordVecUtils._iter_binary(vec_file)
+        else:
+            vectors = WordVecUtils._iter_text(vec_file)
+        dim = next(vectors)
+        table = np.lib.format.open_memmap(output_file,
+                                          mode="w+",
+                                          dtype=np.float32,
+                                          shape=(num_rows, dim))
+        found = np.zeros(num_rows, dtype=bool)
+        total = np.zeros(dim, dtype=np.float64)
+        for word, vector_fn in vectors:
+            idx = vocab.get(word)
+            # 词表经过小写化，原词未命中时退化为小写匹配，精确匹配优先
+            if idx is None:
+                idx = vocab.get(word.lower())
+                if idx is None or found[idx]:
+                    continue
+            vector = vector_fn()
+            if vector is None:
+                continue
+            if found[idx]:
+                total -= table[idx]
+            table[idx] = vector
+            total += vector
+            found[idx] = True
+        found[0] = True
+        table[0] = 0.0
+        num_found = int(found.sum()) - 1
+        logging.info("Pretrain word vectors: {:d}/{:d} vocab words found".format(
+            num_found, num_rows - 1))
+
+        # 未命中行初始化
+        missing = np.nonzero(~found)[0]
+        rng = np.random.RandomState(seed)
+        mean = (total / max(num_found, 1)).astype(np.float32)
+        for start in range(0, len(missing), OOV_CHUNK_ROWS):
+            rows = missing[start:start + OOV_CHUNK_ROWS]
+            if oov_init == "mean":
+                table[rows] = mean
+            else:
+                table[rows] = rng.uniform(-0.25, 0.25,
+                                          (len(rows), dim)).astype(np.float32)
+        table.flush()
+        del table
+
+    @staticmethod
+    def _iter_text(vec_file):
+        '''逐行读取文本格式，兼容word2vec(首行"词数 维数")与GloVe(无首行)
+
+        Returns:
+            生成器，首个元素为维数，之后为(词, 解析向量的函数)，只有词表内的词才解析
+        '''
+        with io.open(vec_file, "r", encoding="utf-8", errors="replace") as fin:
+            first = fin.readline().rstrip()
+            fields = first.split(" ")
+            header = len(fields) == 2 and all(f.isdigit() for f in fields)
+            dim = int(fields[1]) if header else len(fields) - 1
+            yield dim
+
+            def parse(rest):
+                vector = np.fromstring(rest, dtype=np.float32, sep=" ")
+                return vector if vector.size == dim else None
+
+            lines = fin if header else _chain_first(first, fin)
+            for line in lines:
+                parts = line.rstrip().split(" ", 1)
+                if len(parts) < 2:
+                    continue
+                yield parts[0], lambda rest=parts[1]: parse(rest)
+
+    @staticmethod
+    def _iter_binary(vec_file):
+        '''memory-map读取word2vec二进制格式: 首行"词数 维数"，
+        之后每个词为"词+空格+dim个float32"，可能带换行
+        未命中词表的向量直接跳过，不拷贝数据
+
+        Returns:
+            生成器，首个元素为维数，之后为(词, 读取向量的函数)
+        '''
+        with open(vec_file, "rb") as fin:
+            mm = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                header_end = mm.find(b"\n")
+                count, dim = map(int, mm[:header_end].split())
+                yield dim
+                vec_bytes = dim * 4
+                pos = header_end + 1
+                for _ in range(count):
+                    space = mm.find(b" ", pos)
+                    if space < 0:
+                        break
+                    word = mm[pos:space].strip().decode("utf-8", "replace")
+                    offset = space + 1
+                    yield word, lambda offset=offset: np.frombuffer(
+                        mm, dtype=np.float32, count=dim, offset=offset).copy()
+                    pos = offset + vec_bytes
+            finally:
+                mm.close()
+
+
+def _chain_first(first, lines):
+    '''将已读出的首行放回行迭代器
+    '''
+    yield first
+    for line in lines:
+        yield line